@@ -0,0 +1,133 @@
+import numpy as np
+
+from parts import as_part_table
+
+# 分摊依据
+ALLOCATION_KEYS = {
+    "volume": "按零件体积",
+    "total": "按零件体积+支撑体积",
+    "equal": "平均分摊",
+    "custom": "自定义权重",
+}
+
+# 参与分摊的费用项；总费用和实际费用按各分项的分摊结果再分摊
+COMPONENT_FIELDS = ["材料费用", "机时费用", "氩气费用", "后处理费"]
+SUMMARY_FIELDS = ["总费用", "实际费用"]
+
+
+class CostAllocation:
+    """逐零件费用分摊结果
+
+    fields 为 {费用项: 逐零件金额数组}，每一列按最大余额法舍入到分，
+    各列之和与整版的计算明细完全相等。
+    """
+
+    def __init__(self, parts, keys, fields):
+        self.parts = parts
+        self.keys = keys
+        self.fields = fields
+
+    def __len__(self):
+        return len(self.parts)
+
+    def describe(self):
+        """分摊方式的中文说明"""
+        methods = {ALLOCATION_KEYS[key] for key in self.keys.values()}
+        if len(methods) == 1:
+            return methods.pop()
+        return "，".join(f"{field}{ALLOCATION_KEYS[key]}" for field, key in self.keys.items())
+
+    def totals(self):
+        """各费用项的分摊合计（应与计算明细一致）"""
+        return {field: round(float(values.sum()), 2) for field, values in self.fields.items()}
+
+    def rows(self):
+        """逐个产出 (零件名称, {费用项: 金额})"""
+        columns = {field: values.tolist() for field, values in self.fields.items()}
+        for i, name in enumerate(self.parts.names):
+            yield name, {field: values[i] for field, values in columns.items()}
+
+
+def allocation_weights(parts, key, weights=None):
+    """计算分摊权重数组；权重全为 0 时退回平均分摊"""
+    table = as_part_table(parts)
+    if key == "volume":
+        values = table.volumes
+    elif key == "total":
+        values = table.total_volumes
+    elif key == "equal":
+        values = np.ones(len(table))
+    elif key == "custom":
+        if weights is None:
+            raise ValueError("自定义分摊需要提供逐零件权重")
+        values = np.asarray(weights, dtype=np.float64)
+        if values.shape != (len(table),):
+            raise ValueError(f"权重数量（{values.size}）与零件数量（{len(table)}）不一致")
+    else:
+        raise ValueError(f"未知的分摊方式：{key}")
+
+    if np.any(values < 0) or not np.all(np.isfinite(values)):
+        raise ValueError("分摊权重不能为负数或非数值")
+    if len(values) and not values.sum():
+        return np.ones(len(values))
+    return values
+
+
+def largest_remainder(total, weights, ndigits=2):
+    """把 total 按 weights 比例分配，舍入到 ndigits 位小数，且各份之和严格等于 total
+
+    先按比例取整到最小单位，剩余的单位依次分给舍去部分最大的份额（相同时下标小者优先）。
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if not len(weights):
+        return np.empty(0)
+    scale = 10 ** ndigits
+    units = int(round(total * scale))
+    sign, units = (-1 if units < 0 else 1), abs(units)
+
+    exact = weights / weights.sum() * units
+    floored = np.floor(exact).astype(np.int64)
+    leftover = units - int(floored.sum())
+    if leftover > 0:
+        # 只需找出舍去部分最大的 leftover 份，用 O(N) 的 partition 代替整体排序
+        remainders = exact - floored
+        threshold = np.partition(remainders, len(remainders) - leftover)[len(remainders) - leftover]
+        above = np.flatnonzero(remainders > threshold)
+        ties = np.flatnonzero(remainders == threshold)[:leftover - len(above)]
+        floored[above] += 1
+        floored[ties] += 1
+    return sign * floored / scale
+
+
+def allocate_costs(parts, details, key="total", weights=None):
+    """把整版计算明细分摊到每个零件，一次向量化完成
+
+    key 可以是 ALLOCATION_KEYS 中的一个，也可以是 {费用项: 分摊依据} 为各分项指定不同依据
+    （未指定的分项按 "total"）；key 为 "custom" 时 weights 为逐零件权重。
+    """
+    table = as_part_table(parts)
+    keys = {field: key.get(field, "total") if isinstance(key, dict) else key for field in COMPONENT_FIELDS}
+
+    weight_cache = {}
+    fields = {}
+    exact_total = np.zeros(len(table))
+    for field in COMPONENT_FIELDS:
+        field_key = keys[field]
+        if field_key not in weight_cache:
+            weight_cache[field_key] = allocation_weights(table, field_key, weights)
+        field_weights = weight_cache[field_key]
+        fields[field] = largest_remainder(details[field], field_weights)
+        if len(table):
+            exact_total += field_weights / field_weights.sum() * details[field]
+
+    # 总费用与实际费用按各零件分项金额之和的比例分摊，保证各零件的金额彼此协调
+    for field in SUMMARY_FIELDS:
+        fields[field] = largest_remainder(details[field], exact_total if exact_total.any() else np.ones(len(table)))
+    return CostAllocation(table, keys, fields)
+
+
+def attach_allocation(result, key="total", weights=None):
+    """为 build_quote 的结果计算分摊，存入 result['费用分摊'] 并返回"""
+    allocation = allocate_costs(result['输入参数']['零件清单'], result['计算明细'], key, weights)
+    result['费用分摊'] = allocation
+    return allocation
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from parts import as_part_table
+from utils import user_data_dir
+
+CACHE_VERSION = 1  # 计算逻辑或缓存格式变化时递增，旧缓存自动失效
+
+
+def quote_key(parts, total_print_duration, pricing_standard):
+    """由零件表、打印时长和定价标准计算内容哈希
+
+    零件按名称、零件体积、支撑体积的原始 float64 字节参与哈希，
+    定价标准按键排序后参与哈希，与字典顺序无关。
+    """
+    table = as_part_table(parts)
+    names, volumes, support_volumes = table.names, table.volumes, table.support_volumes
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"v{CACHE_VERSION}\x1e{len(names)}\x1e".encode())
+    digest.update("\x1f".join("" if name is None else str(name) for name in names).encode("utf-8"))
+    digest.update(b"\x1e")
+    digest.update(np.ascontiguousarray(volumes, dtype="<f8").tobytes())
+    digest.update(np.ascontiguousarray(support_volumes, dtype="<f8").tobytes())
+    digest.update(str(total_print_duration).strip().encode("utf-8"))
+    pricing = sorted((key, float(value)) for key, value in pricing_standard.items())
+    digest.update(json.dumps(pricing, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class QuoteCache:
+    """报价结果缓存：内存 LRU + SQLite 磁盘两级
+
+    缓存值为 calculate_multipart_cost 的“计算明细”字典。内存层按条目数淘汰，
+    磁盘层按条目数和存活时间淘汰；hits / misses 等计数见 stats()。
+    可在多个线程中共用同一实例，多个进程也可以共用同一个数据库文件。
+    """
+
+    def __init__(self, path=None, memory_entries=256, disk_entries=100_000, max_age=30 * 24 * 3600):
+        self.path = path or os.path.join(user_data_dir(), "quote_cache.sqlite3")
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.max_age = max_age
+        self._memory = OrderedDict()  # key -> (写入时间, 计算明细)
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self.memory_hits = self.disk_hits = self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS quotes (
+                key TEXT PRIMARY KEY,
+                details TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_quotes_last_used ON quotes(last_used)")
+        self._db.commit()
+
+    def get(self, key):
+        """返回缓存的计算明细，未命中或已过期时返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.max_age:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return dict(entry[1])
+
+            row = self._db.execute(
+                "SELECT details, created_at FROM quotes WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE quotes SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            details = json.loads(row[0])
+            self._remember(key, row[1], details)
+            self.disk_hits += 1
+            return dict(details)
+
+    def put(self, key, details):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, dict(details))
+            self._db.execute(
+                "INSERT OR REPLACE INTO quotes (key, details, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(details, ensure_ascii=False), now, now)
+            )
+            self._db.commit()
+            # 每写入一批再做一次磁盘淘汰，避免每次写入都扫描
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= 100:
+                self._evict_disk(now)
+
+    def _remember(self, key, created_at, details):
+        self._memory[key] = (created_at, details)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        self._puts_since_evict = 0
+        self._db.execute("DELETE FROM quotes WHERE created_at < ?", (now - self.max_age,))
+        self._db.execute("""
+            DELETE FROM quotes WHERE key IN (
+                SELECT key FROM quotes ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.disk_entries,))
+        self._db.commit()
+
+    def evict(self):
+        """立即按存活时间和条目数淘汰磁盘缓存"""
+        with self._lock:
+            self._evict_disk(time.time())
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM quotes")
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            disk_entries = self._db.execute("SELECT COUNT(*) FROM quotes").fetchone()[0]
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,384 @@
+"""PrintCostPro 命令行批量报价（无需 Qt）
+
+用法示例：
+    python app/cli.py quote 报价目录 --duration "1天2小时" --workers 8 --summary 汇总.json --reports 报告目录
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from allocation import attach_allocation
+from cache import QuoteCache
+from formatter import write_report
+from geometry_cache import DEFAULT_MAX_BYTES, GeometryCache, shared_cache
+from history_export import QuoteHistoryWriter, job_record
+from instrument import ProfileCapture, Trace, log_timings
+from loader import load_parts_file
+from duration import format_duration
+from logic import DEFAULT_PRICING_STANDARD, build_quote
+from printtime import DEFAULT_MACHINE, MachineSettings, estimate_print_time
+from support import DEFAULT_SUPPORT, SUPPORT_METHODS, SupportSettings
+
+EXIT_OK = 0
+EXIT_FAILED = 1      # 至少一个文件报价失败
+EXIT_NO_INPUT = 2    # 参数错误或未找到任何工作簿
+
+SUMMARY_FIELDS = [
+    "文件", "状态", "零件数量", "总打印时长",
+    "材料费用", "机时费用", "氩气费用", "后处理费", "总费用", "实际费用",
+    "耗时(秒)", "错误信息"
+]
+HISTORY_KEY = "_历史记录"  # 汇总行中暂存报价历史记录的键，写汇总前取出
+TIMINGS_KEY = "_耗时记录"  # 汇总行中暂存各阶段耗时日志的键，由主进程写入耗时日志
+
+
+def find_workbooks(directory, pattern="*.xlsm"):
+    """递归查找目录下的工作簿，跳过 Excel 的临时锁文件"""
+    return sorted(p for p in Path(directory).rglob(pattern) if not p.name.startswith("~$"))
+
+
+def load_pricing(path):
+    """读取定价标准 JSON，只需给出需要覆盖默认值的项"""
+    pricing_standard = dict(DEFAULT_PRICING_STANDARD)
+    if path is None:
+        return pricing_standard
+    with open(path, encoding="utf-8") as f:
+        overrides = json.load(f)
+    unknown = set(overrides) - set(pricing_standard)
+    if unknown:
+        raise ValueError(f"未知的定价参数：{'、'.join(sorted(unknown))}")
+    pricing_standard.update({key: float(value) for key, value in overrides.items()})
+    return pricing_standard
+
+
+_process_caches = {}  # 每个工作进程各自打开一次报价缓存
+
+
+def _open_cache(cache_path):
+    """打开报价缓存，失败时只提示一次并不再使用缓存"""
+    if cache_path not in _process_caches:
+        try:
+            _process_caches[cache_path] = QuoteCache(cache_path or None)
+        except (OSError, sqlite3.Error) as e:
+            print(f"报价缓存不可用：{e}", file=sys.stderr)
+            _process_caches[cache_path] = None
+    return _process_caches[cache_path]
+
+
+def quote_file(file_path, total_print_duration, pricing_standard, report_base=None, report_formats=(),
+               cache_path=None, allocation_key=None, history=None, support=None, machine=None,
+               geometry_cache_path=None, rehash=False):
+    """对单个工作簿报价，返回汇总行；所有异常都记录在汇总行中，不向外抛出
+
+    cache_path 为 None 时不使用报价缓存，为空字符串时使用默认缓存位置。
+    allocation_key 不为 None 时在报告中附上逐零件费用分摊（见 allocation.ALLOCATION_KEYS）。
+    history 为 "jobs" 或 "parts" 时，在汇总行的 HISTORY_KEY 中附上报价历史记录，由主进程统一写出。
+    各阶段耗时记录放在汇总行的 TIMINGS_KEY 中，同样由主进程写入耗时日志。
+    support 为 support.SupportSettings 时由网格估算 STL 零件的支撑体积。
+    machine 为 printtime.MachineSettings 时忽略 total_print_duration，由 STL 网格按层切片估算打印时长。
+    geometry_cache_path 与 cache_path 类似，指定几何分析结果缓存（见 geometry_cache）；
+    rehash 为 True 时不信任文件状态，每次都重新计算文件内容哈希。
+    """
+    started = time.perf_counter()
+    row = {"文件": str(file_path), "总打印时长": total_print_duration}
+    # 各阶段耗时随汇总行交回主进程写入耗时日志，工作进程不直接写日志文件
+    trace = Trace(str(file_path), deferred=True)
+    try:
+        with trace.span("读取", bytes=os.path.getsize(file_path)) as span:
+            geometry_cache = (shared_cache(geometry_cache_path or None, rehash)
+                              if geometry_cache_path is not None else None)
+            parts = load_parts_file(file_path, support=support, cache=geometry_cache)
+            span.rows = len(parts)
+        if machine is not None:
+            if not str(file_path).lower().endswith(".stl"):
+                raise ValueError("只能由 STL 网格估算打印时长")
+            # 外层已按文件多进程并行，这里每个文件只有一个零件，不再另起进程
+            with trace.span("估算时长", rows=len(parts)):
+                estimate = estimate_print_time([file_path], machine, workers=1, cache=geometry_cache)
+            total_print_duration = row["总打印时长"] = format_duration(estimate.hours)
+        cache = _open_cache(cache_path) if cache_path is not None else None
+        with trace.span("计算", rows=len(parts)):
+            result = build_quote(parts, total_print_duration, pricing_standard, cache=cache)
+            if allocation_key is not None and (report_base is not None or history == "parts"):
+                attach_allocation(result, allocation_key)
+        row.update(result['计算明细'])
+        row["零件数量"] = result['输入参数']['零件数量']
+        if history is not None:
+            with_parts = history == "parts"
+            row[HISTORY_KEY] = (job_record(result, file_path),
+                                parts if with_parts else None,
+                                result.get('费用分摊') if with_parts else None)
+
+        if report_base is not None:
+            Path(report_base).parent.mkdir(parents=True, exist_ok=True)
+            if "txt" in report_formats:
+                with trace.span("报表", rows=len(parts)) as span:
+                    with open(f"{report_base}.txt", "w", encoding="utf-8") as f:
+                        write_report(result, f, 70)
+                    span.bytes = os.path.getsize(f"{report_base}.txt")
+            if "xlsx" in report_formats:
+                from exporter import export_to_excel
+                with trace.span("导出", rows=len(parts)) as span:
+                    export_to_excel(result, f"{report_base}.xlsx")
+                    span.bytes = os.path.getsize(f"{report_base}.xlsx")
+        row["状态"] = "成功"
+    except Exception as e:
+        row["状态"] = "失败"
+        row["错误信息"] = f"{type(e).__name__}: {e}"
+    row["耗时(秒)"] = round(time.perf_counter() - started, 3)
+    row[TIMINGS_KEY] = trace.pending
+    return row
+
+
+def write_summary(rows, path):
+    """按扩展名写出 CSV 或 JSON 汇总"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".csv":
+        # utf-8-sig 便于 Excel 直接打开中文表头
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+def quote_directory(args):
+    directory = Path(args.directory)
+    if not directory.is_dir():
+        print(f"目录不存在：{directory}", file=sys.stderr)
+        return EXIT_NO_INPUT
+    files = find_workbooks(directory, args.pattern)
+    if not files:
+        print(f"{directory} 下没有找到 {args.pattern} 文件", file=sys.stderr)
+        return EXIT_NO_INPUT
+
+    try:
+        pricing_standard = load_pricing(args.pricing)
+    except (OSError, ValueError) as e:
+        print(f"读取定价标准失败：{e}", file=sys.stderr)
+        return EXIT_NO_INPUT
+
+    report_formats = {"txt": ("txt",), "xlsx": ("xlsx",), "both": ("txt", "xlsx")}[args.report_format]
+
+    def report_base(file_path):
+        if args.reports is None:
+            return None
+        # 保留子目录结构，避免不同目录下的同名文件互相覆盖
+        return str(Path(args.reports) / file_path.relative_to(directory).with_suffix(""))
+
+    cache_path = None if args.no_cache else (args.cache or "")
+    if args.history_parts and not args.history:
+        print("--history-parts 需要与 --history 一起使用", file=sys.stderr)
+        return EXIT_NO_INPUT
+    history = ("parts" if args.history_parts else "jobs") if args.history else None
+    try:
+        support = SupportSettings(args.overhang_angle, args.support, args.support_resolution) if args.support else None
+    except ValueError as e:
+        print(f"支撑估算参数无效：{e}", file=sys.stderr)
+        return EXIT_NO_INPUT
+    try:
+        machine = MachineSettings(args.layer_thickness, args.scan_speed, args.hatch_distance,
+                                  args.recoat_time) if args.estimate_time else None
+    except ValueError as e:
+        print(f"打印机参数无效：{e}", file=sys.stderr)
+        return EXIT_NO_INPUT
+    geometry_cache_path = None if args.no_cache else (args.geometry_cache or "")
+    jobs = [(str(p), args.duration, pricing_standard, report_base(p), report_formats, cache_path, args.allocation,
+             history, support, machine, geometry_cache_path, args.rehash) for p in files]
+    workers = max(1, args.workers or os.cpu_count() or 1)
+    if args.profile:
+        # cProfile 只能统计当前进程，采集时改为单进程顺序执行
+        workers = 1
+
+    try:
+        history_writer = QuoteHistoryWriter(args.history, include_parts=args.history_parts) if history else None
+    except (OSError, ValueError, ImportError) as e:
+        print(f"打开报价历史失败：{e}", file=sys.stderr)
+        return EXIT_NO_INPUT
+
+    rows = []
+
+    def collect(row):
+        # 报价历史和耗时日志在主进程中按完成顺序追加，工作进程只负责生成记录
+        log_timings(row.pop(TIMINGS_KEY, ()))
+        record = row.pop(HISTORY_KEY, None)
+        if record is not None:
+            history_writer.append_record(*record)
+        rows.append(row)
+        print_row(row, len(rows), len(jobs))
+
+    with history_writer if history_writer is not None else nullcontext():
+        if workers == 1 or len(jobs) == 1:
+            with ProfileCapture(args.profile) if args.profile else nullcontext():
+                for job in jobs:
+                    collect(quote_file(*job))
+            if args.profile:
+                print(f"性能采集结果已写入 {args.profile}.prof 和 {args.profile}.txt")
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                futures = {pool.submit(quote_file, *job): job for job in jobs}
+                for future in as_completed(futures):
+                    try:
+                        row = future.result()
+                    except Exception as e:
+                        # quote_file 自身不抛出异常，到这里说明工作进程异常退出（BrokenProcessPool，
+                        # 例如内存不足被系统终止）；只把受影响的文件记为失败，照常写出汇总
+                        job = futures[future]
+                        row = {"文件": job[0], "总打印时长": job[1], "状态": "失败",
+                               "错误信息": f"{type(e).__name__}: {e}"}
+                    collect(row)
+    rows.sort(key=lambda row: row["文件"])
+
+    if args.summary:
+        write_summary(rows, args.summary)
+
+    failed = sum(row["状态"] != "成功" for row in rows)
+    print(f"共 {len(rows)} 个文件，成功 {len(rows) - failed} 个，失败 {failed} 个")
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def print_row(row, done, total):
+    if row["状态"] == "成功":
+        print(f"[{done}/{total}] {row['文件']}：实际费用 ¥{row['实际费用']:,.2f}")
+    else:
+        print(f"[{done}/{total}] {row['文件']}：{row['错误信息']}", file=sys.stderr)
+
+
+def serve_quotes(args):
+    import asyncio
+    from server import run_server
+
+    try:
+        asyncio.run(run_server(args.host, args.port, args.workers, args.batch_window_ms / 1000, args.max_batch))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"报价服务启动失败：{e}", file=sys.stderr)
+        return EXIT_NO_INPUT
+    return EXIT_OK
+
+
+def _megabytes(size):
+    return f"{size / (1024 * 1024):,.1f} MB"
+
+
+def manage_cache(args):
+    """查看、清空或按大小淘汰几何分析结果缓存"""
+    max_bytes = int(args.max_size * 1024 * 1024) if args.max_size is not None else DEFAULT_MAX_BYTES
+    try:
+        cache = GeometryCache(args.path, max_bytes=max_bytes)
+    except (OSError, sqlite3.Error) as e:
+        print(f"打开几何缓存失败：{e}", file=sys.stderr)
+        return EXIT_NO_INPUT
+    try:
+        if args.action == "clear":
+            cache.clear()
+            print(f"已清空几何缓存：{cache.path}")
+        elif args.action == "trim":
+            before = cache.stats()["used_bytes"]
+            cache.evict()
+            print(f"已淘汰到 {_megabytes(max_bytes)} 以内：{_megabytes(before)} → "
+                  f"{_megabytes(cache.stats()['used_bytes'])}")
+        else:
+            stats = cache.stats()
+            print(f"几何缓存：{stats['path']}")
+            print(f"  条目 {stats['entries']:,} 个，数据 {_megabytes(stats['data_bytes'])}，"
+                  f"文件 {_megabytes(stats['file_bytes'])}，上限 {_megabytes(stats['max_bytes'])}")
+            for kind, item in stats["kinds"].items():
+                print(f"  {kind:<10}{item['entries']:>8,} 个  {_megabytes(item['bytes']):>12}")
+            print(f"  已记录哈希的文件 {stats['known_files']:,} 个，计入上限的总量 {_megabytes(stats['used_bytes'])}")
+            if args.recent:
+                print("最近使用：")
+                for kind, source, rows, size, last_used in cache.recent(args.recent):
+                    print(f"  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_used))}  {kind:<10}"
+                          f"{rows:>8,} 行  {size:>10,} 字节  {source}")
+    finally:
+        cache.close()
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="printcostpro", description="PrintCostPro 命令行批量报价")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    quote = subparsers.add_parser("quote", help="对目录下的所有零件工作簿报价")
+    quote.add_argument("directory", help="包含零件工作簿的目录（递归查找）")
+    duration = quote.add_mutually_exclusive_group(required=True)
+    duration.add_argument("--duration", help="总打印时长，例如 \"11天11小时11分11秒\" 或 \"12:30:00\"")
+    duration.add_argument("--estimate-time", action="store_true",
+                          help="由 STL 网格按层切片估算每个文件的打印时长（需 --pattern \"*.stl\"）")
+    quote.add_argument("--pricing", help="定价标准 JSON 文件，只需给出要覆盖默认值的项")
+    quote.add_argument("--workers", type=int, default=None, help="并行进程数，默认等于 CPU 核数")
+    quote.add_argument("--pattern", default="*.xlsm", help="零件文件匹配模式（默认 *.xlsm；*.stl 时每个网格文件作为一个零件）")
+    quote.add_argument("--summary", help="汇总输出文件，扩展名为 .csv 时写 CSV，否则写 JSON")
+    quote.add_argument("--reports", help="逐个文件的报告输出目录")
+    quote.add_argument("--report-format", choices=["txt", "xlsx", "both"], default="txt",
+                       help="逐个文件的报告格式（默认 txt）")
+    quote.add_argument("--allocation", choices=["total", "volume", "equal"],
+                       help="在逐个文件的报告中附上逐零件费用分摊：total 按零件体积+支撑体积，"
+                            "volume 按零件体积，equal 平均分摊")
+    quote.add_argument("--history", metavar="PATH",
+                       help="追加写出报价历史（每个文件一行），按扩展名写 .csv / .jsonl / .parquet（需 pyarrow）")
+    quote.add_argument("--history-parts", action="store_true",
+                       help="报价历史同时写出逐零件记录（写到 PATH 旁的 <文件名>-parts 文件）")
+    quote.add_argument("--support", choices=list(SUPPORT_METHODS),
+                       help="由 STL 网格估算支撑体积：heightmap 按高度图求悬垂面到下方表面的距离，"
+                            "projection 直接投影到底板（偏大但更快）；对工作簿无效")
+    quote.add_argument("--overhang-angle", type=float, default=DEFAULT_SUPPORT.overhang_angle,
+                       help="需要支撑的悬垂角，与水平面夹角小于此值（度）的朝下表面需要支撑（默认 45）")
+    quote.add_argument("--support-resolution", type=float, default=DEFAULT_SUPPORT.resolution,
+                       help="高度图网格尺寸 mm（默认 0.5）")
+    quote.add_argument("--layer-thickness", type=float, default=DEFAULT_MACHINE.layer_thickness,
+                       help=f"估算打印时长的层厚 mm（默认 {DEFAULT_MACHINE.layer_thickness:g}）")
+    quote.add_argument("--scan-speed", type=float, default=DEFAULT_MACHINE.scan_speed,
+                       help=f"扫描速度 mm/s（默认 {DEFAULT_MACHINE.scan_speed:g}）")
+    quote.add_argument("--hatch-distance", type=float, default=DEFAULT_MACHINE.hatch_distance,
+                       help=f"扫描间距 mm（默认 {DEFAULT_MACHINE.hatch_distance:g}）")
+    quote.add_argument("--recoat-time", type=float, default=DEFAULT_MACHINE.recoat_time,
+                       help=f"每层铺粉时间 秒（默认 {DEFAULT_MACHINE.recoat_time:g}）")
+    quote.add_argument("--cache", help="报价缓存数据库路径（默认位于用户数据目录）")
+    quote.add_argument("--geometry-cache", help="几何分析结果缓存数据库路径（默认位于用户数据目录）")
+    quote.add_argument("--no-cache", action="store_true", help="不使用报价缓存和几何分析结果缓存")
+    quote.add_argument("--rehash", action="store_true",
+                       help="每次都重新计算文件内容哈希，不因文件大小和修改时间未变而复用几何缓存中记录的哈希")
+    quote.add_argument("--profile", metavar="PREFIX",
+                       help="采集 cProfile/tracemalloc 数据，写到 PREFIX.prof 和 PREFIX.txt（按单进程运行）")
+    quote.set_defaults(handler=quote_directory)
+
+    serve = subparsers.add_parser("serve", help="启动本地 HTTP/JSON 报价服务")
+    serve.add_argument("--host", default="127.0.0.1", help="监听地址（默认仅本机 127.0.0.1）")
+    serve.add_argument("--port", type=int, default=8765, help="监听端口（默认 8765）")
+    serve.add_argument("--workers", type=int, default=None, help="解析工作簿的进程数，默认等于 CPU 核数")
+    serve.add_argument("--batch-window-ms", type=float, default=2.0,
+                       help="合并并发报价请求的等待时间（毫秒，默认 2）")
+    serve.add_argument("--max-batch", type=int, default=512, help="每批最多合并的请求数（默认 512）")
+    serve.set_defaults(handler=serve_quotes)
+
+    cache = subparsers.add_parser("cache", help="查看或清空几何分析结果缓存")
+    cache.add_argument("action", nargs="?", choices=["info", "clear", "trim"], default="info",
+                       help="info 查看统计（默认），clear 清空，trim 按 --max-size 淘汰最久未用的条目")
+    cache.add_argument("--path", help="缓存数据库路径（默认位于用户数据目录）")
+    cache.add_argument("--max-size", type=float, metavar="MB",
+                       help=f"trim 时的数据量上限（默认 {DEFAULT_MAX_BYTES // (1024 * 1024)} MB）")
+    cache.add_argument("--recent", type=int, default=0, metavar="N", help="info 时列出最近使用的 N 个条目")
+    cache.set_defaults(handler=manage_cache)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,495 @@
+import math
+import time
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QLineEdit, QPushButton, QCheckBox,
+    QSpinBox, QComboBox, QTableWidget, QTableWidgetItem, QFileDialog, QMessageBox, QPlainTextEdit,
+    QAbstractItemView, QDoubleSpinBox, QFormLayout, QDialogButtonBox, QTableView
+)
+from PyQt5.QtCore import Qt, QThreadPool
+
+from history_db import COUNT_LIMIT
+from logic import convert_duration_to_hours
+from models import HeatmapModel
+from parts import as_part_table
+from printtime import MachineSettings
+from sweep import DEFAULT_SWEEP_KEYS, check_grid_size, sweep_cost
+from uncertainty import HOURS, VOLUME, Normal, Triangular, Uniform, simulate_cost
+from workers import Worker
+
+COST_FIELDS = ["实际费用", "总费用", "材料费用", "机时费用", "氩气费用"]
+DETAIL_PART_LIMIT = 200  # 报价历史详情中最多列出的零件名称数
+
+
+def run_sweep_job(total_volume, machine_hours, pricing_standard, grid, progress):
+    """后台线程中计算参数扫描，返回 (SweepResult, 用时毫秒)"""
+    started = time.perf_counter()
+    result = sweep_cost(total_volume, machine_hours, pricing_standard, grid)
+    return result, (time.perf_counter() - started) * 1000
+
+
+class SweepDialog(QDialog):
+    """定价参数扫描面板：在多个定价参数的网格上一次性计算费用，并以热力图展示"""
+
+    def __init__(self, parts, total_print_duration, pricing_standard, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("定价参数扫描")
+        self.resize(900, 640)
+
+        # 零件与打印时长在面板打开期间不变，总体积和机时只算一次
+        self.total_volume = as_part_table(parts).total_volume
+        self.machine_hours = convert_duration_to_hours(total_print_duration)
+        self.pricing_standard = dict(pricing_standard)
+        self.result = None
+        self.thread_pool = QThreadPool(self)
+        self._worker = None
+
+        layout = QVBoxLayout(self)
+
+        grid = QGridLayout()
+        for column, title in enumerate(["参数", "起始值", "结束值", "取值个数"]):
+            grid.addWidget(QLabel(title, self), 0, column)
+        self.axis_inputs = {}
+        for row, key in enumerate(DEFAULT_SWEEP_KEYS, 1):
+            value = self.pricing_standard[key]
+            enabled = QCheckBox(key, self)
+            enabled.setChecked(row <= 2)
+            start = QLineEdit(f"{value * 0.8:g}", self)
+            stop = QLineEdit(f"{value * 1.2:g}", self)
+            steps = QSpinBox(self)
+            steps.setRange(2, 1000)
+            steps.setValue(11)
+            for column, widget in enumerate([enabled, start, stop, steps]):
+                grid.addWidget(widget, row, column)
+            self.axis_inputs[key] = (enabled, start, stop, steps)
+        layout.addLayout(grid)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("显示费用项", self))
+        self.field_combo = QComboBox(self)
+        self.field_combo.addItems(COST_FIELDS)
+        self.field_combo.currentIndexChanged.connect(self.show_heatmap)
+        controls.addWidget(self.field_combo)
+        controls.addStretch(1)
+        self.run_button = QPushButton("计算", self)
+        self.run_button.clicked.connect(self.run_sweep)
+        controls.addWidget(self.run_button)
+        self.export_table_button = QPushButton("导出长表 CSV", self)
+        self.export_table_button.clicked.connect(self.export_table)
+        controls.addWidget(self.export_table_button)
+        self.export_heatmap_button = QPushButton("导出热力图 CSV", self)
+        self.export_heatmap_button.clicked.connect(self.export_heatmap)
+        controls.addWidget(self.export_heatmap_button)
+        layout.addLayout(controls)
+
+        self.summary_label = QLabel(self)
+        layout.addWidget(self.summary_label)
+
+        self.heatmap_model = HeatmapModel(self)
+        self.heatmap_table = QTableView(self)
+        self.heatmap_table.setModel(self.heatmap_model)
+        layout.addWidget(self.heatmap_table, stretch=1)
+
+        self.set_export_enabled(False)
+
+    def set_export_enabled(self, enabled):
+        self.export_table_button.setEnabled(enabled)
+        self.export_heatmap_button.setEnabled(enabled)
+
+    def read_grid(self):
+        grid = {}
+        for key, (enabled, start, stop, steps) in self.axis_inputs.items():
+            if not enabled.isChecked():
+                continue
+            try:
+                grid[key] = np.linspace(float(start.text()), float(stop.text()), steps.value())
+            except ValueError:
+                raise ValueError(f"参数 {key} 的起止值无效，请输入数字！") from None
+        if not grid:
+            raise ValueError("请至少选择一个扫描参数")
+        check_grid_size(len(values) for values in grid.values())
+        return grid
+
+    def run_sweep(self):
+        if self._worker is not None:
+            return
+        try:
+            grid = self.read_grid()
+        except ValueError as e:
+            QMessageBox.warning(self, "参数错误", str(e))
+            return
+
+        # 大网格的广播计算需要数秒，放到后台线程中，避免界面卡住
+        points = math.prod(len(values) for values in grid.values())
+        self.run_button.setEnabled(False)
+        self.set_export_enabled(False)
+        self.summary_label.setText(f"正在计算 {points:,} 个网格点…")
+        worker = Worker(run_sweep_job, self.total_volume, self.machine_hours, self.pricing_standard, grid)
+        worker.signals.finished.connect(self.on_sweep_finished)
+        worker.signals.failed.connect(self.on_sweep_failed)
+        self._worker = worker
+        self.thread_pool.start(worker)
+
+    def on_sweep_failed(self, error):
+        self._worker = None
+        self.run_button.setEnabled(True)
+        self.set_export_enabled(self.result is not None)
+        self.summary_label.clear()
+        message = "内存不足，请减少扫描参数或取值个数" if isinstance(error, MemoryError) else str(error)
+        QMessageBox.warning(self, "计算失败", f"参数扫描失败：{message}")
+
+    def on_sweep_finished(self, outcome):
+        self._worker = None
+        self.run_button.setEnabled(True)
+        self.result, elapsed = outcome
+        actual = self.result.details["实际费用"]
+        shape = " × ".join(str(n) for n in self.result.shape)
+        self.summary_label.setText(
+            f"网格 {shape}，共 {actual.size:,} 个点，用时 {elapsed:.1f} ms；"
+            f"实际费用 ¥{actual.min():,.2f} ~ ¥{actual.max():,.2f}"
+        )
+        self.set_export_enabled(True)
+        self.show_heatmap()
+
+    def heatmap_axes(self):
+        keys = list(self.result.axes)
+        return keys[0], (keys[1] if len(keys) > 1 else None)
+
+    def show_heatmap(self):
+        if self.result is None:
+            return
+        field = self.field_combo.currentText()
+        row_key, column_key = self.heatmap_axes()
+        if column_key is None:
+            rows, data = self.result.axes[row_key], self.result.details[field].reshape(-1, 1)
+            columns = [field]
+        else:
+            # 其余维度取当前定价标准最接近的网格点
+            rows, columns, data = self.result.heatmap(row_key, column_key, field, fixed=self.pricing_standard)
+            columns = [f"{column_key} {value:g}" for value in columns]
+        self.heatmap_model.set_data([f"{row_key} {value:g}" for value in rows], columns, data)
+
+    def done(self, result):
+        # 关闭面板前等待尚未完成的计算，避免后台线程向已销毁的面板发送信号
+        self.thread_pool.waitForDone()
+        super().done(result)
+
+    def export_table(self):
+        filename, _ = QFileDialog.getSaveFileName(self, "导出长表", "参数扫描.csv", "CSV 文件 (*.csv)")
+        if filename:
+            self.result.write_csv(filename)
+
+    def export_heatmap(self):
+        row_key, column_key = self.heatmap_axes()
+        if column_key is None:
+            QMessageBox.information(self, "无法导出", "热力图需要至少两个扫描参数")
+            return
+        filename, _ = QFileDialog.getSaveFileName(self, "导出热力图", "参数扫描热力图.csv", "CSV 文件 (*.csv)")
+        if filename:
+            self.result.write_heatmap_csv(filename, row_key, column_key,
+                                          self.field_combo.currentText(), fixed=self.pricing_standard)
+
+
+class UncertaintyDialog(QDialog):
+    """蒙特卡洛不确定性分析：为估计值给出范围，输出费用的分位数"""
+
+    DISTRIBUTIONS = ["均匀分布", "三角分布", "正态分布"]
+
+    def __init__(self, parts, total_print_duration, pricing_standard, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("成本不确定性分析")
+        self.resize(760, 420)
+
+        self.total_volume = as_part_table(parts).total_volume
+        self.machine_hours = convert_duration_to_hours(total_print_duration)
+        self.pricing_standard = dict(pricing_standard)
+
+        layout = QVBoxLayout(self)
+
+        grid = QGridLayout()
+        for column, title in enumerate(["输入项", "分布", "下限", "上限"]):
+            grid.addWidget(QLabel(title, self), 0, column)
+        defaults = {
+            HOURS: (self.machine_hours * 0.9, self.machine_hours * 1.1),
+            "致密系数": (0.995, 1.0),
+            "用量比例": (self.pricing_standard["用量比例"] * 0.85, self.pricing_standard["用量比例"] * 1.15),
+            VOLUME: (self.total_volume * 0.95, self.total_volume * 1.05),
+        }
+        self.inputs = {}
+        for row, (name, (low, high)) in enumerate(defaults.items(), 1):
+            label = f"{name}（小时）" if name == HOURS else f"{name}（mm³）" if name == VOLUME else name
+            enabled = QCheckBox(label, self)
+            enabled.setChecked(name != VOLUME)
+            kind = QComboBox(self)
+            kind.addItems(self.DISTRIBUTIONS)
+            low_input = QLineEdit(f"{low:.6g}", self)
+            high_input = QLineEdit(f"{high:.6g}", self)
+            for column, widget in enumerate([enabled, kind, low_input, high_input]):
+                grid.addWidget(widget, row, column)
+            self.inputs[name] = (enabled, kind, low_input, high_input)
+        layout.addLayout(grid)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("样本数", self))
+        self.samples_input = QSpinBox(self)
+        self.samples_input.setRange(1_000, 2_000_000)
+        self.samples_input.setSingleStep(100_000)
+        self.samples_input.setValue(200_000)
+        controls.addWidget(self.samples_input)
+        controls.addWidget(QLabel("随机种子", self))
+        self.seed_input = QSpinBox(self)
+        self.seed_input.setRange(0, 2 ** 31 - 1)
+        self.seed_input.setValue(2024)
+        controls.addWidget(self.seed_input)
+        controls.addStretch(1)
+        run_button = QPushButton("开始模拟", self)
+        run_button.clicked.connect(self.run_simulation)
+        controls.addWidget(run_button)
+        layout.addLayout(controls)
+
+        self.summary_label = QLabel(self)
+        layout.addWidget(self.summary_label)
+
+        self.result_table = QTableWidget(self)
+        self.result_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.result_table, stretch=1)
+
+    def nominal_value(self, name):
+        if name == HOURS:
+            return self.machine_hours
+        if name == VOLUME:
+            return self.total_volume
+        return self.pricing_standard[name]
+
+    def read_distributions(self):
+        distributions = {}
+        for name, (enabled, kind, low_input, high_input) in self.inputs.items():
+            if not enabled.isChecked():
+                continue
+            try:
+                low, high = float(low_input.text()), float(high_input.text())
+            except ValueError:
+                raise ValueError(f"{name} 的上下限无效，请输入数字！") from None
+            if low > high:
+                raise ValueError(f"{name} 的下限不能大于上限")
+            # 三角分布的最可能值和正态分布的均值取当前输入值，并限制在上下限之内
+            nominal = min(max(self.nominal_value(name), low), high)
+            if kind.currentIndex() == 0:
+                distributions[name] = Uniform(low, high)
+            elif kind.currentIndex() == 1:
+                distributions[name] = Triangular(low, nominal, high)
+            else:
+                distributions[name] = Normal(nominal, (high - low) / 4, low, high)
+        return distributions
+
+    def run_simulation(self):
+        try:
+            distributions = self.read_distributions()
+        except ValueError as e:
+            QMessageBox.warning(self, "参数错误", str(e))
+            return
+
+        started = time.perf_counter()
+        try:
+            result = simulate_cost(self.total_volume, self.machine_hours, self.pricing_standard, distributions,
+                                   samples=self.samples_input.value(), seed=self.seed_input.value())
+        except ValueError as e:
+            QMessageBox.warning(self, "模拟失败", f"不确定性分析失败：{e}")
+            return
+        summary = result.summary()
+        elapsed = (time.perf_counter() - started) * 1000
+        self.summary_label.setText(f"{result.size:,} 个样本，随机种子 {result.seed}，用时 {elapsed:.1f} ms")
+
+        columns = list(next(iter(summary.values())))
+        table = self.result_table
+        table.clear()
+        table.setRowCount(len(summary))
+        table.setColumnCount(len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setVerticalHeaderLabels(list(summary))
+        for i, stats in enumerate(summary.values()):
+            for j, column in enumerate(columns):
+                item = QTableWidgetItem(f"¥{stats[column]:,.2f}")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(i, j, item)
+
+
+class HistoryDialog(QDialog):
+    """报价历史检索：按零件名称、客户、文件名、时间范围和金额查询本地报价历史"""
+
+    PERIODS = [("全部", None), ("最近 7 天", 7), ("最近 30 天", 30), ("最近 6 个月", 182), ("最近 1 年", 365)]
+    COLUMNS = ["时间", "客户", "文件", "打印时长", "零件数量", "实际费用"]
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("报价历史")
+        self.resize(980, 680)
+        self.history = history
+        self.quote_ids = []
+
+        layout = QVBoxLayout(self)
+
+        grid = QGridLayout()
+        self.part_input = QLineEdit(self)
+        self.part_input.setPlaceholderText("零件名称（开头匹配）")
+        self.customer_input = QLineEdit(self)
+        self.customer_input.setPlaceholderText("客户（开头匹配）")
+        self.source_input = QLineEdit(self)
+        self.source_input.setPlaceholderText("文件名（开头匹配）")
+        self.period_combo = QComboBox(self)
+        for label, days in self.PERIODS:
+            self.period_combo.addItem(label, days)
+        self.min_cost_input = QLineEdit(self)
+        self.min_cost_input.setPlaceholderText("不限")
+        self.max_cost_input = QLineEdit(self)
+        self.max_cost_input.setPlaceholderText("不限")
+        for column, (title, widget) in enumerate([("零件", self.part_input), ("客户", self.customer_input),
+                                                  ("文件", self.source_input)]):
+            grid.addWidget(QLabel(title, self), 0, column * 2)
+            grid.addWidget(widget, 0, column * 2 + 1)
+        for column, (title, widget) in enumerate([("时间", self.period_combo), ("实付不低于", self.min_cost_input),
+                                                  ("实付不高于", self.max_cost_input)]):
+            grid.addWidget(QLabel(title, self), 1, column * 2)
+            grid.addWidget(widget, 1, column * 2 + 1)
+        layout.addLayout(grid)
+
+        controls = QHBoxLayout()
+        self.summary_label = QLabel(self)
+        controls.addWidget(self.summary_label, stretch=1)
+        search_button = QPushButton("查询", self)
+        search_button.setDefault(True)
+        search_button.clicked.connect(self.run_search)
+        controls.addWidget(search_button)
+        layout.addLayout(controls)
+        for widget in (self.part_input, self.customer_input, self.source_input,
+                       self.min_cost_input, self.max_cost_input):
+            widget.returnPressed.connect(self.run_search)
+
+        # 后台写入出错时提示，否则丢失的报价无从察觉
+        self.error_label = QLabel(self)
+        self.error_label.setStyleSheet("color: red;")
+        self.error_label.setWordWrap(True)
+        self.error_label.setVisible(False)
+        layout.addWidget(self.error_label)
+
+        self.result_table = QTableWidget(self)
+        self.result_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.result_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.result_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.result_table.setColumnCount(len(self.COLUMNS))
+        self.result_table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.result_table.horizontalHeader().setStretchLastSection(True)
+        self.result_table.itemSelectionChanged.connect(self.show_details)
+        layout.addWidget(self.result_table, stretch=3)
+
+        self.details_output = QPlainTextEdit(self)
+        self.details_output.setReadOnly(True)
+        layout.addWidget(self.details_output, stretch=2)
+
+        self.run_search()
+
+    def read_cost(self, widget, label):
+        text = widget.text().strip()
+        if not text:
+            return None
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError(f"{label}无效，请输入数字！") from None
+
+    def run_search(self):
+        try:
+            min_cost = self.read_cost(self.min_cost_input, "最低实付")
+            max_cost = self.read_cost(self.max_cost_input, "最高实付")
+            days = self.period_combo.currentData()
+            started = time.perf_counter()
+            rows, total = self.history.search(
+                part=self.part_input.text().strip(), customer=self.customer_input.text().strip(),
+                source=self.source_input.text().strip(),
+                since=time.time() - days * 86400 if days else None,
+                min_cost=min_cost, max_cost=max_cost)
+        except ValueError as e:
+            QMessageBox.warning(self, "查询条件错误", str(e))
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+
+        shown = f"，显示最新的 {len(rows):,} 条" if len(rows) < total else ""
+        total_text = f"{total:,} 条以上" if total >= COUNT_LIMIT else f"{total:,} 条"
+        self.summary_label.setText(
+            f"共 {self.history.count():,} 条报价，命中 {total_text}{shown}，用时 {elapsed:.1f} ms")
+        if self.history.write_error is not None:
+            self.error_label.setText(f"⚠️ 有 {self.history.dropped:,} 条报价未能写入历史：{self.history.write_error}")
+            self.error_label.setVisible(True)
+
+        table = self.result_table
+        table.setUpdatesEnabled(False)
+        table.clearContents()
+        table.setRowCount(len(rows))
+        self.quote_ids = [row["id"] for row in rows]
+        for i, row in enumerate(rows):
+            values = [datetime.fromtimestamp(row["created_at"]).strftime("%Y-%m-%d %H:%M"),
+                      row["customer"] or "", row["source_name"], row["duration"],
+                      f"{row['part_count']:,}", f"¥{row['actual_cost']:,.2f}"]
+            for j, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if j >= 4:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(i, j, item)
+        table.setUpdatesEnabled(True)
+        self.details_output.clear()
+
+    def show_details(self):
+        selected = self.result_table.selectionModel().selectedRows()
+        if not selected:
+            return
+        record = self.history.get(self.quote_ids[selected[0].row()])
+        if record is None:
+            return
+        part_counts = record.pop("零件名称统计")
+        lines = [f"{key}：{value}" for key, value in record.items()]
+        lines.append(f"零件名称（{len(part_counts):,} 种）：")
+        lines.extend(f"  {name} × {count}" for name, count in islice(part_counts.items(), DETAIL_PART_LIMIT))
+        if len(part_counts) > DETAIL_PART_LIMIT:
+            lines.append(f"  …… 另有 {len(part_counts) - DETAIL_PART_LIMIT:,} 种零件未显示")
+        self.details_output.setPlainText("\n".join(lines))
+
+
+class PrintTimeDialog(QDialog):
+    """按层估算打印时长前设置打印机参数"""
+
+    # 字段 → (标签, 单位, 最小值, 最大值, 小数位)
+    FIELDS = {
+        "layer_thickness": ("层厚", "mm", 0.005, 1.0, 3),
+        "scan_speed": ("扫描速度", "mm/s", 1.0, 20_000.0, 0),
+        "hatch_distance": ("扫描间距", "mm", 0.005, 2.0, 3),
+        "recoat_time": ("铺粉时间", "秒/层", 0.0, 600.0, 1),
+    }
+
+    def __init__(self, machine, part_count, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("估算打印时长")
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"对已加载的 {part_count} 个 STL 零件逐层切片，估算整版的打印时长", self))
+        form = QFormLayout()
+        self.inputs = {}
+        for name, (label, unit, low, high, decimals) in self.FIELDS.items():
+            spin = QDoubleSpinBox(self)
+            spin.setRange(low, high)
+            spin.setDecimals(decimals)
+            spin.setSuffix(f" {unit}")
+            spin.setValue(getattr(machine, name))
+            form.addRow(QLabel(label, self), spin)
+            self.inputs[name] = spin
+        layout.addLayout(form)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def machine_settings(self):
+        return MachineSettings(**{name: spin.value() for name, spin in self.inputs.items()})
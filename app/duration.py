@@ -0,0 +1,109 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+
+class DurationParseError(ValueError):
+    """无法识别的打印时长"""
+
+
+_NUMBER = r"\d+(?:\.\d+)?"
+
+# 所有支持的格式合并为一个预编译正则，一次 fullmatch 即可完成识别与提取
+_DURATION_PATTERN = re.compile(rf"""
+    \s*(?:
+        # HH:MM 或 HH:MM:SS（小时数可超过 24）
+        (?P<clock_h>\d+):(?P<clock_m>[0-5]?\d)(?::(?P<clock_s>[0-5]?\d(?:\.\d+)?))?
+      |
+        # ISO-8601，例如 P1DT2H3M4S、PT90M
+        P(?:(?P<iso_w>{_NUMBER})W)?(?:(?P<iso_d>{_NUMBER})D)?
+         (?:T(?:(?P<iso_h>{_NUMBER})H)?(?:(?P<iso_m>{_NUMBER})M)?(?:(?P<iso_s>{_NUMBER})S)?)?
+      |
+        # 纯数字，按小时计
+        (?P<plain>{_NUMBER})
+      |
+        # 带单位的中英文格式，例如 11天11小时11分11秒、1d 2h 30m、2 hours 15 minutes
+        (?:(?P<days>{_NUMBER})\s*(?:天|days?|d)[\s,]*)?
+        (?:(?P<hours>{_NUMBER})\s*(?:小时|时|hours?|hrs?|h)[\s,]*)?
+        (?:(?P<minutes>{_NUMBER})\s*(?:分钟|分|minutes?|mins?|m)[\s,]*)?
+        (?:(?P<seconds>{_NUMBER})\s*(?:秒钟|秒|seconds?|secs?|s))?
+    )\s*
+""", re.VERBOSE | re.IGNORECASE)
+
+
+def _to_number(text):
+    """整数保持为 int，使换算结果与旧版逐项累加完全一致"""
+    if text is None:
+        return 0
+    return float(text) if "." in text else int(text)
+
+
+def _hours(days, hours, minutes, seconds):
+    return days * 24 + hours + minutes / 60 + seconds / 3600
+
+
+@lru_cache(maxsize=4096)
+def parse_duration(duration_str):
+    """将打印时长字符串转换为小时数，无法识别时抛出 DurationParseError"""
+    match = _DURATION_PATTERN.fullmatch(duration_str)
+    if match is None or not match.group().strip():
+        raise DurationParseError(f"无法识别的打印时长：{duration_str!r}")
+
+    groups = match.groupdict()
+    if groups["clock_h"] is not None:
+        return _hours(0, int(groups["clock_h"]), int(groups["clock_m"]), _to_number(groups["clock_s"]))
+    if groups["plain"] is not None:
+        return float(groups["plain"])
+
+    if match.group().lstrip()[:1] in ("P", "p"):
+        iso = [groups[key] for key in ("iso_w", "iso_d", "iso_h", "iso_m", "iso_s")]
+        # "P"、"PT" 这类没有任何数值的写法不合法
+        if all(value is None for value in iso) or match.group().rstrip()[-1:] in ("T", "t"):
+            raise DurationParseError(f"无法识别的打印时长：{duration_str!r}")
+        weeks, days, hours, minutes, seconds = (_to_number(value) for value in iso)
+        return _hours(weeks * 7 + days, hours, minutes, seconds)
+
+    units = [groups[key] for key in ("days", "hours", "minutes", "seconds")]
+    if all(value is None for value in units):
+        raise DurationParseError(f"无法识别的打印时长：{duration_str!r}")
+    return _hours(*(_to_number(value) for value in units))
+
+
+def format_duration(hours):
+    """把小时数格式化为“1天2小时3分4秒”（省略为 0 的单位，精确到秒），parse_duration 可原样解析"""
+    if not hours >= 0:
+        raise ValueError(f"打印时长不能为负数：{hours!r}")
+    seconds = int(round(hours * 3600))
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    text = "".join(f"{value}{unit}" for value, unit in ((days, "天"), (hours, "小时"), (minutes, "分"), (seconds, "秒"))
+                   if value)
+    return text or "0秒"
+
+
+def parse_durations(values, errors="raise"):
+    """批量转换打印时长，返回 float64 数组
+
+    values 可以是任意可迭代对象（列表、Excel 列、DataFrame 列等），数值按小时计。
+    errors="raise" 时遇到非法值抛出 DurationParseError 并指明位置，
+    errors="coerce" 时非法值记为 NaN。
+    """
+    if errors not in ("raise", "coerce"):
+        raise ValueError(f"errors 只能为 'raise' 或 'coerce'，而不是 {errors!r}")
+
+    hours = []
+    for index, value in enumerate(values):
+        try:
+            if isinstance(value, str):
+                hours.append(parse_duration(value))
+            elif isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+                hours.append(float(value))
+            else:
+                raise DurationParseError(f"无法识别的打印时长：{value!r}")
+        except DurationParseError as e:
+            if errors == "raise":
+                raise DurationParseError(f"第 {index + 1} 项：{e}") from None
+            hours.append(np.nan)
+    return np.asarray(hours, dtype=np.float64)
@@ -1,128 +1,184 @@
 from datetime import datetime
-import pandas as pd
-import subprocess
 import os
-from PyQt5.QtWidgets import QMessageBox
 
-def export_to_excel(result, filename="多零件预算报告.xlsx"):
-    """专业级多零件报表"""
+from parts import as_part_table
+
+# 定价标准的单位
+PRICING_UNITS = {
+    "钛粉密度": "g/cm³",
+    "致密系数": "",  # 无单位
+    "用量比例": "",  # 无单位
+    "材料单价": "元/公斤",
+    "机时费率": "元/小时",
+    "氩气单价": "元",
+    "氩气耗率": "升/小时",
+    "后处理费": "元",
+    "折扣优惠": ""  # 无单位
+}
+
+PROGRESS_INTERVAL = 1000  # 每写入多少行汇报一次进度
+
+
+def _input_rows(result):
+    """逐行产出输入参数区块，零件清单不整体展开到内存"""
+    yield ['总打印时长', result['输入参数']['总打印时长']]
+    yield ['零件数量', f"{result['输入参数']['零件数量']}件"]
+    table = as_part_table(result['输入参数']['零件清单'])
+    if table.support_method:
+        yield ['支撑体积估算', table.support_method]
+
+    # 直接按列读取 PartTable，不构造零件字典
+    for i, (name, volume, support_volume) in enumerate(table.rows(), 1):
+        yield [f'零件{i}名称', name]
+        yield [f'零件{i}体积', f"{volume:.3f}mm³"]
+        yield [f'零件{i}支撑体积', f"{support_volume:.3f}mm³"]
+
+
+def _pricing_rows(result):
+    # 为定价标准添加单位
+    for param, value in result['定价标准'].items():
+        yield [param, f"{value} {PRICING_UNITS.get(param, '')}".strip()]
+
+
+def _close_workbook(workbook):
+    from xlsxwriter.exceptions import FileCreateError
+
+    try:
+        workbook.close()
+    except FileCreateError as e:
+        # xlsxwriter 会把文件被占用包装成 FileCreateError，还原为 PermissionError 供界面层提示重试
+        cause = e.args[0] if e.args else None
+        if isinstance(cause, PermissionError):
+            raise cause from None
+        raise
+
+
+def export_to_excel(result, filename="多零件预算报告.xlsx", progress=None):
+    """专业级多零件报表
+
+    使用 xlsxwriter 的 constant_memory 模式逐行写入，内存占用与零件数量无关。
+    只负责写文件，文件被占用时抛出 PermissionError，提示与重试由界面层处理。
+    progress(done, total) 为可选的进度回调，total 为预计写入的总行数。
+    """
+    # xlsxwriter 只在导出时才需要，延迟导入以缩短程序启动时间
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(filename, {'constant_memory': True})
     try:
-        with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
-            workbook = writer.book
-            worksheet = workbook.add_worksheet('预算总览')
-            
-            # 高级格式配置
-            header_format = workbook.add_format({
-                'bold': True, 'bg_color': '#4F81BD', 'font_color': '#FFFFFF', 'border': 1,
-                'align': 'center', 'valign': 'vcenter'
-            })
-            part_name_format = workbook.add_format({
-                'bold': True, 'bg_color': '#D9E1F2', 'border': 1,
-                'align': 'center', 'valign': 'vcenter'
-            })
-            part_detail_format = workbook.add_format({
-                'bg_color': '#FCE4D6', 'border': 1,
-                'align': 'center', 'valign': 'vcenter'
-            })
-            currency_format = workbook.add_format({
-                'num_format': '¥##0.00', 'bg_color': '#E2EFDA', 'border': 1,
-                'align': 'center', 'valign': 'vcenter'
-            })
-            number_format = workbook.add_format({
-                'num_format': '0.00', 'bg_color': '#FFF2CC', 'border': 1,
-                'align': 'center', 'valign': 'vcenter'
-            })
-            normal_format = workbook.add_format({
-                'bg_color': '#FFFFFF', 'border': 1,
-                'align': 'center', 'valign': 'vcenter'
-            })
-            
-            # 标题区块
-            worksheet.merge_range('A1:B1', '金属3D打印预算报告',
-                                  workbook.add_format({
-                                      'bold': True, 'font_size': 14, 'bg_color': '#4F81BD', 'font_color': '#FFFFFF',
-                                      'align': 'center', 'border': 1
-                                  }))
-            worksheet.merge_range('A2:B2', f"生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M')}",
-                                  normal_format)
-            
-            # 输入参数动态生成
-            params = [
-                ['总打印时长', result['输入参数']['总打印时长']],
-                ['零件数量', f"{result['输入参数']['零件数量']}件"]
-            ]
-            
-            # 修改零件体积提取逻辑，直接从字典中获取数据
-            for i, part in enumerate(result['输入参数']['零件清单'], 1):
-                params.extend([
-                    [f'零件{i}名称', part['name']],
-                    [f'零件{i}体积', f"{part['volume']:.3f}mm³"],
-                    [f'零件{i}支撑体积', f"{part['support_volume']:.3f}mm³"]
-                ])
-            
-            # 定义定价标准的单位
-            pricing_units = {
-                "钛粉密度": "g/cm³",
-                "致密系数": "",  # 无单位
-                "用量比例": "",  # 无单位
-                "材料单价": "元/公斤",
-                "机时费率": "元/小时",
-                "氩气单价": "元",
-                "氩气耗率": "升/小时",
-                "后处理费": "元",
-                "折扣优惠": ""  # 无单位
-            }
-            
-            # 为定价标准添加单位
-            pricing_standard_with_units = [
-                [param, f"{value} {pricing_units.get(param, '')}".strip()]
-                for param, value in result['定价标准'].items()
-            ]
-            
-            # 数据写入逻辑
-            def write_section(data, start_row, title):
-                worksheet.merge_range(start_row, 0, start_row, 1, title, header_format)
-                for row_idx, (label, value) in enumerate(data, start_row + 1):
-                    if "零件" in label and "名称" in label:  # 零件名称行加背景颜色
-                        cell_format = part_name_format
-                    elif "体积" in label:  # 零件体积和支撑体积行加背景颜色
-                        cell_format = part_detail_format
-                    elif title == "费用明细":
-                        if "费用" in label or "金额" in label or "后处理费" in label:  # 判断是否为货币
-                            cell_format = currency_format
-                        else:
-                            cell_format = normal_format
+        worksheet = workbook.add_worksheet('预算总览')
+
+        # 高级格式配置
+        header_format = workbook.add_format({
+            'bold': True, 'bg_color': '#4F81BD', 'font_color': '#FFFFFF', 'border': 1,
+            'align': 'center', 'valign': 'vcenter'
+        })
+        part_name_format = workbook.add_format({
+            'bold': True, 'bg_color': '#D9E1F2', 'border': 1,
+            'align': 'center', 'valign': 'vcenter'
+        })
+        part_detail_format = workbook.add_format({
+            'bg_color': '#FCE4D6', 'border': 1,
+            'align': 'center', 'valign': 'vcenter'
+        })
+        currency_format = workbook.add_format({
+            'num_format': '¥##0.00', 'bg_color': '#E2EFDA', 'border': 1,
+            'align': 'center', 'valign': 'vcenter'
+        })
+        number_format = workbook.add_format({
+            'num_format': '0.00', 'bg_color': '#FFF2CC', 'border': 1,
+            'align': 'center', 'valign': 'vcenter'
+        })
+        normal_format = workbook.add_format({
+            'bg_color': '#FFFFFF', 'border': 1,
+            'align': 'center', 'valign': 'vcenter'
+        })
+
+        # 智能列宽设置
+        worksheet.set_column('A:A', 25)
+        worksheet.set_column('B:B', 25)
+
+        # 标题区块（constant_memory 模式下必须按行号递增顺序写入）
+        worksheet.merge_range('A1:B1', '金属3D打印预算报告',
+                              workbook.add_format({
+                                  'bold': True, 'font_size': 14, 'bg_color': '#4F81BD', 'font_color': '#FFFFFF',
+                                  'align': 'center', 'border': 1
+                              }))
+        worksheet.merge_range('A2:B2', f"生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                              normal_format)
+
+        allocation = result.get('费用分摊')
+        total_rows = 2 + 3 * result['输入参数']['零件数量'] + len(result['定价标准']) + len(result['计算明细'])
+        if allocation is not None:
+            total_rows += len(allocation)
+        if getattr(result['输入参数']['零件清单'], "support_method", None):
+            total_rows += 1
+        written = 0
+
+        # 数据写入逻辑
+        def write_section(rows, start_row, title):
+            nonlocal written
+            worksheet.merge_range(start_row, 0, start_row, 1, title, header_format)
+            row_idx = start_row
+            for row_idx, (label, value) in enumerate(rows, start_row + 1):
+                if "零件" in label and "名称" in label:  # 零件名称行加背景颜色
+                    cell_format = part_name_format
+                elif "体积" in label:  # 零件体积和支撑体积行加背景颜色
+                    cell_format = part_detail_format
+                elif title == "费用明细":
+                    if "费用" in label or "金额" in label or "后处理费" in label:  # 判断是否为货币
+                        cell_format = currency_format
                     else:
-                        cell_format = number_format if isinstance(value, (int, float)) else normal_format
-                    
-                    worksheet.write(row_idx, 0, label, cell_format)
-                    worksheet.write(row_idx, 1, value, cell_format)
-                return start_row + len(data) + 2
-            
-            current_row = 3
-            current_row = write_section(params, current_row, "输入参数")
-            current_row = write_section(pricing_standard_with_units, current_row, "定价标准")
-            current_row = write_section(
-                [[k, v] for k, v in result['计算明细'].items()],
-                current_row, "费用明细"
-            )
-            
-            # 智能列宽设置
-            worksheet.set_column('A:A', 25)
-            worksheet.set_column('B:B', 25)
-            
-            QMessageBox.information(None, "导出成功", f"Excel 报表已成功保存至：\n{filename}")
-            normalized_path = os.path.normpath(filename)
-            subprocess.Popen(f'explorer /select,"{normalized_path}"')
-
-    except PermissionError:
-        msg_box = QMessageBox()
-        msg_box.setWindowTitle("文件被占用")
-        msg_box.setText(f"文件 {filename} 正在被占用，无法写入。\n\n请关闭该文件后重试。")
-        msg_box.setIcon(QMessageBox.Warning)
-        retry_button = msg_box.addButton("重试", QMessageBox.AcceptRole)
-        cancel_button = msg_box.addButton("取消", QMessageBox.RejectRole)
-        msg_box.exec_()
-
-        if msg_box.clickedButton() == retry_button:
-            export_to_excel(result, filename)  # 递归重试
\ No newline at end of file
+                        cell_format = normal_format
+                else:
+                    cell_format = number_format if isinstance(value, (int, float)) else normal_format
+
+                worksheet.write_row(row_idx, 0, (label, value), cell_format)
+                written += 1
+                if progress is not None and written % PROGRESS_INTERVAL == 0:
+                    progress(written, total_rows)
+            return row_idx + 2
+
+        current_row = 3
+        current_row = write_section(_input_rows(result), current_row, "输入参数")
+        current_row = write_section(_pricing_rows(result), current_row, "定价标准")
+        write_section(result['计算明细'].items(), current_row, "费用明细")
+
+        # 逐零件费用分摊单独成表，每个零件一行
+        if allocation is not None:
+            sheet = workbook.add_worksheet('费用分摊')
+            fields = list(allocation.fields)
+            headers = ['序号', '零件名称', '零件体积(mm³)', '支撑体积(mm³)'] + fields
+            sheet.set_column(0, 0, 8)
+            sheet.set_column(1, 1, 25)
+            sheet.set_column(2, len(headers) - 1, 16)
+            sheet.merge_range(0, 0, 0, len(headers) - 1, f"逐零件费用分摊（{allocation.describe()}）", header_format)
+            sheet.write_row(1, 0, headers, header_format)
+            columns = [allocation.fields[field].tolist() for field in fields]
+            row_idx = 1
+            for i, (name, volume, support_volume) in enumerate(allocation.parts.rows()):
+                row_idx = i + 2
+                sheet.write_row(row_idx, 0, (i + 1, name), normal_format)
+                sheet.write_row(row_idx, 2, (volume, support_volume), number_format)
+                sheet.write_row(row_idx, 4, [column[i] for column in columns], currency_format)
+                written += 1
+                if progress is not None and written % PROGRESS_INTERVAL == 0:
+                    progress(written, total_rows)
+            totals = allocation.totals()
+            sheet.write_row(row_idx + 1, 0, ('合计', ''), part_name_format)
+            sheet.write_row(row_idx + 1, 2, (allocation.parts.volume_sum, allocation.parts.support_volume_sum),
+                            number_format)
+            sheet.write_row(row_idx + 1, 4, [totals[field] for field in fields], currency_format)
+    except BaseException:
+        # 中途出错或被取消时不留下半截报表
+        try:
+            workbook.close()
+        except Exception:
+            pass
+        else:
+            os.remove(filename)
+        raise
+    _close_workbook(workbook)
+
+    if progress is not None:
+        progress(total_rows, total_rows)
+    return filename
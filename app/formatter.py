@@ -1,14 +1,23 @@
 import unicodedata
+from functools import lru_cache
 
+from parts import PartTable
+
+REPORT_CHUNK_LINES = 2000  # 分批写入文件或界面时每批的行数
+
+
+@lru_cache(maxsize=None)
+def _char_width(char):
+    """单个字符的显示宽度，按码位缓存"""
+    return 2 if unicodedata.east_asian_width(char) in ('F', 'W') else 1  # 全角字符占 2 列
+
+
+@lru_cache(maxsize=4096)
 def get_display_width(text):
     """计算字符串的显示宽度"""
-    width = 0
-    for char in text:
-        if unicodedata.east_asian_width(char) in ('F', 'W'):  # 全角字符
-            width += 2
-        else:  # 半角字符
-            width += 1
-    return width
+    if text.isascii():
+        return len(text)
+    return sum(map(_char_width, text))
 
 def center_text(text, total_width):
     """根据显示宽度居中字符串"""
@@ -16,19 +25,84 @@ def center_text(text, total_width):
     padding = (total_width - text_width) // 2
     return " " * padding + text + " " * padding
 
-def format_terminal_output(result, char_count):
-    
-    """增强型终端报表，支持对齐"""
-    char_count = char_count - 0
-    border = "=" * char_count
+# 可单独刷新的报表行：正数为从开头数的行号，负数为从结尾倒数的行号
+REPORT_LINE_POSITIONS = {
+    "总打印时长": 5,
+    "材料费用": -9,
+    "机时费用": -8,
+    "氩气费用": -7,
+    "后处理费": -6,
+    "总费用": -4,
+    "折扣优惠": -3,
+    "实际费用": -2,
+}
+
+_COST_LABELS = {
+    "材料费用": "  材料成本：",
+    "机时费用": "  机时费用：",
+    "氩气费用": "  氩气消耗：",
+    "后处理费": "  后处理费：",
+    "总费用": "  合计金额：",
+    "实际费用": "  实付金额：",
+}
+
+def report_line(field, result, char_count):
+    """生成报表中某一可刷新行的文本，字段见 REPORT_LINE_POSITIONS"""
+    left_width = 20
+    right_width = char_count - left_width - 7
+    if field == "总打印时长":
+        return f"  打印时长：{result['输入参数']['总打印时长']}"
+    if field == "折扣优惠":
+        return f"{'  折扣优惠：'.ljust(left_width)}{str(result['定价标准']['折扣优惠']).rjust(right_width)}"
+    return f"{_COST_LABELS[field].ljust(left_width)}{'¥{:>10,.2f}'.format(result['计算明细'][field]).rjust(right_width)}"
+
+def _iter_part_lines(parts, max_parts=None):
+    """逐行产出零件清单；max_parts 不为 None 时只显示前 max_parts 个零件"""
+    if isinstance(parts, PartTable):
+        # 按列读取，只格式化需要显示的零件
+        visible = parts if max_parts is None else parts[:max_parts]
+        for i, (name, total) in enumerate(zip(visible.names, visible.total_volumes.tolist())):
+            yield f"  零件{i+1}: {name}（总体积：{total:.3f}mm³）"
+        if len(visible) < len(parts):
+            yield f"  …… 另有 {len(parts) - len(visible):,} 个零件未显示，完整清单请保存报表"
+        elif not len(parts):
+            yield ""
+        return
 
-    # 确保零件清单中的每个元素是字典
-    parts_info = "\n".join([
-        f"  零件{i+1}: {part['name']}（总体积：{part['volume'] + part['support_volume']:.3f}mm³）"
-        if isinstance(part, dict) else f"  零件{i+1}: {part}"  # 如果不是字典，直接输出字符串
-        for i, part in enumerate(result['输入参数']['零件清单'])
-    ])
+    shown = 0
+    for i, part in enumerate(parts):
+        if max_parts is not None and i >= max_parts:
+            yield f"  …… 另有 {len(parts) - max_parts:,} 个零件未显示，完整清单请保存报表"
+            return
+        if isinstance(part, dict):
+            yield f"  零件{i+1}: {part['name']}（总体积：{part['volume'] + part['support_volume']:.3f}mm³）"
+        else:  # 如果不是字典，直接输出字符串
+            yield f"  零件{i+1}: {part}"
+        shown += 1
+    if not shown:
+        yield ""
 
+
+def _iter_allocation_lines(allocation, max_parts=None):
+    """逐行产出逐零件分摊金额，与零件清单一样在摘要模式下截断"""
+    yield f"  分摊方式：{allocation.describe()}"
+    count = len(allocation) if max_parts is None else min(len(allocation), max_parts)
+    names = allocation.parts.names
+    totals = allocation.fields["总费用"][:count].tolist()
+    actuals = allocation.fields["实际费用"][:count].tolist()
+    for i in range(count):
+        yield f"  零件{i+1}: {names[i]}（合计：¥{totals[i]:,.2f}，实付：¥{actuals[i]:,.2f}）"
+    if count < len(allocation):
+        yield f"  …… 另有 {len(allocation) - count:,} 个零件未显示，完整清单请保存报表"
+
+
+def iter_report_lines(result, char_count, max_parts=None):
+    """增强型终端报表，逐行产出，支持对齐
+
+    max_parts 为 None 时输出完整零件清单；否则只保留前 max_parts 个零件（摘要模式），
+    其余各行不变，REPORT_LINE_POSITIONS 同样适用。
+    结果中带有“费用分摊”（见 allocation.attach_allocation）时，在费用明细之前列出逐零件分摊金额。
+    """
     # 使用宽度感知的居中方法
     title = " 预算计算结果 "
     border = "=" * char_count
@@ -38,26 +112,57 @@ def format_terminal_output(result, char_count):
     right_width = char_count - left_width - 7
     dash_line = "  " + "-" * (char_count - 4) + "  "
 
-    output = [
-        f"{border}",
-        centered_title,
-        border,
-        "[打印参数]",
-        f"  零件数量：{result['输入参数']['零件数量']}件",
-        f"  打印时长：{result['输入参数']['总打印时长']}",
-        "\n[零件清单]",
-        f"{parts_info}",
-        "\n[费用明细]",
-        f"{'  项目名称'.ljust(left_width)}{'金额'.rjust(right_width - 1)}",
-        dash_line,
-        f"{'  材料成本：'.ljust(left_width)}{'¥{:>10,.2f}'.format(result['计算明细']['材料费用']).rjust(right_width)}",
-        f"{'  机时费用：'.ljust(left_width)}{'¥{:>10,.2f}'.format(result['计算明细']['机时费用']).rjust(right_width)}",
-        f"{'  氩气消耗：'.ljust(left_width)}{'¥{:>10,.2f}'.format(result['计算明细']['氩气费用']).rjust(right_width)}",
-        f"{'  后处理费：'.ljust(left_width)}{'¥{:>10,.2f}'.format(result['计算明细']['后处理费']).rjust(right_width)}",
-        dash_line,
-        f"{'  合计金额：'.ljust(left_width)}{'¥{:>10,.2f}'.format(result['计算明细']['总费用']).rjust(right_width)}",
-        f"{'  折扣优惠：'.ljust(left_width)}{str(result['定价标准']['折扣优惠']).rjust(right_width)}",
-        f"{'  实付金额：'.ljust(left_width)}{'¥{:>10,.2f}'.format(result['计算明细']['实际费用']).rjust(right_width)}",
-        border
-    ]
-    return "\n".join(output)
\ No newline at end of file
+    yield border
+    yield centered_title
+    yield border
+    yield "[打印参数]"
+    yield f"  零件数量：{result['输入参数']['零件数量']}件"
+    yield report_line("总打印时长", result, char_count)
+    yield ""
+    yield "[零件清单]"
+    yield from _iter_part_lines(result['输入参数']['零件清单'], max_parts)
+    support_method = getattr(result['输入参数']['零件清单'], "support_method", None)
+    if support_method:
+        yield f"  支撑体积：{support_method}"
+    if result.get('费用分摊') is not None:
+        yield ""
+        yield "[费用分摊]"
+        yield from _iter_allocation_lines(result['费用分摊'], max_parts)
+    yield ""
+    yield "[费用明细]"
+    yield f"{'  项目名称'.ljust(left_width)}{'金额'.rjust(right_width - 1)}"
+    yield dash_line
+    yield report_line("材料费用", result, char_count)
+    yield report_line("机时费用", result, char_count)
+    yield report_line("氩气费用", result, char_count)
+    yield report_line("后处理费", result, char_count)
+    yield dash_line
+    yield report_line("总费用", result, char_count)
+    yield report_line("折扣优惠", result, char_count)
+    yield report_line("实际费用", result, char_count)
+    yield border
+
+
+def iter_report_chunks(result, char_count, max_parts=None, chunk_lines=REPORT_CHUNK_LINES):
+    """按 chunk_lines 行一批产出报表文本，各批之间以换行连接即为完整报表"""
+    batch = []
+    for line in iter_report_lines(result, char_count, max_parts):
+        batch.append(line)
+        if len(batch) >= chunk_lines:
+            yield "\n".join(batch)
+            batch = []
+    if batch:
+        yield "\n".join(batch)
+
+
+def write_report(result, file, char_count, max_parts=None):
+    """把报表分批写入已打开的文本文件，内容与 format_terminal_output 相同，返回写入的字符数"""
+    written = 0
+    for i, chunk in enumerate(iter_report_chunks(result, char_count, max_parts)):
+        written += file.write(chunk if i == 0 else "\n" + chunk)
+    return written
+
+
+def format_terminal_output(result, char_count, max_parts=None):
+    """增强型终端报表，支持对齐"""
+    return "\n".join(iter_report_lines(result, char_count, max_parts))
@@ -0,0 +1,292 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from parts import PartTable
+
+STL_HEADER_BYTES = 80
+# 二进制 STL 的三角形记录：法向量、三个顶点（均为 little-endian float32）和 2 字节属性，共 50 字节
+STL_RECORD = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+# 计算体积时每次转换为 float64 的三角形数；分块的临时数组能留在 CPU 缓存中，比整体计算快一倍以上
+VOLUME_CHUNK = 1 << 14
+# 并行导入时平均每个进程分到的任务数：每个任务处理一组文件，只传回几个数组，
+# 任务数多一些便于负载均衡和汇报进度
+IMPORT_TASKS_PER_WORKER = 8
+# 判断以 "solid" 开头的文件是否为 ASCII 格式时读取的字节数，ASCII STL 的第一个 facet 总在文件开头附近
+ASCII_SNIFF_BYTES = 1024
+
+_ASCII_VERTEX = re.compile(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)")
+_ASCII_FACET = re.compile(rb"\bfacet\b")
+
+
+class MeshLoadError(ValueError):
+    """网格文件无法读取"""
+
+    def __init__(self, file_path, message):
+        self.file_path = file_path
+        self.message = message
+        super().__init__(f"{file_path}：{message}")
+
+    def __reduce__(self):
+        return MeshLoadError, (self.file_path, self.message)
+
+
+class Mesh:
+    """三角网格：triangles 为 (N, 3, 3) 的顶点坐标数组，单位 mm
+
+    二进制 STL 的 triangles 是内存映射文件上的跨步视图，不复制三角形数据。
+    """
+
+    __slots__ = ("name", "path", "triangles")
+
+    def __init__(self, name, triangles, path=None):
+        self.name = name
+        self.path = path
+        self.triangles = triangles
+
+    def __len__(self):
+        return len(self.triangles)
+
+    def volume(self):
+        """封闭体积（mm³），法向朝内的网格同样给出正值"""
+        return abs(signed_volume(self.triangles))
+
+    def bounds(self):
+        """包围盒 (最小角点, 最大角点)"""
+        if not len(self):
+            return np.zeros(3), np.zeros(3)
+        # 逐坐标在跨步视图上归约：沿长度为 3 的轴归约很慢，reshape 还会复制整个映射数组
+        coords = [self.triangles[:, :, k] for k in range(3)]
+        return (np.array([c.min() for c in coords], dtype=np.float64),
+                np.array([c.max() for c in coords], dtype=np.float64))
+
+    def __repr__(self):
+        return f"Mesh({self.name!r}, {len(self)} 个三角形)"
+
+
+def read_stl(path):
+    """读取 STL 文件，二进制格式用内存映射零拷贝读取，ASCII 格式逐顶点解析"""
+    path = os.fspath(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(STL_HEADER_BYTES + 4)
+
+    if len(head) == STL_HEADER_BYTES + 4:
+        count = int(np.frombuffer(head, "<u4", count=1, offset=STL_HEADER_BYTES)[0])
+        expected = STL_HEADER_BYTES + 4 + count * STL_RECORD.itemsize
+        # 很多 CAD 导出的二进制 STL 文件头也以 "solid" 开头，先按文件大小判断是否为二进制；
+        # 文件末尾有多余字节时，再看开头附近有没有 ASCII 格式的 facet
+        if size == expected or (size > expected and not _looks_ascii(path, head)):
+            return Mesh(name, _map_triangles(path, count), path)
+        if not head.lstrip().startswith(b"solid"):
+            raise MeshLoadError(path, f"文件不完整：应有 {count} 个三角形（{expected} 字节），实际只有 {size} 字节")
+    elif not head.lstrip().startswith(b"solid"):
+        raise MeshLoadError(path, "不是有效的 STL 文件")
+    return Mesh(name, _parse_ascii(path), path)
+
+
+def _looks_ascii(path, head):
+    if not head.lstrip().startswith(b"solid"):
+        return False
+    with open(path, "rb") as f:
+        return _ASCII_FACET.search(f.read(ASCII_SNIFF_BYTES)) is not None
+
+
+def _map_triangles(path, count):
+    if count == 0:
+        return np.empty((0, 3, 3), dtype=np.float32)
+    records = np.memmap(path, dtype=STL_RECORD, mode="r", offset=STL_HEADER_BYTES + 4, shape=(count,))
+    return records["vertices"]
+
+
+def _parse_ascii(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    vertices = _ASCII_VERTEX.findall(data)
+    if not vertices:
+        raise MeshLoadError(path, "未找到任何三角形")
+    if len(vertices) % 3:
+        raise MeshLoadError(path, f"顶点数 {len(vertices)} 不是 3 的倍数")
+    try:
+        # 先得到 bytes 数组再整体转换为浮点数，避免逐个调用 float()
+        return np.array(vertices, dtype=bytes).astype(np.float64).reshape(-1, 3, 3)
+    except ValueError as e:
+        raise MeshLoadError(path, f"顶点坐标无效：{e}") from None
+
+
+def signed_volume(triangles, chunk=VOLUME_CHUNK):
+    """有向四面体求和：V = Σ v0 · (v1 × v2) / 6
+
+    分块转换为 float64 计算，并把坐标平移到第一个顶点附近以减小大坐标下的舍入误差；
+    三角形数组本身不复制。
+    """
+    if not len(triangles):
+        return 0.0
+    origin = np.asarray(triangles[0, 0], dtype=np.float64)
+    total = 0.0
+    for start in range(0, len(triangles), chunk):
+        block = np.asarray(triangles[start:start + chunk], dtype=np.float64) - origin
+        a, b, c = block[:, 0], block[:, 1], block[:, 2]
+        # 手写叉积比 np.cross 少一次中间数组拼接
+        cross_x = b[:, 1] * c[:, 2] - b[:, 2] * c[:, 1]
+        cross_y = b[:, 2] * c[:, 0] - b[:, 0] * c[:, 2]
+        cross_z = b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0]
+        total += float(np.dot(a[:, 0], cross_x) + np.dot(a[:, 1], cross_y) + np.dot(a[:, 2], cross_z))
+    return total / 6.0
+
+
+def load_stl_parts(paths, progress=None, support=None, cache=None):
+    """读取多个 STL 文件，每个文件作为一个零件（名称取文件名），返回 PartTable
+
+    support 为 support.SupportSettings 时按悬垂面估算支撑体积，否则支撑体积记为 0。
+    cache 为 geometry_cache.GeometryCache 时，内容和参数都相同的网格直接复用上次的结果。
+    progress(done, total) 为可选的进度回调，每读完一个文件调用一次。
+    """
+    paths = [os.fspath(path) for path in paths]
+    names = []
+    volumes = np.empty(len(paths), dtype=np.float64)
+    support_volumes = np.zeros(len(paths), dtype=np.float64)
+    for i, path in enumerate(paths):
+        if progress is not None:
+            progress(i, len(paths))
+        names.append(os.path.splitext(os.path.basename(path))[0])
+        volumes[i], support_volumes[i] = _mesh_volumes(path, support, cache)
+    if progress is not None:
+        progress(len(paths), len(paths))
+    return PartTable(names, volumes, support_volumes, support.describe() if support is not None else None)
+
+
+def _mesh_volumes(path, support, cache=None):
+    """单个网格的 (体积, 支撑体积)"""
+    def measure():
+        mesh = read_stl(path)
+        if support is None:
+            return mesh.volume(), 0.0
+        from support import estimate_support
+        return mesh.volume(), estimate_support(mesh, support).volume
+
+    if cache is None:
+        return measure()
+    from geometry_cache import cached_mesh_volumes
+    return cached_mesh_volumes(cache, path, support, measure)
+
+
+def find_stl_files(directory):
+    """递归查找目录下的 STL 文件（扩展名不区分大小写），按路径排序"""
+    found = []
+    for root, _, files in os.walk(directory):
+        found.extend(os.path.join(root, name) for name in files if name.lower().endswith(".stl"))
+    return sorted(found)
+
+
+class MeshImport:
+    """批量导入结果：parts 为成功读取的零件表，paths 为对应的文件，errors 为 (文件, 错误信息) 列表"""
+
+    __slots__ = ("parts", "paths", "errors")
+
+    def __init__(self, parts, paths, errors):
+        self.parts = parts
+        self.paths = paths
+        self.errors = errors
+
+    def __repr__(self):
+        return f"MeshImport({len(self.paths)} 个零件, {len(self.errors)} 个文件失败)"
+
+
+def _measure_files(paths, support, cache=None):
+    """在工作进程中读取一组网格，返回 (体积数组, 支撑体积数组, [(下标, 错误信息)])
+
+    只传回两个 float64 数组和少量错误信息，不序列化任何顶点数据；单个文件出错不影响同组的其他文件。
+    cache 为 GeometryCache.spec 时在工作进程中打开（见 geometry_cache.shared_cache）。
+    """
+    if isinstance(cache, tuple):
+        from geometry_cache import shared_cache
+        cache = shared_cache(*cache)
+    volumes = np.full(len(paths), np.nan)
+    support_volumes = np.zeros(len(paths))
+    errors = []
+    for i, path in enumerate(paths):
+        try:
+            volumes[i], support_volumes[i] = _mesh_volumes(path, support, cache)
+        except MeshLoadError as e:
+            errors.append((i, e.message))
+        except Exception as e:
+            errors.append((i, f"{type(e).__name__}: {e}"))
+    return volumes, support_volumes, errors
+
+
+def spawn_pool(workers):
+    """以 spawn 方式启动的进程池
+
+    界面在 QThreadPool 的线程中创建进程池，多线程进程用 fork 启动子进程可能死锁；
+    spawn 也与 Windows 上的行为一致（见 main.py 中的 freeze_support）。
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def import_meshes(paths, support=None, workers=None, progress=None, cache=None):
+    """用进程池并行读取大量 STL 文件并计算体积（及支撑体积），返回 MeshImport
+
+    文件按顺序分组交给 workers 个进程（默认等于 CPU 核数），各进程以内存映射读取网格，
+    只传回逐文件的体积数组；读取失败的文件记入 errors，不影响其他文件，
+    工作进程异常退出（例如内存不足被系统终止）时，受影响分组的文件同样记入 errors。
+    cache 为 geometry_cache.GeometryCache 时各进程共用同一个缓存数据库，已缓存的网格只需计算文件哈希。
+    progress(done, total) 为可选的进度回调，每完成一组文件调用一次；回调抛出异常时不再启动其余分组。
+    """
+    paths = [os.fspath(path) for path in paths]
+    total = len(paths)
+    workers = max(1, min(workers or os.cpu_count() or 1, total or 1))
+    volumes = np.empty(total)
+    support_volumes = np.empty(total)
+    errors = {}
+    if progress is not None:
+        progress(0, total)
+
+    def collect(start, result):
+        chunk_volumes, chunk_supports, chunk_errors = result
+        volumes[start:start + len(chunk_volumes)] = chunk_volumes
+        support_volumes[start:start + len(chunk_supports)] = chunk_supports
+        errors.update((start + i, message) for i, message in chunk_errors)
+
+    if workers == 1:
+        for i, path in enumerate(paths):
+            collect(i, _measure_files([path], support, cache))
+            if progress is not None:
+                progress(i + 1, total)
+    else:
+        size = max(1, -(-total // (workers * IMPORT_TASKS_PER_WORKER)))
+        with spawn_pool(workers) as pool:
+            cache_spec = cache.spec if cache is not None else None
+            futures = {pool.submit(_measure_files, paths[start:start + size], support, cache_spec): start
+                       for start in range(0, total, size)}
+            done = 0
+            try:
+                for future in as_completed(futures):
+                    start = futures[future]
+                    count = min(size, total - start)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        # 进程池损坏后尚未完成的分组都会到这里，逐组记为失败，已完成的结果照常保留
+                        result = (np.full(count, np.nan), np.zeros(count),
+                                  [(i, "读取网格的工作进程异常退出") for i in range(count)])
+                    collect(start, result)
+                    done += count
+                    if progress is not None:
+                        progress(done, total)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    ok = np.ones(total, dtype=bool)
+    ok[list(errors)] = False
+    loaded = [path for path, good in zip(paths, ok.tolist()) if good]
+    names = [os.path.splitext(os.path.basename(path))[0] for path in loaded]
+    parts = PartTable(names, volumes[ok], support_volumes[ok], support.describe() if support is not None else None)
+    return MeshImport(parts, loaded, [(paths[i], errors[i]) for i in sorted(errors)])
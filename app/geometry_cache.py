@@ -0,0 +1,307 @@
+"""几何分析结果缓存
+
+以文件内容哈希加分析参数（支撑估算参数、层厚、工作簿布局）为键，保存读取零件文件得到的逐零件数值：
+工作簿的零件名称和体积列、网格的体积和支撑体积、网格切片的逐层面积和轮廓长度。
+同一文件再次导入时只需计算哈希并查表。
+
+为了不在每次导入时都读完整个文件，文件的大小、修改时间、inode 和 ctime 都与上次相同时直接复用记录的哈希。
+这是有意的取舍：修改时间精度很粗的共享目录上，同样大小的内容改写可能被漏掉；
+对此有疑虑时用 verify=True（命令行 --rehash）每次都重新计算哈希。
+
+数值列以 little-endian float64 原始字节存放，零件名称压缩后存放，均位于一个 SQLite 文件中，
+按最近使用时间淘汰，缓存条目和文件哈希记录的总量不超过 max_bytes。
+缓存只是加速手段：读写缓存出错（例如多个进程同时写入时数据库被锁）时照常读取文件，不影响结果。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from utils import user_data_dir
+
+GEOMETRY_CACHE_VERSION = 2   # 分析算法或存储格式变化时递增，旧数据库整体重建
+GEOMETRY_CACHE_NAME = "geometry_cache.sqlite3"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+HASH_BLOCK = 1 << 20         # 计算文件哈希时每次读取的字节数
+EVICT_TARGET = 0.9           # 超过上限时淘汰到上限的这个比例，避免每次写入都触发淘汰
+FILE_ROW_BYTES = 64          # 每条文件哈希记录除路径外大约占用的字节数，计入缓存总量
+
+# 读写缓存时可以忽略的错误，出错时照常读取文件
+CACHE_ERRORS = (sqlite3.Error, OSError, TypeError, ValueError, zlib.error)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        source TEXT NOT NULL,
+        rows INTEGER NOT NULL,
+        columns INTEGER NOT NULL,
+        meta TEXT,
+        names BLOB,
+        data BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used);
+    -- 文件路径 → 内容哈希，文件状态都未变时直接复用
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        ino INTEGER NOT NULL,
+        ctime_ns INTEGER NOT NULL,
+        digest TEXT NOT NULL,
+        last_used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_files_last_used ON files(last_used);
+"""
+
+# 缓存条目和文件哈希记录按最近使用时间统一排序，从新到旧累加占用，超出目标的全部淘汰
+EVICT_QUERY = """
+    SELECT tbl, id FROM (
+        SELECT tbl, id, SUM(size) OVER (ORDER BY last_used DESC, tbl, id) AS running FROM (
+            SELECT 0 AS tbl, key AS id, size, last_used FROM entries
+            UNION ALL
+            SELECT 1, path, length(CAST(path AS BLOB)) + ?, last_used FROM files
+        )
+    ) WHERE running > ?
+"""
+
+# 条目类型
+WORKBOOK = "workbook"  # 零件工作簿：名称、零件体积、支撑体积
+MESH = "mesh"          # 单个网格：体积、支撑体积（名称取自文件名，不参与缓存）
+SLICES = "slices"      # 网格切片：逐层面积、轮廓长度
+
+_process_caches = {}
+
+
+def shared_cache(path=None, verify=False):
+    """当前进程共用的缓存实例，供进程池中的工作进程按 GeometryCache.spec 打开；打开失败时返回 None"""
+    if (path, verify) not in _process_caches:
+        try:
+            _process_caches[path, verify] = GeometryCache(path, verify=verify)
+        except (OSError, sqlite3.Error):
+            _process_caches[path, verify] = None
+    return _process_caches[path, verify]
+
+
+def _name_text(name):
+    # 与 history_db 相同：工作簿中的名称可能是数字、日期等单元格值，统一存为文本
+    return "" if name is None else str(name)
+
+
+def support_params(support):
+    if support is None:
+        return "-"
+    return f"{support.method}|{support.overhang_angle!r}|{support.resolution!r}"
+
+
+class GeometryCache:
+    """几何分析结果缓存，可在多个线程中共用，多个进程也可以共用同一个数据库文件"""
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES, verify=False):
+        self.path = path or os.path.join(user_data_dir(), GEOMETRY_CACHE_NAME)
+        self.max_bytes = max_bytes
+        self.verify = verify  # 为 True 时不信任文件状态，每次都重新计算内容哈希
+        self.hits = self.misses = self.errors = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        # 必须在建表前设置，淘汰后才能把空闲页归还给文件系统
+        self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != GEOMETRY_CACHE_VERSION:
+            self._db.executescript("DROP TABLE IF EXISTS entries; DROP TABLE IF EXISTS files;")
+            self._db.execute(f"PRAGMA user_version = {GEOMETRY_CACHE_VERSION}")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    @property
+    def spec(self):
+        """传给工作进程的 (路径, verify)，工作进程用 shared_cache(*spec) 打开同一个数据库"""
+        return self.path, self.verify
+
+    def file_digest(self, path):
+        """文件内容的 blake2b 哈希；文件状态与上次相同且未要求校验时直接返回记录的哈希"""
+        path = os.path.abspath(os.fspath(path))
+        stat = os.stat(path)
+        state = (stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_ctime_ns)
+        if not self.verify:
+            with self._lock:
+                row = self._db.execute("SELECT size, mtime_ns, ino, ctime_ns, digest FROM files WHERE path = ?",
+                                       (path,)).fetchone()
+                if row is not None and row[:4] == state:
+                    self._db.execute("UPDATE files SET last_used = ? WHERE path = ?", (time.time(), path))
+                    self._db.commit()
+                    return row[4]
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b""):
+                digest.update(block)
+        digest = digest.hexdigest()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, ino, ctime_ns, digest, last_used)"
+                             " VALUES (?, ?, ?, ?, ?, ?, ?)", (path,) + state + (digest, time.time()))
+            self._db.commit()
+            self._limit()
+        return digest
+
+    def key(self, kind, path, params):
+        text = f"v{GEOMETRY_CACHE_VERSION}\x1e{kind}\x1e{self.file_digest(path)}\x1e{params}"
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=20).hexdigest()
+
+    def get(self, key):
+        """返回 (meta, names, 数值列数组)，未命中时返回 None；数值列数组的形状为 (列数, 行数)"""
+        with self._lock:
+            row = self._db.execute("SELECT rows, columns, meta, names, data FROM entries WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+        rows, width, meta, names, data = row
+        # 复制为本机字节序的可写数组
+        columns = np.frombuffer(data, dtype="<f8").astype(np.float64).reshape(width, rows)
+        if names is not None:
+            names = json.loads(zlib.decompress(names).decode("utf-8"))
+        return meta, names, columns
+
+    def put(self, key, kind, source, columns, names=None, meta=None):
+        """保存一组等长的数值列；names 为零件名称列表（可选）"""
+        columns = [np.asarray(column, dtype="<f8") for column in columns]
+        rows = len(columns[0]) if columns else 0
+        data = b"".join(column.tobytes() for column in columns)
+        if names is not None:
+            names = [_name_text(name) for name in names]
+            names = zlib.compress(json.dumps(names, ensure_ascii=False).encode("utf-8"))
+        size = len(data) + (len(names) if names is not None else 0)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, source, rows, columns, meta, names, data, size,"
+                " created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, os.fspath(source), rows, len(columns), meta, names, data, size, now, now))
+            self._db.commit()
+            self._limit()
+
+    def _used_bytes(self):
+        return self._db.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM entries)"
+            " + (SELECT COALESCE(SUM(length(CAST(path AS BLOB)) + ?), 0) FROM files)",
+            (FILE_ROW_BYTES,)).fetchone()[0]
+
+    def _limit(self):
+        if self._used_bytes() > self.max_bytes:
+            self._evict(int(self.max_bytes * EVICT_TARGET))
+
+    def _evict(self, target):
+        stale = self._db.execute(EVICT_QUERY, (FILE_ROW_BYTES, target)).fetchall()
+        self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for tbl, key in stale if tbl == 0])
+        self._db.executemany("DELETE FROM files WHERE path = ?", [(path,) for tbl, path in stale if tbl == 1])
+        self._db.commit()
+        self._db.execute("PRAGMA incremental_vacuum")
+
+    def evict(self, max_bytes=None):
+        """立即淘汰到 max_bytes（默认为当前上限）以内"""
+        with self._lock:
+            self._evict(self.max_bytes if max_bytes is None else max_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM files")
+            self._db.commit()
+            self._db.execute("PRAGMA incremental_vacuum")
+
+    def stats(self):
+        """各类条目的数量和数据量，以及数据库文件大小；used_bytes 为计入上限的总量"""
+        with self._lock:
+            kinds = {kind: {"entries": count, "bytes": size} for kind, count, size in self._db.execute(
+                "SELECT kind, COUNT(*), SUM(size) FROM entries GROUP BY kind ORDER BY kind")}
+            files = self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            used_bytes = self._used_bytes()
+        data_bytes = sum(item["bytes"] for item in kinds.values())
+        file_bytes = sum(os.path.getsize(self.path + suffix) for suffix in ("", "-wal")
+                         if os.path.exists(self.path + suffix))
+        return {"path": self.path, "kinds": kinds, "entries": sum(item["entries"] for item in kinds.values()),
+                "data_bytes": data_bytes, "used_bytes": used_bytes, "file_bytes": file_bytes,
+                "max_bytes": self.max_bytes, "known_files": files,
+                "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+    def recent(self, limit=20):
+        """最近使用的条目：(类型, 来源文件, 行数, 数据量, 最近使用时间)"""
+        with self._lock:
+            return self._db.execute("SELECT kind, source, rows, size, last_used FROM entries"
+                                    " ORDER BY last_used DESC LIMIT ?", (limit,)).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _lookup(cache, kind, file_path, params):
+    """返回 (键, 缓存条目)；读取缓存出错时返回 (None, None)，调用方照常读取文件"""
+    try:
+        key = cache.key(kind, file_path, params)
+        return key, cache.get(key)
+    except CACHE_ERRORS:
+        cache.errors += 1
+        return None, None
+
+
+def _store(cache, key, kind, file_path, columns, names=None, meta=None):
+    if key is None:
+        return
+    try:
+        cache.put(key, kind, file_path, columns, names, meta)
+    except CACHE_ERRORS:
+        cache.errors += 1
+
+
+def cached_workbook(cache, file_path, layout, load):
+    """读取零件工作簿，命中缓存时不再解析；load() 在未命中时读取并返回 PartTable
+
+    缓存中的零件名称一律存为文本（None 存为空字符串）。
+    """
+    from parts import PartTable
+
+    key, entry = _lookup(cache, WORKBOOK, file_path, repr(layout))
+    if entry is not None:
+        meta, names, (volumes, support_volumes) = entry
+        return PartTable(names, volumes, support_volumes, meta)
+    table = load()
+    _store(cache, key, WORKBOOK, file_path, [table.volumes, table.support_volumes], table.names,
+           table.support_method)
+    return table
+
+
+def cached_mesh_volumes(cache, file_path, support, measure):
+    """网格的 (体积, 支撑体积)，未命中时调用 measure() 计算"""
+    key, entry = _lookup(cache, MESH, file_path, support_params(support))
+    if entry is not None:
+        volume, support_volume = entry[2][:, 0].tolist()
+        return volume, support_volume
+    volume, support_volume = measure()
+    _store(cache, key, MESH, file_path, [[volume], [support_volume]])
+    return volume, support_volume
+
+
+def cached_slices(cache, file_path, layer_thickness, compute):
+    """网格切片的 (逐层面积, 逐层轮廓长度)，未命中时调用 compute() 计算"""
+    key, entry = _lookup(cache, SLICES, file_path, repr(float(layer_thickness)))
+    if entry is not None:
+        area, perimeter = entry[2]
+        return area, perimeter
+    area, perimeter = compute()
+    _store(cache, key, SLICES, file_path, [area, perimeter])
+    return area, perimeter
@@ -1,21 +1,124 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QPlainTextEdit, QFileDialog, QFormLayout, QCheckBox, QMessageBox
+    QPushButton, QPlainTextEdit, QFileDialog, QFormLayout, QCheckBox, QMessageBox,
+    QProgressBar, QTableView, QHeaderView, QAbstractItemView, QStatusBar, QComboBox, QDoubleSpinBox
 )
-from PyQt5.QtGui import QFont, QIcon, QFontDatabase
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QFont, QIcon, QFontDatabase, QDesktopServices, QTextCursor
+from PyQt5.QtCore import Qt, QThreadPool, QUrl, QEvent, QTimer, pyqtSignal
 from utils import resource_path
 import os
-import pandas as pd
+import sqlite3
+import subprocess
+import sys
 
-from openpyxl import load_workbook
-from logic import calculate_multipart_cost
-from formatter import format_terminal_output
+from allocation import ALLOCATION_KEYS, attach_allocation
+from loader import load_parts_file
+from logic import DEFAULT_PRICING_STANDARD, IncrementalQuote, build_quote
+from formatter import REPORT_LINE_POSITIONS, iter_report_chunks, report_line, write_report
 from exporter import export_to_excel
+from cache import QuoteCache
+from geometry_cache import GeometryCache
+from dialogs import HistoryDialog, PrintTimeDialog, SweepDialog, UncertaintyDialog
+from duration import format_duration
+from history_db import QuoteHistory
+from instrument import Trace, profile_prefix, profiled
+from models import PartTableModel
+from printtime import DEFAULT_MACHINE, estimate_print_time
+from support import DEFAULT_SUPPORT, SUPPORT_METHODS, SupportSettings
+from workers import Worker
+
+
+REPORT_WIDTH = 70  # 报表字符宽度
+LIVE_RECALC_DELAY_MS = 300  # 参数停止编辑多久后自动重算
+REPORT_PART_LIMIT = 1000  # 结果框中最多列出的零件数，完整清单通过“保存文本报表”写入文件
+IMPORT_ERROR_LIMIT = 20   # 导入 STL 网格时最多列出的失败文件数
+
+
+def run_load(file_path, support, cache, trace, progress):
+    """后台线程中读取零件工作簿或单个 STL 网格；support、cache 见 load_parts_file"""
+    with trace.span("读取", bytes=os.path.getsize(file_path)) as span:
+        parts = load_parts_file(file_path, progress=progress, support=support, cache=cache)
+        span.rows = len(parts)
+    return parts
+
+
+def run_import_meshes(file_paths, support, cache, trace, progress):
+    """后台线程中导入多个 STL 网格（每个文件一个零件），网格在进程池中并行读取"""
+    from geometry import find_stl_files, import_meshes
+
+    if isinstance(file_paths, str):
+        file_paths = find_stl_files(file_paths)  # 文件夹
+        if not file_paths:
+            raise ValueError("文件夹中没有 STL 文件")
+    with trace.span("读取", bytes=sum(os.path.getsize(path) for path in file_paths)) as span:
+        result = import_meshes(file_paths, support, progress=progress, cache=cache)
+        span.rows = len(result.parts)
+    return result
+
+
+def run_print_time(mesh_paths, machine, cache, trace, progress):
+    """后台线程中按层切片估算整版打印时长，各零件在多个进程中并行切片"""
+    with trace.span("估算时长", rows=len(mesh_paths),
+                    bytes=sum(os.path.getsize(path) for path in mesh_paths)):
+        return estimate_print_time(mesh_paths, machine, progress=progress, cache=cache)
+
+
+def run_calculation(parts, total_print_duration, pricing_standard, char_count, cache, allocation_key, trace,
+                    progress):
+    """后台线程中计算成本并生成报表文本，同时准备好供实时重算使用的增量报价"""
+    progress(0, 3)
+    with trace.span("计算", rows=len(parts)):
+        result = build_quote(parts, total_print_duration, pricing_standard, cache=cache)
+        if allocation_key is not None:
+            attach_allocation(result, allocation_key)
+        progress(1, 3)
+
+        live_quote = IncrementalQuote()
+        live_quote.set_parts(parts)
+        live_quote.update(total_print_duration, pricing_standard)
+        progress(2, 3)
+
+    with trace.span("报表", rows=min(len(parts), REPORT_PART_LIMIT)) as span:
+        report = list(iter_report_chunks(result, char_count, max_parts=REPORT_PART_LIMIT))
+        span.bytes = sum(len(chunk.encode("utf-8")) for chunk in report)
+    progress(3, 3)
+    return result, report, live_quote
+
+
+def run_save_report(result, filename, char_count, trace, progress):
+    """后台线程中把包含完整零件清单的报表写入文本文件"""
+    progress(0, 0)
+    with trace.span("保存报表", rows=result['输入参数']['零件数量']) as span:
+        with open(filename, "w", encoding="utf-8") as f:
+            write_report(result, f, char_count)
+        span.bytes = os.path.getsize(filename)
+    return filename
+
+
+def run_export(result, filename, trace, progress):
+    """后台线程中导出 Excel 报表"""
+    progress(0, 0)
+    with trace.span("导出", rows=result['输入参数']['零件数量']) as span:
+        filename = export_to_excel(result, filename, progress=progress)
+        span.bytes = os.path.getsize(filename)
+    return filename
+
+
+def reveal_file(filename):
+    """在系统文件管理器中显示导出的文件"""
+    normalized_path = os.path.normpath(filename)
+    if sys.platform == "win32":
+        subprocess.Popen(f'explorer /select,"{normalized_path}"')
+    else:
+        QDesktopServices.openUrl(QUrl.fromLocalFile(os.path.dirname(normalized_path)))
 
 class CostCalculatorApp(QWidget):
+    first_painted = pyqtSignal()  # 窗口完成首次绘制
+    fonts_ready = pyqtSignal()    # 自带字体注册完成并已应用
+
     def __init__(self):
         super().__init__()
+        self._first_painted = False
         icon_path = resource_path("app/resources/3dprint.ico")
         self.setWindowIcon(QIcon(icon_path))
 
@@ -26,37 +129,48 @@ class CostCalculatorApp(QWidget):
         self.expanded_height = 900  # 扩展后窗口高度
 
         self.parts = []
-        self.pricing_standard = {
-            "钛粉密度": 4.50,
-            "致密系数": 0.9995,
-            "用量比例": 1.5,
-            "材料单价": 1800,
-            "机时费率": 250,
-            "氩气单价": 1800,
-            "氩气耗率": 27.5,
-            "后处理费": 1500,
-            "折扣优惠": 1.0
-        }
+        self.thread_pool = QThreadPool(self)
+        self._worker = None  # 当前正在运行的后台任务，同一时间只允许一个
+        self._job_callbacks = None
+        self._job_status = ""
+        self._quote_cache = None
+        self._quote_history = None
+        self._geometry_cache = None
+        self.parts_source = None        # 当前零件来自的工作簿路径，记入报价历史
+        self.mesh_paths = None          # 当前零件来自 STL 网格时的文件列表，用于估算打印时长
+        self.machine_settings = DEFAULT_MACHINE
+        self._live_quote = None         # 当前报表对应的增量报价
+        self._report_result = None      # 当前报表对应的计算结果，为 None 时不做实时重算
+        self._report_block_count = 0    # 报表本身的行数（不含之后追加的提示）
+        self.trace = Trace("gui")       # 当前零件的各阶段耗时，显示在状态栏
+        self.pricing_standard = dict(DEFAULT_PRICING_STANDARD)
+
+        # 参数编辑后防抖，停止输入一段时间后再实时重算
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(LIVE_RECALC_DELAY_MS)
+        self.live_timer.timeout.connect(self.recalculate_live)
 
         self.init_ui()
 
     def init_ui(self):
-        font = QFont("Microsoft YaHei", 10)
-
         main_layout = QVBoxLayout()  # 主布局，垂直分布
 
-        # 尝试加载系统字体
-        font = self.load_chinese_font()
+        # 先用系统字体完成布局，自带字体较大，在窗口首次绘制后再注册（见 register_fonts）
+        font = QFont()
+        font.setBold(True)
+        font.setPointSize(12)
+        self.setFont(font)
 
         # 设置样式表，应用圆角框并将背景颜色改为白色
         rounded_style = """
-            QLineEdit, QPushButton, QPlainTextEdit {
+            QLineEdit, QPushButton, QPlainTextEdit, QTableView {
             border: 2px solid #8f8f91;
             border-radius: 10px;
             padding: 5px;
             background-color: #ffffff;  /* 设置背景颜色为白色 */
             }
-            QLineEdit:focus, QPushButton:pressed, QPlainTextEdit:focus {
+            QLineEdit:focus, QPushButton:pressed, QPlainTextEdit:focus, QTableView:focus {
             border: 2px solid #0078d7;
             }
         """
@@ -71,9 +185,8 @@ class CostCalculatorApp(QWidget):
         form_layout.setLabelAlignment(Qt.AlignRight)  # 设置标签右对齐
 
         # 替换零件信息输入部分为读取 Excel 文件按钮
-        load_button = QPushButton("加载零件信息 (xlsm)", self)
-        load_button.setFont(font)
-        load_button.setStyleSheet("""
+        load_button = QPushButton("加载零件信息 (xlsm / stl)", self)
+        load_style = """
             QPushButton {
             background-color: #4CAF50;  /* 绿色背景 */
             color: white;  /* 白色文字 */
@@ -87,16 +200,42 @@ class CostCalculatorApp(QWidget):
             QPushButton:pressed {
             background-color: #3e8e41;  /* 按下时的颜色 */
             }
-        """)
+        """
+        load_button.setStyleSheet(load_style)
         load_button.clicked.connect(self.load_parts_from_excel)
-        left_layout.addWidget(load_button)  # 将按钮添加到左侧布局
+        # 整版零件的 STL 文件夹，每个文件一个零件
+        folder_button = QPushButton("导入 STL 文件夹", self)
+        folder_button.setStyleSheet(load_style)
+        folder_button.clicked.connect(self.load_mesh_folder)
+        load_row = QHBoxLayout()
+        load_row.addWidget(load_button, 1)
+        load_row.addWidget(folder_button)
+        left_layout.addLayout(load_row)  # 将按钮添加到左侧布局
 
-        # 零件信息框
-        self.parts_display = QPlainTextEdit(self)
-        self.parts_display.setFont(font)
-        self.parts_display.setReadOnly(True)
+        # 零件名称筛选框
+        self.parts_filter = QLineEdit(self)
+        self.parts_filter.setStyleSheet(rounded_style)
+        self.parts_filter.setPlaceholderText("筛选零件名称")
+        self.parts_filter.setClearButtonEnabled(True)
+        left_layout.addWidget(self.parts_filter)
+
+        # 零件信息表：模型/视图结构，只渲染可见行，支持排序与筛选
+        self.parts_model = PartTableModel(self)
+        self.parts_filter.textChanged.connect(self.parts_model.set_filter)
+        self.parts_display = QTableView(self)
+        self.parts_display.setModel(self.parts_model)
         self.parts_display.setStyleSheet(rounded_style)
-        self.parts_display.setLineWrapMode(QPlainTextEdit.NoWrap)  # 禁用自动换行
+        self.parts_display.setSortingEnabled(True)
+        self.parts_display.sortByColumn(-1, Qt.AscendingOrder)  # 初始保持工作簿顺序
+        self.parts_display.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.parts_display.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.parts_display.setWordWrap(False)
+        # 固定行高，避免大表按内容逐行计算高度
+        self.parts_display.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.parts_display.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 8)
+        self.parts_display.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.parts_display.horizontalHeader().setStretchLastSection(True)
+        self.parts_display.setColumnWidth(PartTableModel.NAME, 160)
 
         # 美化滑动条样式
         self.parts_display.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)  # 启用垂直滚动条
@@ -150,20 +289,32 @@ class CostCalculatorApp(QWidget):
 
         # 打印时长输入框
         duration_label = QLabel("打印时长", self)
-        duration_label.setFont(font)
         self.duration_input = QLineEdit(self)
         self.duration_input.setText("11天11小时11分11秒")  # 设置默认值
-        self.duration_input.setFont(font)
         self.duration_input.setStyleSheet(rounded_style)
 
+        self.duration_input.textChanged.connect(self.schedule_live_recalculation)
+
         # 将打印时长输入框添加到布局
         duration_layout = QFormLayout()
-        duration_layout.addRow(duration_label, self.duration_input)
+        duration_row = QHBoxLayout()
+        duration_row.addWidget(self.duration_input, 1)
+        # 由 STL 网格按层切片估算时长，填入打印时长输入框
+        self.estimate_time_button = QPushButton("按网格估算", self)
+        self.estimate_time_button.setToolTip("对已加载的 STL 零件逐层切片，按层厚、扫描速度等打印机参数估算打印时长")
+        self.estimate_time_button.clicked.connect(self.estimate_print_time)
+        duration_row.addWidget(self.estimate_time_button)
+        duration_layout.addRow(duration_label, duration_row)
         left_layout.addLayout(duration_layout)
 
+        # 客户名称只用于报价历史检索，不参与计算
+        self.customer_input = QLineEdit(self)
+        self.customer_input.setPlaceholderText("可选，记入报价历史")
+        self.customer_input.setStyleSheet(rounded_style)
+        duration_layout.addRow(QLabel("客户", self), self.customer_input)
+
         # 启用导出到 Excel 的复选框
         self.export_checkbox = QCheckBox("导出到 Excel 报告", self)
-        self.export_checkbox.setFont(font)  # 使用加载的 Microsoft YaHei 字体
         self.export_checkbox.setChecked(False)  # 默认未选中
         self.export_checkbox.setFixedHeight(self.duration_input.sizeHint().height())  # 设置高度与打印时长输入框一致
         self.export_checkbox.setStyleSheet("""
@@ -197,9 +348,34 @@ class CostCalculatorApp(QWidget):
         # 将复选框添加到布局中，与右侧的折扣优惠上下对齐
         duration_layout.addRow(self.export_checkbox)
 
+        # 共享打印底板时按零件分摊费用
+        self.allocation_combo = QComboBox(self)
+        self.allocation_combo.addItem("不分摊", None)
+        for key in ("total", "volume", "equal"):
+            self.allocation_combo.addItem(ALLOCATION_KEYS[key], key)
+        self.allocation_combo.currentIndexChanged.connect(self.on_allocation_changed)
+        duration_layout.addRow(QLabel("费用分摊", self), self.allocation_combo)
+
+        # 加载 STL 网格时按悬垂面估算支撑体积，对工作簿无效
+        self.support_combo = QComboBox(self)
+        self.support_combo.addItem("不估算", None)
+        for key, label in SUPPORT_METHODS.items():
+            self.support_combo.addItem(label, key)
+        self.support_combo.setToolTip("仅对 STL 网格生效，重新加载后应用")
+        self.overhang_input = QDoubleSpinBox(self)
+        self.overhang_input.setRange(1, 89)
+        self.overhang_input.setDecimals(0)
+        self.overhang_input.setSuffix("°")
+        self.overhang_input.setValue(DEFAULT_SUPPORT.overhang_angle)
+        self.overhang_input.setToolTip("与水平面夹角小于此角度的朝下表面需要支撑")
+        support_layout = QHBoxLayout()
+        support_layout.addWidget(self.support_combo, 1)
+        support_layout.addWidget(QLabel("悬垂角", self))
+        support_layout.addWidget(self.overhang_input)
+        duration_layout.addRow(QLabel("支撑估算", self), support_layout)
+
         # 一键清零按钮
         clear_button = QPushButton("一键清零", self)
-        clear_button.setFont(font)
         clear_button.setStyleSheet("""
             QPushButton {
             background-color: #FF5722;  /* 橙色背景 */
@@ -230,14 +406,13 @@ class CostCalculatorApp(QWidget):
         self.param_inputs = {}
         for param, default_value in self.pricing_standard.items():
             label = QLabel(param, self)
-            label.setFont(font)
 
             # 创建输入框和单位标签
             param_input_layout = QHBoxLayout()
             input_field = QLineEdit(self)
-            input_field.setFont(font)
             input_field.setStyleSheet(rounded_style)
             input_field.setText(str(default_value))  # 设置默认值
+            input_field.textChanged.connect(self.schedule_live_recalculation)
             self.param_inputs[param] = input_field
             param_input_layout.addWidget(input_field)
 
@@ -258,7 +433,6 @@ class CostCalculatorApp(QWidget):
                 unit_label = None
 
             if unit_label:
-                unit_label.setFont(font)
                 param_input_layout.addWidget(unit_label)
 
             param_layout.addRow(label, param_input_layout)
@@ -267,7 +441,6 @@ class CostCalculatorApp(QWidget):
 
         # 计算成本按钮
         calc_button = QPushButton("计算成本", self)
-        calc_button.setFont(font)
         calc_button.setStyleSheet("""
             QPushButton {
             background-color: #0078D7;  /* 蓝色背景 */
@@ -287,11 +460,67 @@ class CostCalculatorApp(QWidget):
 
         right_layout.addWidget(calc_button)
 
+        # 分析工具按钮
+        tool_style = """
+            QPushButton {
+            background-color: #5C6BC0;  /* 靛蓝背景 */
+            color: white;  /* 白色文字 */
+            border: none;
+            border-radius: 6px;
+            padding: 6px 12px;
+            }
+            QPushButton:hover {
+            background-color: #3F51B5;  /* 鼠标悬停时的颜色 */
+            }
+            QPushButton:pressed {
+            background-color: #303F9F;  /* 按下时的颜色 */
+            }
+        """
+        tools_layout = QHBoxLayout()
+        sweep_button = QPushButton("参数扫描", self)
+        sweep_button.setStyleSheet(tool_style)
+        sweep_button.clicked.connect(self.open_sweep_dialog)
+        tools_layout.addWidget(sweep_button)
+        uncertainty_button = QPushButton("不确定性分析", self)
+        uncertainty_button.setStyleSheet(tool_style)
+        uncertainty_button.clicked.connect(self.open_uncertainty_dialog)
+        tools_layout.addWidget(uncertainty_button)
+        save_report_button = QPushButton("保存文本报表", self)
+        save_report_button.setStyleSheet(tool_style)
+        save_report_button.clicked.connect(self.save_text_report)
+        tools_layout.addWidget(save_report_button)
+        history_button = QPushButton("报价历史", self)
+        history_button.setStyleSheet(tool_style)
+        history_button.clicked.connect(self.open_history_dialog)
+        tools_layout.addWidget(history_button)
+        right_layout.addLayout(tools_layout)
+
         content_layout.addLayout(right_layout)
 
         # 添加内容布局到主布局
         main_layout.addLayout(content_layout)
 
+        # 后台任务进度条与取消按钮，空闲时隐藏
+        self.action_buttons = [load_button, folder_button, clear_button, calc_button, sweep_button, uncertainty_button,
+                               save_report_button, self.estimate_time_button]
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setTextVisible(True)
+        self.progress_bar.setVisible(False)
+        progress_layout.addWidget(self.progress_bar, stretch=1)
+
+        self.cancel_button = QPushButton("取消", self)
+        self.cancel_button.setStyleSheet(clear_button.styleSheet())
+        self.cancel_button.clicked.connect(self.cancel_job)
+        self.cancel_button.setVisible(False)
+        progress_layout.addWidget(self.cancel_button)
+        main_layout.addLayout(progress_layout)
+
+        # 状态栏：显示最近一次读取、计算、报表、导出各阶段的耗时
+        self.status_bar = QStatusBar(self)
+        self.status_bar.setSizeGripEnabled(False)
+        self.status_bar.setStyleSheet("QStatusBar { color: #606060; font-size: 10pt; }")
+
         # 设置结果显示框容器
         self.result_container = QWidget(self)  # 创建一个容器
         result_layout = QVBoxLayout(self.result_container)  # 容器内部使用垂直布局
@@ -313,6 +542,7 @@ class CostCalculatorApp(QWidget):
         self.result_output = QPlainTextEdit(self)
         self.result_output.setFont(QFont("Maple Mono NF CN", 10))  # 设置等宽字体
         self.result_output.setReadOnly(True)
+        self.result_output.setUndoRedoEnabled(False)  # 只读结果框不需要撤销记录，避免大报表占用双份内存
         self.result_output.setStyleSheet(rounded_style)
         self.result_output.setLineWrapMode(QPlainTextEdit.NoWrap)  # 禁用自动换行
 
@@ -372,6 +602,7 @@ class CostCalculatorApp(QWidget):
 
         # 将容器添加到主布局
         main_layout.addWidget(self.result_container, stretch=1)
+        main_layout.addWidget(self.status_bar)
 
         # 设置主布局
         self.setLayout(main_layout)
@@ -381,6 +612,24 @@ class CostCalculatorApp(QWidget):
         self.initial_size = self.size()  # 现在再获取尺寸才是正确的
         print(f"初始窗口大小: {self.initial_size.width()}x{self.initial_size.height()}")
 
+    def event(self, event):
+        handled = super().event(event)
+        if event.type() == QEvent.Paint and not self._first_painted:
+            self._first_painted = True
+            self.first_painted.emit()
+            # 首次绘制完成后再注册字体，不占用启动关键路径
+            QTimer.singleShot(0, self.register_fonts)
+        return handled
+
+    def register_fonts(self):
+        """注册随程序分发的字体并应用到界面"""
+        QFontDatabase.addApplicationFont(resource_path("app/resources/MapleMono-NF-CN-Regular.ttf"))
+        self.result_output.setFont(QFont("Maple Mono NF CN", 10))  # 设置等宽字体
+
+        self.setFont(self.load_chinese_font())
+        self.parts_display.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 8)
+        self.fonts_ready.emit()
+
     def load_chinese_font(self):
         font_path = resource_path("app/resources/PingFang-Medium.ttf")
         font_id = QFontDatabase.addApplicationFont(font_path)
@@ -395,89 +644,415 @@ class CostCalculatorApp(QWidget):
             print("⚠️ 字体加载失败，使用默认字体")
             return QFont()
     
+    def start_job(self, status, fn, *args, on_finished, on_failed, **kwargs):
+        """在线程池中运行后台任务，已有任务在运行时直接返回 False"""
+        if self._worker is not None:
+            return False
+
+        # 设置了 PRINTCOSTPRO_PROFILE 时，在工作线程中采集该任务的 cProfile/tracemalloc 数据
+        prefix = profile_prefix(fn.__name__)
+        if prefix is not None:
+            fn = profiled(fn, prefix)
+
+        worker = Worker(fn, *args, **kwargs)
+        worker.signals.progress.connect(self.on_job_progress)
+        worker.signals.finished.connect(self.on_job_finished)
+        worker.signals.failed.connect(self.on_job_failed)
+        worker.signals.cancelled.connect(self.on_job_cancelled)
+        self._worker = worker
+        self._job_callbacks = (on_finished, on_failed)
+
+        self.set_busy(True, status)
+        self.thread_pool.start(worker)
+        return True
+
+    def end_job(self):
+        """结束当前任务并返回其回调"""
+        callbacks = self._job_callbacks
+        self._worker = None
+        self._job_callbacks = None
+        self.set_busy(False)
+        self.status_bar.showMessage(self.trace.summary())
+        return callbacks
+
+    def set_busy(self, busy, status=""):
+        """切换忙碌状态：禁用操作按钮并显示进度条"""
+        for button in self.action_buttons:
+            button.setEnabled(not busy)
+        self.progress_bar.setVisible(busy)
+        self.cancel_button.setVisible(busy)
+        self.cancel_button.setEnabled(busy)
+        if busy:
+            self.progress_bar.setRange(0, 0)  # 收到第一次进度前显示忙碌动画
+            self.progress_bar.setFormat(f"{status} %p%")
+            self._job_status = status
+
+    def on_job_progress(self, done, total):
+        if total > 0:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(done)
+        else:
+            self.progress_bar.setRange(0, 0)
+
+    def on_job_finished(self, result):
+        on_finished, _ = self.end_job()
+        on_finished(result)
+
+    def on_job_failed(self, error):
+        _, on_failed = self.end_job()
+        on_failed(error)
+
+    def on_job_cancelled(self):
+        self.end_job()
+        self._report_result = None
+        self.result_output.setStyleSheet("color: black; font-size: 12pt;")
+        self.result_output.setPlainText("操作已取消")
+
+    def cancel_job(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self.cancel_button.setEnabled(False)
+            self.progress_bar.setFormat(f"{self._job_status}（正在取消…）")
+
+    def closeEvent(self, event):
+        """关闭窗口时取消后台任务并等待其退出"""
+        if self._worker is not None:
+            self._worker.cancel()
+        self.thread_pool.waitForDone()
+        if self._quote_history:
+            self._quote_history.close()  # 等待后台线程写完尚未写入的历史记录
+            self._quote_history = None
+        if self._geometry_cache:
+            self._geometry_cache.close()
+            self._geometry_cache = None
+        super().closeEvent(event)
+
+    def quote_cache(self):
+        """首次计算时才打开报价缓存，打开失败时不使用缓存"""
+        if self._quote_cache is None:
+            try:
+                self._quote_cache = QuoteCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ 报价缓存不可用：{e}")
+                self._quote_cache = False
+        return self._quote_cache or None
+
+    def geometry_cache(self):
+        """首次读取零件文件时才打开几何分析结果缓存，打开失败时不使用缓存"""
+        if self._geometry_cache is None:
+            try:
+                self._geometry_cache = GeometryCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ 几何缓存不可用：{e}")
+                self._geometry_cache = False
+        return self._geometry_cache or None
+
+    def quote_history(self):
+        """首次计算时才打开报价历史数据库，打开失败时不记录历史"""
+        if self._quote_history is None:
+            try:
+                self._quote_history = QuoteHistory()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ 报价历史不可用：{e}")
+                self._quote_history = False
+        return self._quote_history or None
+
+    def show_error(self, message):
+        self._report_result = None
+        self.result_output.setStyleSheet("color: red; font-size: 12pt;")
+        self.result_output.setPlainText(message)
+        self.result_container.setVisible(True)
+
     def clear_parts_display(self):
         """清空零件信息框和输出信息框的内容"""
-        self.parts_display.clear()  # 清空零件信息框
+        self.parts_model.clear()  # 清空零件信息表
         self.result_output.clear()  # 清空输出信息框
         self.parts = []  # 清空零件信息列表
+        self.parts_source = None
+        self.mesh_paths = None
+        self._report_result = None
+        self.trace = Trace("gui")
+        self.status_bar.clearMessage()
 
 
     def load_parts_from_excel(self):
-        """从 Excel 文件加载零件信息"""
-        file_path, _ = QFileDialog.getOpenFileName(self, "选择 Excel 文件", "", "Excel 文件 (*.xlsm)")
-        if not file_path:
+        """从 Excel 文件加载零件信息，也可以选择多个 STL 网格，每个文件作为一个零件"""
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "选择零件文件", "", "零件文件 (*.xlsm *.stl);;Excel 文件 (*.xlsm);;STL 网格 (*.stl)")
+        if not file_paths:
+            return
+        if len(file_paths) > 1 and not all(path.lower().endswith(".stl") for path in file_paths):
+            self.show_error("一次只能选择一个 Excel 文件，或者多个 STL 文件")
             return
 
-        try:
-            workbook = load_workbook(file_path, data_only=True)
-            sheet = workbook.active
+        if len(file_paths) > 1:
+            # 多个 STL 文件时以所在目录作为来源
+            self.import_meshes(file_paths, os.path.dirname(file_paths[0]))
+            return
+        source = file_paths[0]
+        self.trace = Trace(source)
+        self.start_job("正在加载零件信息", run_load, source, self.support_settings(),
+                       self.geometry_cache(), self.trace,
+                       on_finished=lambda parts: self.on_parts_loaded(parts, source, file_paths),
+                       on_failed=lambda e: self.show_error(f"加载零件文件失败：{e}"))
 
-            # 从 Excel 文件中读取零件信息
-            part_count = int(sheet["C2"].value)
-            self.parts = []
-            self.parts_display.clear()
+    def load_mesh_folder(self):
+        """导入文件夹（含子文件夹）中的全部 STL 网格，每个文件作为一个零件"""
+        directory = QFileDialog.getExistingDirectory(self, "选择 STL 文件夹")
+        if directory:
+            self.import_meshes(directory, directory)
 
-            for row in range(8, 8 + part_count):
-                name = sheet[f"B{row}"].value
-                volume = float(sheet[f"C{row}"].value)
-                support_volume = float(sheet[f"D{row}"].value)
-                self.parts.append({'name': name, 'volume': volume, 'support_volume': support_volume})
-                # 修改输出格式
-                self.parts_display.appendPlainText(
-                    f"零件{row - 7}: {name}\n    零件体积：{volume:.3f}mm³\n    支撑体积：{support_volume:.3f}mm³"
-                )
+    def import_meshes(self, file_paths, source):
+        """file_paths 为 STL 文件列表或文件夹"""
+        self.trace = Trace(source)
+        self.start_job("正在导入 STL 网格", run_import_meshes, file_paths, self.support_settings(),
+                       self.geometry_cache(), self.trace,
+                       on_finished=lambda result: self.on_meshes_imported(result, source),
+                       on_failed=lambda e: self.show_error(f"导入 STL 网格失败：{e}"))
 
-        except Exception as e:
-            self.result_output.setStyleSheet("color: red; font-size: 12pt;")
-            self.result_output.setPlainText(f"加载 Excel 文件失败：{e}")
+    def on_meshes_imported(self, result, source):
+        if not result.paths:
+            self.show_error("\n".join(["没有可读取的 STL 网格："] + [f"{path}：{message}"
+                                                                  for path, message in result.errors]))
+            return
+        self.on_parts_loaded(result.parts, source, result.paths)
+        if result.errors:
+            # 单个文件失败不影响其他零件，列出失败的文件
+            lines = [f"{os.path.basename(path)}：{message}" for path, message in result.errors[:IMPORT_ERROR_LIMIT]]
+            if len(result.errors) > IMPORT_ERROR_LIMIT:
+                lines.append(f"…… 另有 {len(result.errors) - IMPORT_ERROR_LIMIT} 个文件")
+            QMessageBox.warning(self, "部分文件未导入",
+                                f"已导入 {len(result.paths)} 个零件，{len(result.errors)} 个文件读取失败：\n"
+                                + "\n".join(lines))
+
+    def support_settings(self):
+        """界面选择的支撑估算参数，不估算时为 None"""
+        method = self.support_combo.currentData()
+        if method is None:
+            return None
+        return SupportSettings(overhang_angle=self.overhang_input.value(), method=method)
 
+    def on_parts_loaded(self, parts, file_path=None, file_paths=None):
+        self.parts = parts
+        self.parts_source = file_path
+        if file_paths and all(path.lower().endswith(".stl") for path in file_paths):
+            self.mesh_paths = list(file_paths)
+        else:
+            self.mesh_paths = None
+        self.parts_model.set_parts(parts)
+        # 零件已变化，旧报表不再参与实时重算
+        self._report_result = None
+
+    def read_inputs(self):
+        """读取定价参数和打印时长，输入无效时显示错误并返回 None"""
+        for param, input_field in self.param_inputs.items():
+            try:
+                value = float(input_field.text())
+                self.pricing_standard[param] = value
+            except ValueError:
+                self.show_error(f"参数 {param} 的值无效，请输入数字！")
+                return None
+
+        total_print_duration = self.duration_input.text().strip()
+        if not total_print_duration or not self.parts:
+            self.show_error("请先加载零件信息和填写打印时长！\n")
+            return None
+        return total_print_duration
 
     def calculate_cost(self):
+        total_print_duration = self.read_inputs()
+        if total_print_duration is None:
+            return
+
+        self.trace.discard("计算", "报表", "导出")
+        self.start_job("正在计算成本", run_calculation,
+                       self.parts, total_print_duration, dict(self.pricing_standard), REPORT_WIDTH,
+                       self.quote_cache(), self.allocation_combo.currentData(), self.trace,
+                       on_finished=self.on_cost_calculated,
+                       on_failed=lambda e: self.show_error(f"❌ 计算失败：{e}"))
+
+    def on_cost_calculated(self, outcome):
+        result, report, live_quote = outcome
+        self.result_output.setStyleSheet("color: black; font-size: 12pt;")  # 恢复正常字体颜色
+        self.show_report(report)
+        self._report_result = result
+        self._live_quote = live_quote
+        self.parts_model.set_allocation(result.get('费用分摊'))
+
+        # 记入报价历史：这里只生成摘要，写入数据库在后台线程中进行
+        history = self.quote_history()
+        if history is not None:
+            history.record(result, self.parts_source, self.customer_input.text())
+
+        # 显示结果显示框
+        self.result_output.parentWidget().setVisible(True)
+
+        # 检查是否启用了导出功能
+        if self.export_checkbox.isChecked():
+            filename, _ = QFileDialog.getSaveFileName(self, "保存为 Excel", "多零件预算报告.xlsx", "Excel 文件 (*.xlsx)")
+            if filename:
+                self.export_result(result, filename)
+
+    def show_report(self, chunks):
+        """分批把报表文本写入结果框，不先拼接成一个大字符串"""
+        self.result_output.setUpdatesEnabled(False)
+        self.result_output.clear()
+        cursor = QTextCursor(self.result_output.document())
+        cursor.beginEditBlock()
+        for i, chunk in enumerate(chunks):
+            cursor.insertText(chunk if i == 0 else "\n" + chunk)
+        cursor.endEditBlock()
+        self.result_output.setUpdatesEnabled(True)
+        self._report_block_count = self.result_output.document().blockCount()
+
+    def apply_allocation(self, result):
+        """按当前选择的分摊方式重新分摊，并刷新零件表的分摊列"""
+        key = self.allocation_combo.currentData()
+        if key is None:
+            result.pop('费用分摊', None)
+        else:
+            attach_allocation(result, key)
+        self.parts_model.set_allocation(result.get('费用分摊'))
+
+    def on_allocation_changed(self):
+        """切换分摊方式后直接在当前结果上重算，分摊是向量化的，无需后台任务"""
+        if self._report_result is None or self._worker is not None:
+            return
+        self.apply_allocation(self._report_result)
+        self.show_report(iter_report_chunks(self._report_result, REPORT_WIDTH, max_parts=REPORT_PART_LIMIT))
+
+    def save_text_report(self):
+        """把当前报表（含完整零件清单）保存为文本文件"""
+        if self._report_result is None:
+            QMessageBox.information(self, "无法保存", "请先计算成本")
+            return
+        filename, _ = QFileDialog.getSaveFileName(self, "保存文本报表", "多零件预算报告.txt", "文本文件 (*.txt)")
+        if not filename:
+            return
+        self.start_job("正在保存文本报表", run_save_report, self._report_result, filename, REPORT_WIDTH, self.trace,
+                       on_finished=lambda name: self.result_output.appendPlainText(f"\n报表已保存至：{name}"),
+                       on_failed=lambda e: QMessageBox.warning(self, "保存失败", f"保存文本报表失败：{e}"))
+
+    def open_analysis_dialog(self, dialog_class, title):
+        total_print_duration = self.read_inputs()
+        if total_print_duration is None:
+            return
+        try:
+            dialog = dialog_class(self.parts, total_print_duration, self.pricing_standard, self)
+        except ValueError as e:
+            self.show_error(f"❌ {title}失败：{e}")
+            return
+        dialog.exec_()
+
+    def open_sweep_dialog(self):
+        self.open_analysis_dialog(SweepDialog, "参数扫描")
+
+    def open_uncertainty_dialog(self):
+        self.open_analysis_dialog(UncertaintyDialog, "不确定性分析")
+
+    def estimate_print_time(self):
+        """按层切片估算当前 STL 零件的整版打印时长，结果填入打印时长输入框"""
+        if not self.mesh_paths:
+            self.show_error("请先加载 STL 网格，工作簿中的零件没有几何信息，无法估算打印时长")
+            return
+        dialog = PrintTimeDialog(self.machine_settings, len(self.mesh_paths), self)
+        if not dialog.exec_():
+            return
+        self.machine_settings = dialog.machine_settings()
+        self.start_job("正在估算打印时长", run_print_time, self.mesh_paths, self.machine_settings,
+                       self.geometry_cache(), self.trace,
+                       on_finished=self.on_print_time_estimated,
+                       on_failed=lambda e: self.show_error(f"估算打印时长失败：{e}"))
+
+    def on_print_time_estimated(self, estimate):
+        # 设置输入框后照常触发实时重算
+        self.duration_input.setText(format_duration(estimate.hours))
+        self.status_bar.showMessage(
+            f"估算打印时长：共 {estimate.layers} 层，扫描 {estimate.scan_seconds / 3600:.2f} 小时，"
+            f"铺粉 {estimate.recoat_seconds / 3600:.2f} 小时（{estimate.machine.describe()}）")
+
+    def open_history_dialog(self):
+        history = self.quote_history()
+        if history is None:
+            QMessageBox.warning(self, "报价历史不可用", "无法打开报价历史数据库")
+            return
+        if not history.flush():  # 刚计算的报价也能查到
+            self.status_bar.showMessage("报价历史仍在写入，最新的报价可能暂时查不到")
+        HistoryDialog(history, self).exec_()
+
+    def schedule_live_recalculation(self):
+        if self._report_result is not None:
+            self.live_timer.start()
+
+    def recalculate_live(self):
+        """参数编辑后实时重算：只重算费用并刷新报表中变化的行"""
+        if self._report_result is None:
+            return
+        if self._worker is not None:
+            # 有后台任务时稍后再试
+            self.live_timer.start()
+            return
+
+        pricing_standard = {}
+        for param, input_field in self.param_inputs.items():
+            try:
+                pricing_standard[param] = float(input_field.text())
+            except ValueError:
+                return  # 输入尚未完成，保留上一次结果
+        total_print_duration = self.duration_input.text().strip()
         try:
-            for param, input_field in self.param_inputs.items():
-                try:
-                    value = float(input_field.text())
-                    self.pricing_standard[param] = value
-                except ValueError:
-                    self.result_output.setStyleSheet("color: red; font-size: 12pt;")  # 设置字体为红色和大小
-                    self.result_output.setPlainText(f"参数 {param} 的值无效，请输入数字！")
-                    return
-
-            # 调用成本计算函数
-            total_print_duration = self.duration_input.text().strip()
-            if not total_print_duration or not self.parts:
-                self.result_output.setStyleSheet("color: red; font-size: 12pt;")  # 设置字体为红色和大小
-                self.result_output.setPlainText("请先加载零件信息和填写打印时长！\n")
-                return
-
-            # 确保零件信息格式正确
-            formatted_parts = [
-                {'name': part['name'], 'volume': part['volume'], 'support_volume': part['support_volume']}
-                for part in self.parts
-            ]
-
-            # 调用成本计算函数
-            result = calculate_multipart_cost(formatted_parts, total_print_duration, self.pricing_standard)
-
-            # 确保支撑体积在报告中正确显示
-            result['输入参数']['零件清单'] = formatted_parts
-
-            char_count = 70
-            report = format_terminal_output(result, char_count)
-            self.result_output.setStyleSheet("color: black; font-size: 12pt;")  # 恢复正常字体颜色
-            self.result_output.setPlainText(report)
-
-            # 显示结果显示框
-            self.result_output.parentWidget().setVisible(True)
-
-            # 检查是否启用了导出功能
-            if self.export_checkbox.isChecked():
-                filename, _ = QFileDialog.getSaveFileName(self, "保存为 Excel", "多零件预算报告.xlsx", "Excel 文件 (*.xlsx)")
-                if filename:
-                    export_to_excel(result, filename)
-                    self.result_output.appendPlainText(f"\n报表已保存至：{filename}")
-
-        except Exception as e:
-            self.result_output.setStyleSheet("color: red; font-size: 12pt;")
-            self.result_output.setPlainText(f"❌ 计算失败：{e}")
-            self.result_container.setVisible(True)  # ✅ 出错时也显示出来
\ No newline at end of file
+            changed = self._live_quote.update(total_print_duration, pricing_standard)
+        except ValueError:
+            return  # 打印时长尚未输入完整
+
+        self.pricing_standard.update(pricing_standard)
+        result = self._report_result
+        result['输入参数']['总打印时长'] = total_print_duration
+        result['定价标准'] = pricing_standard
+        result['计算明细'] = dict(self._live_quote.details)
+        if result.get('费用分摊') is not None:
+            # 各零件的分摊金额都会变化，重新分摊后整体刷新报表
+            self.apply_allocation(result)
+            self.show_report(iter_report_chunks(result, REPORT_WIDTH, max_parts=REPORT_PART_LIMIT))
+        else:
+            self.refresh_report_lines(changed)
+
+    def refresh_report_lines(self, fields):
+        """就地替换报表中指定字段所在的行"""
+        document = self.result_output.document()
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        for field in fields:
+            position = REPORT_LINE_POSITIONS[field]
+            block_number = position if position >= 0 else self._report_block_count + position
+            block = document.findBlockByNumber(block_number)
+            cursor.setPosition(block.position())
+            cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+            cursor.insertText(report_line(field, self._report_result, REPORT_WIDTH))
+        cursor.endEditBlock()
+
+    def export_result(self, result, filename):
+        self.start_job("正在导出 Excel 报表", run_export, result, filename, self.trace,
+                       on_finished=self.on_report_exported,
+                       on_failed=lambda e: self.on_export_failed(e, result, filename))
+
+    def on_report_exported(self, filename):
+        self.result_output.appendPlainText(f"\n报表已保存至：{filename}")
+        QMessageBox.information(self, "导出成功", f"Excel 报表已成功保存至：\n{filename}")
+        reveal_file(filename)
+
+    def on_export_failed(self, error, result, filename):
+        if not isinstance(error, PermissionError):
+            self.show_error(f"❌ 导出失败：{error}")
+            return
+
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("文件被占用")
+        msg_box.setText(f"文件 {filename} 正在被占用，无法写入。\n\n请关闭该文件后重试。")
+        msg_box.setIcon(QMessageBox.Warning)
+        retry_button = msg_box.addButton("重试", QMessageBox.AcceptRole)
+        msg_box.addButton("取消", QMessageBox.RejectRole)
+        msg_box.exec_()
+
+        if msg_box.clickedButton() == retry_button:
+            self.export_result(result, filename)
@@ -0,0 +1,251 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from history_export import job_record
+from parts import as_part_table
+from utils import user_data_dir
+
+HISTORY_DB_NAME = "quote_history.sqlite3"
+WRITE_BATCH = 200         # 后台线程每个事务最多写入的报价数
+SEARCH_LIMIT = 500        # 搜索默认返回的最多条数
+COUNT_LIMIT = 10_000      # 命中总数最多数到这里，避免宽泛条件下统计全部记录
+PREFIX_MATCH_LIMIT = 200  # 零件名称、客户前缀最多匹配的名称数，过于宽泛时提示输入更完整的名称
+INDEXED_CUSTOMERS = 20    # 匹配的客户不超过这个数时走客户索引，否则按其他条件的索引扫描
+FLUSH_TIMEOUT = 10        # flush()、close() 最多等待后台写入的秒数，数据库被长时间锁住时不让界面卡死
+_PREFIX_END = "\U0010ffff"  # 前缀查询的上界：name >= 前缀 AND name < 前缀 + _PREFIX_END
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS customers (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS quotes (
+        id INTEGER PRIMARY KEY,
+        created_at REAL NOT NULL,
+        customer_id INTEGER REFERENCES customers(id),
+        source_name TEXT NOT NULL,
+        source_path TEXT NOT NULL,
+        duration TEXT NOT NULL,
+        part_count INTEGER NOT NULL,
+        total_volume REAL NOT NULL,
+        total_cost REAL NOT NULL,
+        actual_cost REAL NOT NULL,
+        record TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_quotes_created_at ON quotes(created_at);
+    CREATE INDEX IF NOT EXISTS idx_quotes_customer ON quotes(customer_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_quotes_source ON quotes(source_name);
+    CREATE INDEX IF NOT EXISTS idx_quotes_actual_cost ON quotes(actual_cost);
+    CREATE TABLE IF NOT EXISTS part_names (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    -- 每个报价中出现的不同零件名称及其数量，按 (名称, 报价) 聚簇，查某个零件的全部报价只需一次范围扫描
+    CREATE TABLE IF NOT EXISTS quote_parts (
+        name_id INTEGER NOT NULL,
+        quote_id INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (name_id, quote_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_quote_parts_quote ON quote_parts(quote_id);
+"""
+
+RESULT_COLUMNS = ["id", "created_at", "customer", "source_name", "source_path", "duration",
+                  "part_count", "total_volume", "total_cost", "actual_cost"]
+
+
+def _placeholders(values):
+    # 空列表时写 NULL，IN (NULL) 不匹配任何记录
+    return ", ".join("?" * len(values)) or "NULL"
+
+
+def connect(path):
+    db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    # WAL 模式下 NORMAL 已能保证数据库不损坏，只在断电时可能丢失最后几个事务
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class QuoteHistory:
+    """本地报价历史：每次计算的结果都写入 SQLite，可按时间、零件名称、客户、文件和金额检索
+
+    record() 只在调用线程中生成一行摘要并放入队列，由后台线程按批写入数据库（WAL 模式），
+    不阻塞界面线程；search() 使用单独的只读连接，写入期间也可以查询。
+    零件名称、客户和文件名按前缀匹配，全部走索引，百万条记录下也只需几毫秒。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(user_data_dir(), HISTORY_DB_NAME)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._reader = connect(self.path)
+        self._reader.executescript(SCHEMA)
+        self._reader.commit()
+        self._reader_lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self.write_error = None  # 后台写入的最近一次错误
+        self.dropped = 0         # 因写入出错而丢弃的报价数
+        self._writer = threading.Thread(target=self._write_loop, name="quote-history", daemon=True)
+        self._writer.start()
+
+    def record(self, result, source=None, customer=None):
+        """记录一次报价（build_quote 的结果），立即返回
+
+        结果中的计算明细、定价标准随后可能被实时重算修改，这里先生成摘要快照；
+        零件表本身不会被修改，零件名称的统计交给后台线程完成。
+        """
+        record = job_record(result, source)
+        parts = as_part_table(result['输入参数']['零件清单'])
+        self._queue.put((time.time(), (customer or "").strip(), record, parts.names))
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """等待已提交的记录全部写入，返回是否在 timeout 秒内写完"""
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._writer.is_alive():
+                    return False
+                self._queue.all_tasks_done.wait(min(remaining, 0.1))
+        return True
+
+    def close(self, timeout=FLUSH_TIMEOUT):
+        """通知后台线程写完剩余记录后退出，最多等待 timeout 秒"""
+        self._queue.put(None)
+        self._writer.join(timeout)
+        with self._reader_lock:
+            self._reader.close()
+
+    def _write_loop(self):
+        db = None
+        try:
+            while True:
+                batch = [self._queue.get()]
+                # 攒一批一起提交，减少事务次数
+                while batch[-1] is not None and len(batch) < WRITE_BATCH:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = batch[-1] is None
+                entries = batch[:-1] if stop else batch
+                try:
+                    if db is None:
+                        db = connect(self.path)  # 打开失败时下一批重试
+                    with db:
+                        for entry in entries:
+                            self._insert(db, *entry)
+                except Exception as e:
+                    # 只丢弃这一批，写入线程必须继续运行，否则 flush()、close() 会一直等不到结果
+                    self.write_error = e
+                    self.dropped += len(entries)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            if db is not None:
+                db.close()
+
+    @staticmethod
+    def _insert(db, created_at, customer, record, names):
+        customer_id = None
+        if customer:
+            db.execute("INSERT OR IGNORE INTO customers (name) VALUES (?)", (customer,))
+            customer_id = db.execute("SELECT id FROM customers WHERE name = ?", (customer,)).fetchone()[0]
+        source_path = record["来源"]
+        cursor = db.execute(
+            "INSERT INTO quotes (created_at, customer_id, source_name, source_path, duration, part_count,"
+            " total_volume, total_cost, actual_cost, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (created_at, customer_id, os.path.basename(source_path), source_path, record["总打印时长"],
+             record["零件数量"], record["总体积(mm³)"], record["总费用"], record["实际费用"],
+             json.dumps(record, ensure_ascii=False)))
+        quote_id = cursor.lastrowid
+
+        counts = Counter("" if name is None else str(name) for name in names)
+        db.executemany("INSERT OR IGNORE INTO part_names (name) VALUES (?)", ((name,) for name in counts))
+        # 一条语句完成名称 → 编号的查找和关联写入
+        db.executemany(
+            "INSERT INTO quote_parts (name_id, quote_id, count) SELECT id, ?, ? FROM part_names WHERE name = ?",
+            ((quote_id, count, name) for name, count in counts.items()))
+
+    def search(self, part=None, customer=None, source=None, since=None, until=None,
+               min_cost=None, max_cost=None, limit=SEARCH_LIMIT):
+        """按条件检索报价，最新的在前，返回 (记录列表, 命中总数)，命中总数最多统计到 COUNT_LIMIT
+
+        part / customer / source 按前缀匹配零件名称、客户和文件名；since / until 为时间戳；
+        min_cost / max_cost 限定实际费用。每条记录是以 RESULT_COLUMNS 为键的字典。
+        零件名称或客户的前缀匹配到超过 PREFIX_MATCH_LIMIT 个名称时抛出 ValueError。
+        """
+        conditions, params = [], []
+        # 先把名称前缀解析为编号列表再代入查询：用子查询时 SQLite 会把全部命中物化后再排序
+        if part:
+            name_ids = self._match_ids("part_names", part, "零件名称")
+            conditions.append(f"q.id IN (SELECT quote_id FROM quote_parts WHERE name_id IN ({_placeholders(name_ids)}))")
+            params += name_ids
+        if customer:
+            customer_ids = self._match_ids("customers", customer, "客户")
+            # 客户很多时逐个客户查索引反而更慢，用一元加号让 SQLite 改用其他条件的索引
+            column = "q.customer_id" if len(customer_ids) <= INDEXED_CUSTOMERS else "+q.customer_id"
+            conditions.append(f"{column} IN ({_placeholders(customer_ids)})")
+            params += customer_ids
+        if source:
+            conditions.append("q.source_name >= ? AND q.source_name < ?")
+            params += [source, source + _PREFIX_END]
+        if since is not None:
+            conditions.append("q.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("q.created_at < ?")
+            params.append(until)
+        if min_cost is not None:
+            conditions.append("q.actual_cost >= ?")
+            params.append(min_cost)
+        if max_cost is not None:
+            conditions.append("q.actual_cost <= ?")
+            params.append(max_cost)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._reader_lock:
+            # 报价按时间顺序写入，id 越大越新，按 id 倒序即可避免对命中结果排序
+            rows = self._reader.execute(
+                "SELECT q.id, q.created_at, c.name, q.source_name, q.source_path, q.duration, q.part_count,"
+                " q.total_volume, q.total_cost, q.actual_cost"
+                f" FROM quotes q LEFT JOIN customers c ON c.id = q.customer_id {where}"
+                " ORDER BY q.id DESC LIMIT ?", params + [limit]).fetchall()
+            total = self._reader.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM quotes q {where} LIMIT ?)",
+                                         params + [COUNT_LIMIT]).fetchone()[0]
+        return [dict(zip(RESULT_COLUMNS, row)) for row in rows], total
+
+    def _match_ids(self, table, prefix, label):
+        with self._reader_lock:
+            ids = [row[0] for row in self._reader.execute(
+                f"SELECT id FROM {table} WHERE name >= ? AND name < ? LIMIT ?",
+                (prefix, prefix + _PREFIX_END, PREFIX_MATCH_LIMIT + 1))]
+        if len(ids) > PREFIX_MATCH_LIMIT:
+            raise ValueError(f"以“{prefix}”开头的{label}超过 {PREFIX_MATCH_LIMIT} 个，请输入更完整的名称")
+        return ids
+
+    def get(self, quote_id):
+        """返回一条报价的完整摘要（见 history_export.job_record）及其零件名称统计"""
+        with self._reader_lock:
+            row = self._reader.execute("SELECT record FROM quotes WHERE id = ?", (quote_id,)).fetchone()
+            if row is None:
+                return None
+            parts = self._reader.execute(
+                "SELECT n.name, p.count FROM quote_parts p JOIN part_names n ON n.id = p.name_id"
+                " WHERE p.quote_id = ? ORDER BY n.name", (quote_id,)).fetchall()
+        record = json.loads(row[0])
+        record["零件名称统计"] = dict(parts)
+        return record
+
+    def count(self):
+        with self._reader_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM quotes").fetchone()[0]
@@ -0,0 +1,262 @@
+"""报价历史导出：供 BI 等分析工具批量读取的列式明细
+
+每次报价追加一行作业记录（输入汇总、定价标准快照、计算明细），可选逐零件追加零件记录。
+支持 CSV、JSONL，安装了 pyarrow 时支持 Parquet。记录在内存中攒够一批再写出，
+大零件表按批切片写出，内存占用与历史总行数无关。
+
+    with QuoteHistoryWriter("历史.csv", include_parts=True) as history:
+        history.append(result, source="零件.xlsm")
+
+零件记录写到作业文件旁的 “<文件名>-parts<扩展名>”。Parquet 文件不能追加，
+因此 Parquet 的路径是一个目录，每次打开写入一个新的分片文件，整个目录可作为一个数据集读取。
+"""
+import csv
+import json
+import os
+import uuid
+from datetime import datetime
+
+from duration import parse_duration
+from logic import DEFAULT_PRICING_STANDARD
+from parts import as_part_table
+
+BATCH_ROWS = 10_000  # 每批写出的行数
+
+HISTORY_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".parquet": "parquet"}
+
+DETAIL_FIELDS = ["材料费用", "机时费用", "氩气费用", "后处理费", "总费用", "实际费用"]
+# 定价标准与计算明细都有“后处理费”，定价列统一加前缀
+PRICING_COLUMNS = [f"定价_{key}" for key in DEFAULT_PRICING_STANDARD]
+
+# 列名 → 类型（str / int / float），决定 Parquet 的列类型
+JOB_COLUMNS = dict(
+    [("记录时间", str), ("任务编号", str), ("来源", str), ("总打印时长", str), ("机时(小时)", float),
+     ("零件数量", int), ("零件体积合计(mm³)", float), ("支撑体积合计(mm³)", float), ("总体积(mm³)", float)]
+    + [(column, float) for column in PRICING_COLUMNS]
+    + [(field, float) for field in DETAIL_FIELDS]
+)
+PART_COLUMNS = dict(
+    [("任务编号", str), ("序号", int), ("零件名称", str),
+     ("零件体积(mm³)", float), ("支撑体积(mm³)", float), ("总体积(mm³)", float), ("分摊方式", str)]
+    + [(f"分摊_{field}", float) for field in DETAIL_FIELDS]
+)
+
+
+def history_format(path, fmt=None):
+    """按扩展名判断导出格式"""
+    if fmt is None:
+        fmt = HISTORY_FORMATS.get(os.path.splitext(str(path))[1].lower())
+    if fmt not in HISTORY_FORMATS.values():
+        raise ValueError(f"不支持的历史导出格式：{path}（可用 .csv、.jsonl、.parquet）")
+    return fmt
+
+
+def parts_path(path):
+    """零件记录的输出路径：历史.csv → 历史-parts.csv"""
+    root, ext = os.path.splitext(str(path))
+    return f"{root}-parts{ext}"
+
+
+def job_record(result, source=None, job_id=None, recorded_at=None):
+    """把 build_quote 的结果展平为一行作业记录
+
+    只保存汇总值，不引用零件表，可以在工作进程中生成后传回主进程。
+    """
+    inputs = result['输入参数']
+    table = as_part_table(inputs['零件清单'])
+    record = {
+        "记录时间": (recorded_at or datetime.now()).isoformat(timespec="seconds"),
+        "任务编号": job_id or uuid.uuid4().hex[:12],
+        "来源": "" if source is None else str(source),
+        "总打印时长": inputs['总打印时长'],
+        "机时(小时)": parse_duration(inputs['总打印时长']),
+        "零件数量": inputs['零件数量'],
+        "零件体积合计(mm³)": table.volume_sum,
+        "支撑体积合计(mm³)": table.support_volume_sum,
+        "总体积(mm³)": table.total_volume,
+    }
+    pricing = result['定价标准']
+    record.update({column: pricing.get(key) for column, key in zip(PRICING_COLUMNS, DEFAULT_PRICING_STANDARD)})
+    record.update({field: result['计算明细'][field] for field in DETAIL_FIELDS})
+    return record
+
+
+def _part_columns(job_id, table, allocation, start, stop):
+    """零件表 [start, stop) 区间的零件记录，按列返回（体积列为 NumPy 视图，不复制）"""
+    view = table[start:stop]
+    n = len(view)
+    columns = {
+        "任务编号": [job_id] * n,
+        "序号": range(start + 1, stop + 1),
+        # 名称可能是数字或空单元格；统一转成文本，CSV、Parquet（string 列）和数据库写入的值一致
+        "零件名称": ["" if name is None else str(name) for name in view.names],
+        "零件体积(mm³)": view.volumes,
+        "支撑体积(mm³)": view.support_volumes,
+        "总体积(mm³)": view.total_volumes,
+        "分摊方式": [allocation.describe() if allocation is not None else ""] * n,
+    }
+    for field in DETAIL_FIELDS:
+        values = allocation.fields[field][start:stop] if allocation is not None else [None] * n
+        columns[f"分摊_{field}"] = values
+    return columns
+
+
+def _as_list(values):
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+class _CsvSink:
+    def __init__(self, path, columns):
+        self.columns = list(columns)
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                header = next(csv.reader(f), [])
+            if header != self.columns:
+                raise ValueError(f"{path} 的表头与当前版本的历史格式不一致，请换一个文件")
+        # utf-8-sig 便于 Excel 直接打开中文表头；追加时不会重复写入 BOM
+        self._file = open(path, "a", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._file)
+        if not exists:
+            self._writer.writerow(self.columns)
+
+    def write(self, columns):
+        self._writer.writerows(zip(*(_as_list(columns[name]) for name in self.columns)))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _JsonlSink:
+    def __init__(self, path, columns):
+        self.columns = list(columns)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, columns):
+        lines = (json.dumps(dict(zip(self.columns, row)), ensure_ascii=False)
+                 for row in zip(*(_as_list(columns[name]) for name in self.columns)))
+        self._file.write("".join(line + "\n" for line in lines))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetSink:
+    """Parquet 分片：每批写成一个 row group，关闭时写入文件尾"""
+
+    def __init__(self, directory, columns):
+        # pyarrow 是可选依赖，只在导出 Parquet 时才需要
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("导出 Parquet 需要安装 pyarrow：pip install pyarrow") from e
+        types = {str: pa.string(), int: pa.int64(), float: pa.float64()}
+        self._pa = pa
+        self.columns = list(columns)
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns.items()])
+        os.makedirs(directory, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+        self._writer = pq.ParquetWriter(os.path.join(directory, name), self.schema)
+
+    def write(self, columns):
+        arrays = [self._pa.array(columns[field.name], type=field.type) for field in self.schema]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+_SINKS = {"csv": _CsvSink, "jsonl": _JsonlSink, "parquet": _ParquetSink}
+
+
+class _Batch:
+    """按列攒一批记录，攒满 batch_rows 行写出一次"""
+
+    def __init__(self, sink, batch_rows):
+        self.sink = sink
+        self.batch_rows = batch_rows
+        self.columns = {name: [] for name in sink.columns}
+        self.rows = 0
+
+    def add(self, columns, n):
+        for name, values in self.columns.items():
+            values.extend(_as_list(columns[name]))
+        self.rows += n
+        if self.rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.sink.write(self.columns)
+            for values in self.columns.values():
+                values.clear()
+            self.rows = 0
+
+
+class QuoteHistoryWriter:
+    """追加写出报价历史
+
+    include_parts 为 True 时同时写出逐零件记录；附有费用分摊（allocation.attach_allocation）的
+    报价会带上各零件的分摊金额。用完需 close()（或用 with），以写出最后一批记录。
+    """
+
+    def __init__(self, path, fmt=None, include_parts=False, batch_rows=BATCH_ROWS):
+        self.path = str(path)
+        self.format = history_format(path, fmt)
+        self.batch_rows = batch_rows
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        sink = _SINKS[self.format]
+        self._jobs = _Batch(sink(self.path, JOB_COLUMNS), batch_rows)
+        self._parts = None
+        if include_parts:
+            try:
+                self._parts = _Batch(sink(parts_path(self.path), PART_COLUMNS), batch_rows)
+            except Exception:
+                self._jobs.sink.close()
+                raise
+        self.job_count = 0
+        self.part_count = 0
+
+    def append(self, result, source=None, job_id=None):
+        """追加一次报价（build_quote 的结果），返回任务编号"""
+        record = job_record(result, source, job_id)
+        self.append_record(record, result['输入参数']['零件清单'], result.get('费用分摊'))
+        return record["任务编号"]
+
+    def append_record(self, record, parts=None, allocation=None):
+        """追加 job_record 生成的作业记录；parts 为零件表时同时追加零件记录"""
+        self._jobs.add({name: [record.get(name)] for name in JOB_COLUMNS}, 1)
+        self.job_count += 1
+        if self._parts is None or parts is None:
+            return
+        table = as_part_table(parts)
+        # 大零件表按批切片，每片只展开 batch_rows 行
+        for start in range(0, len(table), self.batch_rows):
+            stop = min(start + self.batch_rows, len(table))
+            self._parts.add(_part_columns(record["任务编号"], table, allocation, start, stop), stop - start)
+        self.part_count += len(table)
+
+    def flush(self):
+        self._jobs.flush()
+        if self._parts is not None:
+            self._parts.flush()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._jobs.sink.close()
+            if self._parts is not None:
+                self._parts.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
@@ -0,0 +1,200 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from utils import user_data_dir
+
+TIMING_LOG_NAME = "timings.jsonl"
+TIMING_LOG_BYTES = 1_000_000   # 单个日志文件上限
+TIMING_LOG_BACKUPS = 3         # 保留的历史日志份数
+PROFILE_ENV = "PRINTCOSTPRO_PROFILE"  # 设置为输出路径前缀即开启 cProfile/tracemalloc 采集
+
+_timing_logger = None
+
+
+def timing_logger():
+    """阶段耗时日志：JSON Lines 格式，按大小滚动；日志目录不可写时静默丢弃
+
+    RotatingFileHandler 不能在多个进程间共用同一个文件（滚动时会相互覆盖，Windows 上改名失败），
+    工作进程中的 Trace 应使用 deferred=True，把记录交回主进程用 log_timings 写出。
+    """
+    global _timing_logger
+    if _timing_logger is None:
+        logger = logging.getLogger("printcostpro.timing")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        try:
+            handler = RotatingFileHandler(os.path.join(user_data_dir(), TIMING_LOG_NAME),
+                                          maxBytes=TIMING_LOG_BYTES, backupCount=TIMING_LOG_BACKUPS,
+                                          encoding="utf-8", delay=True)
+        except OSError:
+            handler = logging.NullHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        _timing_logger = logger
+    return _timing_logger
+
+
+def log_timings(records):
+    """写出工作进程中 Trace(deferred=True) 暂存的耗时记录"""
+    logger = timing_logger()
+    for record in records:
+        logger.info(record)
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_ms(ms):
+    return f"{ms:.0f} ms" if ms < 1000 else f"{ms / 1000:.2f} s"
+
+
+class Span:
+    """一个阶段的耗时记录，rows / bytes 可在阶段执行中补充"""
+
+    __slots__ = ("stage", "ms", "rows", "bytes", "error", "fields")
+
+    def __init__(self, stage, rows=None, bytes=None, **fields):
+        self.stage = stage
+        self.ms = 0.0
+        self.rows = rows
+        self.bytes = bytes
+        self.error = None
+        self.fields = fields
+
+    def describe(self):
+        counts = [f"{self.rows:,} 行" if self.rows is not None else None,
+                  format_bytes(self.bytes) if self.bytes is not None else None]
+        counts = "，".join(c for c in counts if c)
+        text = f"{self.stage} {format_ms(self.ms)}" + (f"（{counts}）" if counts else "")
+        return text + (" 失败" if self.error else "")
+
+
+class Trace:
+    """一次 读取 → 计算 → 报表 → 导出 流程中各阶段的耗时
+
+    每个阶段只保留最近一次记录；阶段结束时写入一行耗时日志。
+    deferred 为 True 时不直接写日志，而是暂存在 pending 中，由主进程调用 log_timings 写出。
+    """
+
+    def __init__(self, source=None, deferred=False):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.spans = {}
+        self.pending = [] if deferred else None
+
+    @contextmanager
+    def span(self, stage, rows=None, bytes=None, **fields):
+        span = Span(stage, rows, bytes, **fields)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.ms = (time.perf_counter() - started) * 1000
+            self.spans.pop(stage, None)
+            self.spans[stage] = span
+            self.log(span)
+
+    def discard(self, *stages):
+        """丢弃指定阶段的记录，例如重新计算时丢弃上一次的计算和导出"""
+        for stage in stages:
+            self.spans.pop(stage, None)
+
+    def log(self, span):
+        record = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "run": self.run_id,
+            "source": self.source,
+            "stage": span.stage,
+            "ms": round(span.ms, 3),
+            "rows": span.rows,
+            "bytes": span.bytes,
+        }
+        record.update(span.fields)
+        if span.error:
+            record["error"] = span.error
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        if self.pending is not None:
+            self.pending.append(line)
+        else:
+            timing_logger().info(line)
+
+    def summary(self):
+        return " │ ".join(span.describe() for span in self.spans.values())
+
+
+class ProfileCapture:
+    """对一段代码同时做 cProfile 和 tracemalloc 采集
+
+    结束时写出 <prefix>.prof（可用 snakeviz 等工具查看）和 <prefix>.txt
+    （按累计耗时排序的函数列表、内存峰值及分配最多的代码行）。
+    cProfile 只统计开启它的线程，需在执行任务的线程中使用。
+    """
+
+    def __init__(self, prefix, top=40):
+        self.prefix = prefix
+        self.top = top
+        self._profiler = None
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.prefix))
+        os.makedirs(directory, exist_ok=True)
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+            tracemalloc.reset_peak()
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        self._profiler.dump_stats(f"{self.prefix}.prof")
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        with open(f"{self.prefix}.txt", "w", encoding="utf-8") as f:
+            f.write(stream.getvalue())
+            f.write(f"\n内存峰值：{format_bytes(peak)}，结束时占用：{format_bytes(current)}\n")
+            f.write(f"分配最多的 {self.top} 行：\n")
+            for statistic in snapshot.statistics("lineno")[:self.top]:
+                f.write(f"  {statistic}\n")
+        return False
+
+
+def profile_prefix(name):
+    """返回 PRINTCOSTPRO_PROFILE 开启时的输出前缀，未开启时返回 None"""
+    base = os.environ.get(PROFILE_ENV)
+    return f"{base}-{name}" if base else None
+
+
+def profiled(fn, prefix):
+    """包装 fn，使其每次调用都在 ProfileCapture 中执行"""
+    def wrapper(*args, **kwargs):
+        with ProfileCapture(prefix):
+            return fn(*args, **kwargs)
+    return wrapper
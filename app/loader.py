@@ -0,0 +1,141 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from parts import PartTable
+
+
+@dataclass(frozen=True)
+class SheetLayout:
+    """零件工作簿布局：零件数量所在单元格、数据起始行及各列"""
+    count_cell: str = "C2"
+    start_row: int = 8
+    name_column: str = "B"
+    volume_column: str = "C"
+    support_column: str = "D"
+    sheet_name: str = None  # None 表示活动工作表
+
+
+DEFAULT_LAYOUT = SheetLayout()
+
+
+class PartsLoadError(ValueError):
+    """零件工作簿格式错误，errors 为 (行号, 说明) 列表"""
+
+    def __init__(self, file_path, errors):
+        self.file_path = file_path
+        self.errors = errors
+        shown = "\n".join(f"  第 {row} 行：{message}" for row, message in errors[:10])
+        more = f"\n  …… 另有 {len(errors) - 10} 处错误" if len(errors) > 10 else ""
+        super().__init__(f"{file_path} 中有 {len(errors)} 处格式错误：\n{shown}{more}")
+
+    def __reduce__(self):
+        # 从工作进程返回时按原参数重建
+        return PartsLoadError, (self.file_path, self.errors)
+
+
+def _read_cell(sheet, coordinate):
+    from openpyxl.utils import coordinate_to_tuple
+
+    row, column = coordinate_to_tuple(coordinate)
+    for values in sheet.iter_rows(min_row=row, max_row=row, min_col=column, max_col=column, values_only=True):
+        return values[0]
+    return None
+
+
+PROGRESS_INTERVAL = 1000  # 每读取多少行汇报一次进度
+INITIAL_CAPACITY = 4096  # 体积数组的初始容量，不足时按倍数扩充
+MISSING_ROWS_LISTED = 100  # 缺少的行不超过此数时逐行报告，否则只报告零件数量单元格
+
+
+def _grow(array, capacity):
+    grown = np.empty(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def load_parts_table(file_path, layout=DEFAULT_LAYOUT, progress=None):
+    """以只读流式方式读取零件工作簿，返回 PartTable
+
+    任意行格式错误时抛出 PartsLoadError，其中列出所有出错的行号。
+    progress(done, total) 为可选的进度回调，每读取 PROGRESS_INTERVAL 行调用一次。
+    """
+    # openpyxl 导入较慢，延迟到首次读取时再导入，缩短程序启动时间
+    from openpyxl import load_workbook
+    from openpyxl.utils import column_index_from_string, coordinate_to_tuple
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook[layout.sheet_name] if layout.sheet_name else workbook.active
+
+        count_value = _read_cell(sheet, layout.count_cell)
+        count_row = coordinate_to_tuple(layout.count_cell)[0]
+        try:
+            part_count = int(count_value)
+        except (TypeError, ValueError):
+            raise PartsLoadError(file_path, [(count_row, f"零件数量 {layout.count_cell} 无效：{count_value!r}")]) from None
+        if part_count < 0:
+            raise PartsLoadError(file_path, [(count_row, f"零件数量 {layout.count_cell} 不能为负数：{part_count}")])
+
+        columns = [column_index_from_string(c) for c in (layout.name_column, layout.volume_column, layout.support_column)]
+        first_column = min(columns)
+        name_idx, volume_idx, support_idx = (c - first_column for c in columns)
+
+        names = []
+        # 零件数量来自用户填写的单元格（例如误填为 1e9），不能直接按它分配内存；
+        # 只读模式下 iter_rows 不会越过实际数据的最后一行，按实际读到的行数扩充即可
+        volumes = np.empty(min(part_count, INITIAL_CAPACITY), dtype=np.float64)
+        support_volumes = np.empty_like(volumes)
+        errors = []
+
+        last_row = layout.start_row + part_count - 1
+        rows = sheet.iter_rows(min_row=layout.start_row, max_row=last_row,
+                               min_col=first_column, max_col=max(columns), values_only=True) if part_count else ()
+        i = -1
+        for i, values in enumerate(rows):
+            if progress is not None and i % PROGRESS_INTERVAL == 0:
+                progress(i, part_count)
+            row = layout.start_row + i
+            if i == len(volumes):
+                volumes = _grow(volumes, min(2 * i, part_count))
+                support_volumes = _grow(support_volumes, len(volumes))
+            name = values[name_idx] if name_idx < len(values) else None
+            names.append(name)
+            try:
+                volumes[i] = float(values[volume_idx])
+            except (IndexError, TypeError, ValueError):
+                errors.append((row, f"零件体积无效：{values[volume_idx] if volume_idx < len(values) else None!r}"))
+            try:
+                support_volumes[i] = float(values[support_idx])
+            except (IndexError, TypeError, ValueError):
+                errors.append((row, f"支撑体积无效：{values[support_idx] if support_idx < len(values) else None!r}"))
+
+        if last_row - (layout.start_row + i) > MISSING_ROWS_LISTED:
+            errors.append((count_row, f"零件数量 {layout.count_cell} 为 {part_count}，"
+                                      f"但工作表从第 {layout.start_row} 行起只有 {i + 1} 行零件数据"))
+        else:
+            for row in range(layout.start_row + i + 1, last_row + 1):
+                errors.append((row, "缺少零件数据"))
+        if progress is not None:
+            progress(part_count, part_count)
+    finally:
+        workbook.close()
+
+    if errors:
+        raise PartsLoadError(file_path, errors)
+    return PartTable(names, volumes, support_volumes)
+
+
+def load_parts_file(file_path, progress=None, support=None, cache=None):
+    """按扩展名读取零件：.stl 为单个零件的网格（见 geometry），其余按零件工作簿读取
+
+    support 为 support.SupportSettings 时由网格估算 STL 零件的支撑体积；工作簿自带支撑体积，忽略此参数。
+    cache 为 geometry_cache.GeometryCache 时，内容相同的文件直接复用上次读取的结果。
+    """
+    if str(file_path).lower().endswith(".stl"):
+        from geometry import load_stl_parts
+        return load_stl_parts([file_path], progress=progress, support=support, cache=cache)
+    if cache is None:
+        return load_parts_table(file_path, progress=progress)
+    from geometry_cache import cached_workbook
+    return cached_workbook(cache, file_path, DEFAULT_LAYOUT, lambda: load_parts_table(file_path, progress=progress))
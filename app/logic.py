@@ -1,50 +1,32 @@
-import re
+import numpy as np
+
+from duration import parse_duration
+from parts import as_part_table
+
+# 默认定价标准，界面与命令行共用
+DEFAULT_PRICING_STANDARD = {
+    "钛粉密度": 4.50,
+    "致密系数": 0.9995,
+    "用量比例": 1.5,
+    "材料单价": 1800,
+    "机时费率": 250,
+    "氩气单价": 1800,
+    "氩气耗率": 27.5,
+    "后处理费": 1500,
+    "折扣优惠": 1.0
+}
 
 def convert_duration_to_hours(duration_str):
-    # 初始化时间单位
-    days = hours = minutes = seconds = 0
-    
-    # 使用正则表达式提取各时间单位
-    patterns = {
-        'days': r'(\d+)天',
-        'hours': r'(\d+)小时',
-        'minutes': r'(\d+)分',
-        'seconds': r'(\d+)秒'
-    }
-    
-    for unit, pattern in patterns.items():
-        match = re.search(pattern, duration_str)
-        if match:
-            value = int(match.group(1))
-            if unit == 'days':
-                days = value
-            elif unit == 'hours':
-                hours = value
-            elif unit == 'minutes':
-                minutes = value
-            elif unit == 'seconds':
-                seconds = value
-    
-    # 转换为总小时数（保留3位小数）
-    total_hours = (
-        days * 24 + 
-        hours + 
-        minutes / 60 + 
-        seconds / 3600
-    )
-
-    # 四舍五入到2位小数
-    return total_hours
+    """将打印时长转换为小时数，格式非法时抛出 duration.DurationParseError"""
+    return parse_duration(duration_str)
 
-def calculate_multipart_cost(parts, total_print_duration, pricing_standard):
-    # 总材料计算，使用零件体积和支撑体积的总和
-    total_volume = sum(p['volume'] + p['support_volume'] for p in parts)
+def cost_components(total_volume, machine_hours, pricing_standard):
+    """按总体积和机时计算各项费用（标量与 NumPy 数组通用）"""
     material_weight_g = (total_volume * 1e-3 * pricing_standard["钛粉密度"]
                          * pricing_standard["用量比例"] * pricing_standard["致密系数"])
     material_cost = material_weight_g * pricing_standard["材料单价"] * 1e-3
 
     # 机时费用
-    machine_hours = convert_duration_to_hours(total_print_duration)
     machine_cost = machine_hours * pricing_standard["机时费率"]
 
     # 其他费用
@@ -55,19 +37,132 @@ def calculate_multipart_cost(parts, total_print_duration, pricing_standard):
     total_cost = material_cost + machine_cost + argon_cost + post_processing
     actual_cost = total_cost * pricing_standard["折扣优惠"]
 
+    return {
+        "材料费用": material_cost,
+        "机时费用": machine_cost,
+        "氩气费用": argon_cost,
+        "后处理费": post_processing,
+        "总费用": total_cost,
+        "实际费用": actual_cost
+    }
+
+def cost_details(total_volume, machine_hours, pricing_standard):
+    """计算明细：各项费用保留 2 位小数"""
+    costs = cost_components(total_volume, machine_hours, pricing_standard)
+    return {key: round(value, 2) for key, value in costs.items()}
+
+def calculate_multipart_cost(parts, total_print_duration, pricing_standard):
+    # 总材料计算，使用零件体积和支撑体积的总和（PartTable 构建时已求和）
+    table = as_part_table(parts)
+    machine_hours = convert_duration_to_hours(total_print_duration)
+
     return {
         "输入参数": {
-            "零件清单": [f"{p['name']} (零件体积：{p['volume']:.3f}mm³，支撑体积：{p['support_volume']:.3f}mm³)" for p in parts],
+            "零件清单": [f"{name} (零件体积：{volume:.3f}mm³，支撑体积：{support_volume:.3f}mm³)"
+                     for name, volume, support_volume in table.rows()],
             "总打印时长": total_print_duration,
-            "零件数量": len(parts)
+            "零件数量": len(table)
         },
         "定价标准": pricing_standard,
-        "计算明细": {
-            "材料费用": round(material_cost, 2),
-            "机时费用": round(machine_cost, 2),
-            "氩气费用": round(argon_cost, 2),
-            "后处理费": round(post_processing, 2),
-            "总费用": round(total_cost, 2),
-            "实际费用": round(actual_cost, 2)
-        }
-    }
\ No newline at end of file
+        "计算明细": cost_details(table.total_volume, machine_hours, pricing_standard)
+    }
+
+def build_quote(parts, total_print_duration, pricing_standard, cache=None):
+    """计算报价，结果中的零件清单直接引用 PartTable，供报表与导出使用，不复制零件数据
+
+    传入 cache（cache.QuoteCache）时，相同零件表、打印时长和定价标准直接复用缓存的计算明细。
+    """
+    table = as_part_table(parts)
+    details = key = None
+    if cache is not None:
+        from cache import quote_key
+        key = quote_key(table, total_print_duration, pricing_standard)
+        details = cache.get(key)
+
+    if details is None:
+        machine_hours = convert_duration_to_hours(total_print_duration)
+        details = cost_details(table.total_volume, machine_hours, pricing_standard)
+        if cache is not None:
+            cache.put(key, details)
+
+    return {
+        "输入参数": {
+            "零件清单": table,
+            "总打印时长": total_print_duration,
+            "零件数量": len(table)
+        },
+        "定价标准": pricing_standard,
+        "计算明细": details
+    }
+
+class IncrementalQuote:
+    """增量报价
+
+    与零件相关的总体积（O(N)）只在零件变化时计算一次，与打印时长相关的机时只在时长变化时解析一次；
+    此后单价、费率、折扣等参数变化时只需 O(1) 重算各项费用，结果与 calculate_multipart_cost 完全一致。
+    """
+
+    def __init__(self):
+        self.total_volume = None
+        self.total_print_duration = None
+        self.machine_hours = None
+        self.pricing_standard = {}
+        self.details = {}
+
+    def set_parts(self, parts):
+        # 与 calculate_multipart_cost 共用 PartTable 缓存的总体积，保证结果逐位一致
+        self.total_volume = as_part_table(parts).total_volume
+        self.details = {}
+
+    def set_duration(self, total_print_duration):
+        if total_print_duration != self.total_print_duration:
+            self.machine_hours = convert_duration_to_hours(total_print_duration)
+            self.total_print_duration = total_print_duration
+
+    def update(self, total_print_duration, pricing_standard):
+        """按新的打印时长和定价标准重算，返回发生变化的计算明细项及“折扣优惠”“总打印时长”"""
+        if self.total_volume is None:
+            raise ValueError("请先设置零件信息")
+        previous_duration = self.total_print_duration
+        self.set_duration(total_print_duration)
+
+        details = cost_details(self.total_volume, self.machine_hours, pricing_standard)
+        changed = {key for key, value in details.items() if self.details.get(key) != value}
+        if self.pricing_standard.get("折扣优惠") != pricing_standard["折扣优惠"]:
+            changed.add("折扣优惠")
+        if previous_duration != total_print_duration:
+            changed.add("总打印时长")
+
+        self.details = details
+        self.pricing_standard = dict(pricing_standard)
+        return changed
+
+def round_array(values, ndigits=2):
+    """向量化四舍五入，结果与内置 round 逐元素一致"""
+    rounded = np.round(values, ndigits)
+    # np.round 先乘后舍，在恰好落在 .5 附近的值上可能与 round 的正确舍入不同，逐个修正
+    scaled = values * 10.0 ** ndigits
+    ambiguous = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in ambiguous:
+        rounded.flat[i] = round(float(values.flat[i]), ndigits)
+    return rounded
+
+def calculate_batch_cost(volumes, support_volumes, machine_hours, pricing_standard):
+    """向量化批量计算多个作业的费用明细
+
+    volumes、support_volumes、machine_hours 为逐作业的一维数组（体积单位 mm³，机时单位小时），
+    pricing_standard 的每一项可以是标量，也可以是与作业数等长的数组。
+    返回与 calculate_multipart_cost 的“计算明细”同名的键，值为保留 2 位小数的 NumPy 数组，
+    每个元素与对同一作业调用标量函数的结果完全一致。
+    """
+    volumes = np.asarray(volumes, dtype=np.float64)
+    support_volumes = np.asarray(support_volumes, dtype=np.float64)
+    machine_hours = np.asarray(machine_hours, dtype=np.float64)
+    pricing = {key: np.asarray(value, dtype=np.float64) for key, value in pricing_standard.items()}
+
+    costs = cost_components(volumes + support_volumes, machine_hours, pricing)
+    shape = np.broadcast_shapes(*(np.shape(value) for value in costs.values()))
+    return {
+        key: round_array(np.broadcast_to(value, shape).astype(np.float64))
+        for key, value in costs.items()
+    }
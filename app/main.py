@@ -1,13 +1,68 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QMessageBox
-from PyQt5.QtGui import QIcon
-from gui import CostCalculatorApp
-from utils import resource_path
 import os
+import time
+import tempfile
+
+STARTUP_BUDGET_MS = 1500  # 冷启动到窗口首次绘制的目标耗时（毫秒）
+
+
+class StartupProfiler:
+    """记录启动各阶段耗时，通过 --startup-profile 开启"""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.start = self.last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000, (now - self.start) * 1000))
+        self.last = now
+
+    def report(self, first_paint_ms):
+        from formatter import get_display_width
+
+        def pad(text, width=24):
+            return text + " " * (width - get_display_width(text))
+
+        lines = ["启动耗时分析", f"{pad('阶段')}{'耗时(ms)':>10}{'累计(ms)':>10}"]
+        lines += [f"{pad(phase)}{elapsed:>10.1f}{total:>10.1f}" for phase, elapsed, total in self.phases]
+        verdict = "达标" if first_paint_ms <= STARTUP_BUDGET_MS else "超出预算"
+        lines.append(f"首次绘制 {first_paint_ms:.1f} ms / 预算 {STARTUP_BUDGET_MS} ms：{verdict}")
+        text = "\n".join(lines)
+
+        # --noconsole 打包时没有标准输出，改写到临时目录
+        if sys.stdout is not None:
+            print(text)
+        else:
+            with open(os.path.join(tempfile.gettempdir(), "PrintCostPro_startup.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+
 
 def main():
+    profiler = StartupProfiler("--startup-profile" in sys.argv)
+    if profiler.enabled:
+        sys.argv.remove("--startup-profile")
+
+    # --profile 前缀：对每个后台任务采集 cProfile/tracemalloc 数据，写到 <前缀>-<任务>.prof/.txt
+    if "--profile" in sys.argv:
+        index = sys.argv.index("--profile")
+        if index + 1 < len(sys.argv):
+            from instrument import PROFILE_ENV
+            os.environ[PROFILE_ENV] = os.path.abspath(sys.argv[index + 1])
+            del sys.argv[index:index + 2]
+
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    from PyQt5.QtGui import QIcon
+    profiler.mark("导入 PyQt5")
+
     try:
         app = QApplication(sys.argv)
+        profiler.mark("创建 QApplication")
+
+        from gui import CostCalculatorApp
+        from utils import resource_path
+        profiler.mark("导入界面模块")
 
         # 图标路径
         icon_path = resource_path("app/resources/3dprint.ico")
@@ -15,6 +70,22 @@ def main():
             app.setWindowIcon(QIcon(icon_path))
 
         window = CostCalculatorApp()
+        profiler.mark("构建主窗口")
+
+        if profiler.enabled:
+            first_paint = []
+
+            def on_first_painted():
+                profiler.mark("首次绘制")
+                first_paint.append(profiler.phases[-1][2])
+
+            def on_fonts_ready():
+                profiler.mark("注册字体（首次绘制后）")
+                profiler.report(first_paint[0])
+
+            window.first_painted.connect(on_first_painted)
+            window.fonts_ready.connect(on_fonts_ready)
+
         window.show()
 
         sys.exit(app.exec_())
@@ -23,4 +94,7 @@ def main():
         QMessageBox.critical(None, "启动失败", f"错误信息：{str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 打包为 exe 后，估算打印时长时启动的子进程会再次运行本程序，需要由 freeze_support 接管
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
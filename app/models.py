@@ -0,0 +1,190 @@
+import numpy as np
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QColor
+
+
+def heat_color(ratio):
+    """0 → 绿色，1 → 红色"""
+    ratio = min(max(ratio, 0.0), 1.0)
+    return QColor(int(99 + 149 * ratio), int(190 - 85 * ratio), int(123 - 16 * ratio))
+
+
+class PartTableModel(QAbstractTableModel):
+    """PartTable 的只读表格模型
+
+    模型只保存一个“视图行 → 零件下标”的索引数组，排序和筛选都只重排该数组，
+    不复制零件数据；QTableView 只会请求可见行的数据。
+    """
+
+    HEADERS = ["零件名称", "零件体积 (mm³)", "支撑体积 (mm³)", "材料成本占比", "分摊实付金额"]
+    NAME, VOLUME, SUPPORT, SHARE, ALLOCATED = range(5)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._table = None
+        self._shares = np.empty(0)
+        self._allocated = None  # 逐零件分摊的实际费用，未分摊时为 None
+        self._rows = np.empty(0, dtype=np.intp)
+        self._filter_text = ""
+        self._sort_column = None
+        self._sort_order = Qt.AscendingOrder
+
+    def set_parts(self, table):
+        """整体替换零件表，一次性刷新视图"""
+        self.beginResetModel()
+        self._table = table
+        self._allocated = None
+        if table is not None and len(table):
+            # 材料费用与零件体积 + 支撑体积成正比
+            total_sum = table.total_volume
+            self._shares = table.total_volumes / total_sum if total_sum else np.zeros(len(table))
+        else:
+            self._shares = np.empty(0)
+        self._rows = self._filtered_rows()
+        self._apply_sort()
+        self.endResetModel()
+
+    def set_allocation(self, allocation):
+        """显示逐零件分摊金额（allocation.CostAllocation），传入 None 时清空该列"""
+        self._allocated = None if allocation is None else allocation.fields["实际费用"]
+        if self._sort_column == self.ALLOCATED:
+            self.sort(self._sort_column, self._sort_order)
+        elif len(self._rows):
+            self.dataChanged.emit(self.index(0, self.ALLOCATED), self.index(len(self._rows) - 1, self.ALLOCATED))
+
+    def clear(self):
+        self.set_parts(None)
+
+    def set_filter(self, text):
+        """按零件名称筛选（不区分大小写）"""
+        self.beginResetModel()
+        self._filter_text = text.strip().lower()
+        self._rows = self._filtered_rows()
+        self._apply_sort()
+        self.endResetModel()
+
+    def part_index(self, row):
+        """视图行对应的零件下标"""
+        return int(self._rows[row])
+
+    def _filtered_rows(self):
+        if self._table is None:
+            return np.empty(0, dtype=np.intp)
+        if not self._filter_text:
+            return np.arange(len(self._table), dtype=np.intp)
+        needle = self._filter_text
+        return np.fromiter(
+            (i for i, name in enumerate(self._table.names) if name is not None and needle in str(name).lower()),
+            dtype=np.intp
+        )
+
+    def _apply_sort(self):
+        if self._sort_column is None or not len(self._rows):
+            return
+        if self._sort_column == self.NAME:
+            names = self._table.names
+            keys = sorted(range(len(self._rows)), key=lambda i: str(names[self._rows[i]] or ""))
+            order = np.asarray(keys, dtype=np.intp)
+        else:
+            column = {
+                self.VOLUME: self._table.volumes,
+                self.SUPPORT: self._table.support_volumes,
+                self.SHARE: self._shares,
+                self.ALLOCATED: self._allocated if self._allocated is not None else np.zeros(len(self._table)),
+            }[self._sort_column]
+            order = np.argsort(column[self._rows], kind="stable")
+        if self._sort_order == Qt.DescendingOrder:
+            order = order[::-1]
+        self._rows = self._rows[order]
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.beginResetModel()
+        self._sort_column = column if column >= 0 else None  # -1 表示恢复工作簿顺序
+        self._sort_order = order
+        self._rows = self._filtered_rows()
+        self._apply_sort()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == self.NAME:
+                name = self._table.names[i]
+                return "" if name is None else str(name)
+            if column == self.VOLUME:
+                return f"{self._table.volumes[i]:.3f}"
+            if column == self.SUPPORT:
+                return f"{self._table.support_volumes[i]:.3f}"
+            if column == self.SHARE:
+                return f"{self._shares[i]:.2%}"
+            return "" if self._allocated is None else f"¥{self._allocated[i]:,.2f}"
+        if role == Qt.TextAlignmentRole and column != self.NAME:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        # 行号显示零件在工作簿中的序号，排序筛选后保持不变
+        return f"零件{self._rows[section] + 1}"
+
+
+class HeatmapModel(QAbstractTableModel):
+    """参数扫描热力图的只读表格模型
+
+    只保存二维数组和表头，单元格文字和底色在视图请求可见单元格时才生成，
+    1000 × 1000 的热力图也不需要创建上百万个表格项。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._data = np.empty((0, 0))
+        self._row_labels = []
+        self._column_labels = []
+        self._low = 0.0
+        self._span = 1.0
+
+    def set_data(self, row_labels, column_labels, data):
+        """整体替换热力图数据，data 为 (行数, 列数) 的数组"""
+        self.beginResetModel()
+        self._data = np.asarray(data, dtype=np.float64)
+        self._row_labels = list(row_labels)
+        self._column_labels = list(column_labels)
+        if self._data.size:
+            self._low = float(self._data.min())
+            self._span = (float(self._data.max()) - self._low) or 1.0
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._data.shape[0]
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._data.shape[1]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = float(self._data[index.row(), index.column()])
+        if role == Qt.DisplayRole:
+            return f"{value:,.2f}"
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role == Qt.BackgroundRole:
+            return heat_color((value - self._low) / self._span)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        return (self._column_labels if orientation == Qt.Horizontal else self._row_labels)[section]
@@ -0,0 +1,90 @@
+import sys
+
+import numpy as np
+
+
+class PartTable:
+    """列式零件表：名称列表 + float64 体积列
+
+    读取、计算、报表、导出共用同一个 PartTable，不再转换为字典列表。
+    体积列直接以 NumPy 数组对外提供（不复制），切片得到的子表与原表共享内存；
+    合计值在构建时计算一次并缓存。
+    support_method 为支撑体积由网格估算时的方法说明（见 support.SupportSettings.describe），
+    表格中直接给出支撑体积时为 None。
+    """
+
+    __slots__ = ("names", "volumes", "support_volumes", "total_volumes",
+                 "volume_sum", "support_volume_sum", "total_volume", "support_method")
+
+    def __init__(self, names, volumes, support_volumes, support_method=None):
+        # 同名零件往往大量重复，驻留后只保存一份字符串
+        names = [sys.intern(name) if type(name) is str else name for name in names]
+        volumes = np.asarray(volumes, dtype=np.float64)
+        support_volumes = np.asarray(support_volumes, dtype=np.float64)
+        if not (len(names) == len(volumes) == len(support_volumes)):
+            raise ValueError("零件名称、零件体积和支撑体积的数量不一致")
+        self.support_method = support_method
+        self._set_columns(names, volumes, support_volumes)
+
+    def _set_columns(self, names, volumes, support_volumes):
+        self.names = names
+        self.volumes = volumes
+        self.support_volumes = support_volumes
+        self.total_volumes = volumes + support_volumes
+        if len(names):
+            # cumsum 严格从左到右逐个累加（np.sum 为成对求和），结果与逐零件 total += v 的循环逐位一致；
+            # 内置 sum() 在 Python 3.12 起对浮点数做补偿求和，末位可能与此不同
+            self.volume_sum = float(np.cumsum(volumes)[-1])
+            self.support_volume_sum = float(np.cumsum(support_volumes)[-1])
+            self.total_volume = float(np.cumsum(self.total_volumes)[-1])
+        else:
+            self.volume_sum = self.support_volume_sum = self.total_volume = 0.0
+
+    @classmethod
+    def from_records(cls, parts):
+        """由 {'name', 'volume', 'support_volume'} 字典列表构建"""
+        parts = list(parts)
+        return cls(
+            [p['name'] for p in parts],
+            [p['volume'] for p in parts],
+            [p['support_volume'] for p in parts],
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        """逐个产出零件字典，兼容按字典读取零件的旧代码"""
+        for name, volume, support_volume in self.rows():
+            yield {'name': name, 'volume': volume, 'support_volume': support_volume}
+
+    def rows(self):
+        """逐个产出 (名称, 零件体积, 支撑体积)，体积为 Python float"""
+        return zip(self.names, self.volumes.tolist(), self.support_volumes.tolist())
+
+    def __getitem__(self, key):
+        """整数下标返回零件字典；切片、下标数组或布尔掩码返回子表"""
+        if isinstance(key, (int, np.integer)):
+            i = range(len(self))[key]
+            return {'name': self.names[i], 'volume': float(self.volumes[i]),
+                    'support_volume': float(self.support_volumes[i])}
+        table = object.__new__(PartTable)
+        table.support_method = self.support_method
+        if isinstance(key, slice):
+            # 切片为视图，不复制体积数据
+            table._set_columns(self.names[key], self.volumes[key], self.support_volumes[key])
+        else:
+            index = np.asarray(key)
+            if index.dtype == bool:
+                index = np.flatnonzero(index)
+            table._set_columns([self.names[i] for i in index.tolist()],
+                               self.volumes[index], self.support_volumes[index])
+        return table
+
+    def __repr__(self):
+        return f"PartTable({len(self)} 个零件, 总体积 {self.total_volume:.3f}mm³)"
+
+
+def as_part_table(parts):
+    """PartTable 原样返回，字典列表转换为 PartTable"""
+    return parts if isinstance(parts, PartTable) else PartTable.from_records(parts)
@@ -0,0 +1,418 @@
+"""PrintCostPro 本地报价服务（asyncio HTTP/JSON，仅使用标准库）
+
+接口：
+    GET  /health          健康检查
+    GET  /metrics         各接口请求数、延迟直方图及批处理统计
+    POST /quote           {"parts": [{"name", "volume", "support_volume"}, ...], "duration": "1天2小时",
+                           "pricing": {可选，覆盖默认定价标准的项}}
+    POST /quote/workbook  {"path": "零件工作簿路径", "duration": ..., "pricing": ...}，
+                          或以 application/octet-stream 直接上传工作簿，duration 放在查询参数中
+
+并发到达的报价请求会在很短的时间窗内合并，一次调用 calculate_batch_cost 向量化计算；
+工作簿解析在进程池中进行，不阻塞事件循环。默认只监听 127.0.0.1。
+"""
+import asyncio
+import json
+import math
+import os
+import tempfile
+import time
+import zipfile
+from bisect import bisect_left
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from duration import parse_duration
+from geometry import spawn_pool
+from loader import PartsLoadError, load_parts_table
+from logic import DEFAULT_PRICING_STANDARD, calculate_batch_cost
+from parts import as_part_table
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 64 * 1024 * 1024
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class RequestError(Exception):
+    """请求无效，status 为返回的 HTTP 状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图（毫秒）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个桶为超出最大边界的请求
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q):
+        """按分桶估计分位数，返回所在桶的上边界"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99),
+            "buckets": dict(
+                [(f"le_{bound}", count) for bound, count in zip(self.buckets, self.counts)]
+                + [("le_inf", self.counts[-1])]
+            ),
+        }
+
+
+class QuoteBatcher:
+    """把并发到达的报价请求合并成一批，用 calculate_batch_cost 一次算完
+
+    第一个请求到达后最多等待 window 秒，或凑满 max_batch 个请求时立即计算。
+    """
+
+    def __init__(self, window=0.002, max_batch=512):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.batched_requests = 0
+        self.largest_batch = 0
+
+    async def quote(self, total_volume, machine_hours, pricing_standard):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((total_volume, machine_hours, pricing_standard, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        self.batched_requests += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        try:
+            # 总体积已按零件顺序累加（与 calculate_multipart_cost 一致），支撑体积传 0
+            volumes = np.array([job[0] for job in batch], dtype=np.float64)
+            hours = np.array([job[1] for job in batch], dtype=np.float64)
+            pricing = {key: np.array([job[2][key] for job in batch], dtype=np.float64)
+                       for key in DEFAULT_PRICING_STANDARD}
+            details = calculate_batch_cost(volumes, np.zeros(len(batch)), hours, pricing)
+        except Exception as e:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        columns = {key: values.tolist() for key, values in details.items()}
+        for i, (*_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result({key: values[i] for key, values in columns.items()})
+
+    def snapshot(self):
+        return {
+            "batches": self.batches,
+            "requests": self.batched_requests,
+            "mean_batch": round(self.batched_requests / self.batches, 2) if self.batches else None,
+            "largest_batch": self.largest_batch,
+        }
+
+
+def merge_pricing(overrides):
+    """在默认定价标准上覆盖请求给出的项"""
+    pricing_standard = dict(DEFAULT_PRICING_STANDARD)
+    if not overrides:
+        return pricing_standard
+    if not isinstance(overrides, dict):
+        raise RequestError(400, "pricing 必须是对象")
+    unknown = set(overrides) - set(pricing_standard)
+    if unknown:
+        raise RequestError(400, f"未知的定价参数：{'、'.join(sorted(unknown))}")
+    try:
+        pricing_standard.update({key: float(value) for key, value in overrides.items()})
+    except (TypeError, ValueError):
+        raise RequestError(400, "定价参数必须为数字") from None
+    # json.loads 接受 Infinity、NaN 和 1e999，这样的值会让响应变成无效的 JSON
+    invalid = [key for key in overrides if not math.isfinite(pricing_standard[key])]
+    if invalid:
+        raise RequestError(400, f"定价参数必须为有限数值：{'、'.join(sorted(invalid))}")
+    return pricing_standard
+
+
+def load_workbook_bytes(data, suffix=".xlsm"):
+    """在工作进程中解析上传的工作簿内容"""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return load_parts_table(path)
+    except PartsLoadError as e:
+        # 临时文件名对调用方没有意义
+        raise PartsLoadError("上传的工作簿", e.errors) from None
+    finally:
+        os.remove(path)
+
+
+def workbook_input_errors():
+    """解析工作簿时表示输入内容有误（而不是服务故障）的异常类型"""
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    # 不是 zip 文件、zip 中缺少工作簿部件、扩展名不受支持
+    return ValueError, KeyError, zipfile.BadZipFile, InvalidFileException
+
+
+class QuoteServer:
+    """报价服务：HTTP 解析、路由、批处理与指标"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, batch_window=0.002, max_batch=512):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.batcher = QuoteBatcher(batch_window, max_batch)
+        self.histograms = {}
+        self.errors = 0
+        self.started = time.time()
+        self._executor = None
+        self._server = None
+        self.routes = {
+            ("GET", "/health"): self.handle_health,
+            ("GET", "/metrics"): self.handle_metrics,
+            ("POST", "/quote"): self.handle_quote,
+            ("POST", "/quote/workbook"): self.handle_workbook,
+        }
+
+    async def start(self):
+        # 工作进程在首次解析时才启动，fork 会把当时打开的客户端连接一并复制到子进程，
+        # 连接关闭后客户端仍收不到 EOF；spawn 启动的子进程不继承这些连接
+        self._executor = spawn_pool(self.workers)
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # port 为 0 时取实际分配的端口
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    # ---------- HTTP ----------
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except RequestError as e:
+                    await self.write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload = await self.dispatch(method, target, headers, body)
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """读取一个请求，连接关闭时返回 None"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise RequestError(413, "请求头过大") from None
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise RequestError(400, "无效的请求行") from None
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise RequestError(400, "无效的 Content-Length") from None
+        if length < 0:
+            raise RequestError(400, "无效的 Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, f"请求体超过 {MAX_BODY_BYTES // 1024 // 1024} MB")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    async def write_response(self, writer, status, payload, keep_alive=True):
+        try:
+            # 不输出 Infinity/NaN：它们不是合法的 JSON，客户端无法解析
+            body = json.dumps(payload, ensure_ascii=False, allow_nan=False).encode("utf-8")
+        except ValueError:
+            status = 500
+            body = json.dumps({"error": "计算结果包含非有限数值"}, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, headers, body):
+        started = time.perf_counter()
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        try:
+            if handler is None:
+                if any(path == url.path for _, path in self.routes):
+                    raise RequestError(405, f"{url.path} 不支持 {method}")
+                raise RequestError(404, f"未知的接口：{url.path}")
+            status, payload = 200, await handler(parse_qs(url.query), headers, body)
+        except RequestError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+        if status >= 400:
+            self.errors += 1
+        route = url.path if handler is not None else "其他"
+        self.histograms.setdefault(route, LatencyHistogram()).observe((time.perf_counter() - started) * 1000)
+        return status, payload
+
+    # ---------- 接口 ----------
+
+    async def handle_health(self, query, headers, body):
+        return {"status": "ok", "uptime_s": round(time.time() - self.started, 1)}
+
+    async def handle_metrics(self, query, headers, body):
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "errors": self.errors,
+            "latency": {route: histogram.snapshot() for route, histogram in self.histograms.items()},
+            "batching": self.batcher.snapshot(),
+        }
+
+    async def handle_quote(self, query, headers, body):
+        request = self.parse_json(body)
+        parts = request.get("parts")
+        if not isinstance(parts, list):
+            raise RequestError(400, "parts 必须是零件数组")
+        try:
+            table = as_part_table(parts)
+        except (KeyError, TypeError, ValueError) as e:
+            raise RequestError(400, f"零件格式无效：{e}") from None
+        return await self.quote(table, request.get("duration"), request.get("pricing"))
+
+    async def handle_workbook(self, query, headers, body):
+        loop = asyncio.get_running_loop()
+        if headers.get("content-type", "").startswith("application/json"):
+            request = self.parse_json(body)
+            path = request.get("path")
+            if not path or not os.path.isfile(path):
+                raise RequestError(400, f"工作簿不存在：{path}")
+            job = loop.run_in_executor(self._executor, load_parts_table, path)
+        else:
+            request = {key: values[-1] for key, values in query.items()}
+            if "pricing" in request:
+                request["pricing"] = self.parse_json(request["pricing"].encode("utf-8"))
+            if not body:
+                raise RequestError(400, "请上传工作簿内容")
+            job = loop.run_in_executor(self._executor, load_workbook_bytes, body)
+        bad_input = workbook_input_errors()
+        executor = self._executor
+        try:
+            table = await job
+        except BrokenProcessPool:
+            # 解析进程异常退出（例如内存不足被系统终止）后进程池永久不可用，换一个新的，后续请求照常处理
+            if self._executor is executor:
+                executor.shutdown(wait=False)
+                self._executor = spawn_pool(self.workers)
+            raise RequestError(503, "解析工作簿的工作进程异常退出，已重新启动，请重试") from None
+        except bad_input as e:  # PartsLoadError 等格式错误，或者上传的根本不是工作簿
+            message = str(e) if isinstance(e, ValueError) else f"无法解析工作簿（{type(e).__name__}: {e}）"
+            raise RequestError(400, message) from None
+        return await self.quote(table, request.get("duration"), request.get("pricing"))
+
+    @staticmethod
+    def parse_json(body):
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise RequestError(400, "请求体不是有效的 JSON") from None
+        if not isinstance(request, dict):
+            raise RequestError(400, "请求体必须是 JSON 对象")
+        return request
+
+    async def quote(self, table, total_print_duration, pricing_overrides):
+        if not isinstance(total_print_duration, str) or not total_print_duration.strip():
+            raise RequestError(400, "缺少 duration（总打印时长）")
+        try:
+            machine_hours = parse_duration(total_print_duration)
+        except ValueError as e:
+            raise RequestError(400, str(e)) from None
+        if not math.isfinite(machine_hours):
+            raise RequestError(400, f"打印时长无效：{total_print_duration}")
+        if not np.isfinite(table.total_volumes).all():
+            bad = int(np.flatnonzero(~np.isfinite(table.total_volumes))[0])
+            raise RequestError(400, f"第 {bad + 1} 个零件的体积不是有限数值")
+        pricing_standard = merge_pricing(pricing_overrides)
+        details = await self.batcher.quote(table.total_volume, machine_hours, pricing_standard)
+        if not all(math.isfinite(value) for value in details.values() if isinstance(value, float)):
+            raise RequestError(400, "零件体积或定价参数过大，计算结果溢出")
+        return {
+            "输入参数": {"总打印时长": total_print_duration, "零件数量": len(table),
+                     "总体积": table.total_volume, "机时": machine_hours},
+            "定价标准": pricing_standard,
+            "计算明细": details,
+        }
+
+
+async def run_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, batch_window=0.002, max_batch=512):
+    server = await QuoteServer(host, port, workers, batch_window, max_batch).start()
+    print(f"报价服务已启动：http://{server.host}:{server.port}（Ctrl+C 退出）", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
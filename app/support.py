@@ -0,0 +1,196 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# 估算方法
+SUPPORT_METHODS = {
+    "heightmap": "高度图",
+    "projection": "投影到底板",
+}
+
+FACET_CHUNK = 1 << 14            # 计算法向时每块的三角形数，与 geometry.VOLUME_CHUNK 相同的考虑
+RASTER_SAMPLES = 1 << 22         # 栅格化时每批最多展开的候选采样点数，限制临时内存
+
+
+@dataclass(frozen=True)
+class SupportSettings:
+    """支撑估算参数
+
+    与水平面夹角小于 overhang_angle（度）的朝下表面需要支撑。
+    method 为 "heightmap" 时在 resolution（mm）的网格上逐格求出悬垂面到其正下方零件表面或底板的高度，
+    为 "projection" 时把悬垂面直接投影到底板（不考虑下方的零件本身，结果偏大，但不需要栅格化）。
+    """
+    overhang_angle: float = 45.0
+    method: str = "heightmap"
+    resolution: float = 0.5
+
+    def __post_init__(self):
+        if self.method not in SUPPORT_METHODS:
+            raise ValueError(f"未知的支撑估算方法：{self.method}")
+        if not 0 < self.overhang_angle < 90:
+            raise ValueError(f"悬垂角应在 0° 到 90° 之间：{self.overhang_angle}")
+        if self.resolution <= 0:
+            raise ValueError(f"高度图网格尺寸应大于 0：{self.resolution}")
+
+    def describe(self):
+        """写入报表的估算方法说明"""
+        text = f"{SUPPORT_METHODS[self.method]}估算，悬垂角 {self.overhang_angle:g}°"
+        if self.method == "heightmap":
+            text += f"，网格 {self.resolution:g} mm"
+        return text
+
+
+DEFAULT_SUPPORT = SupportSettings()
+
+
+class SupportEstimate:
+    """一个网格的支撑估算结果：volume 为支撑体积（mm³），area 为需要支撑的悬垂面投影面积（mm²）"""
+
+    __slots__ = ("volume", "area", "settings")
+
+    def __init__(self, volume, area, settings):
+        self.volume = volume
+        self.area = area
+        self.settings = settings
+
+    def __repr__(self):
+        return f"SupportEstimate(体积 {self.volume:.3f}mm³, 悬垂面积 {self.area:.3f}mm², {self.settings.describe()})"
+
+
+def _facets(triangles, overhang_angle, orientation, with_floors=True):
+    """分块计算每个三角形的朝向，返回 (需要支撑的三角形, 朝上的三角形)，均为 float64 副本
+
+    不信任文件中的法向量，按顶点顺序重新计算；orientation 为 -1 时网格法向朝内，整体翻转。
+    """
+    threshold = np.cos(np.radians(overhang_angle))
+    overhangs, floors = [], []
+    for start in range(0, len(triangles), FACET_CHUNK):
+        block = np.asarray(triangles[start:start + FACET_CHUNK], dtype=np.float64)
+        u = block[:, 1] - block[:, 0]
+        v = block[:, 2] - block[:, 0]
+        cross = np.cross(u, v) * orientation
+        length = np.sqrt(np.einsum("ij,ij->i", cross, cross))
+        # 法向与竖直向下方向的夹角即表面与水平面的夹角，小于悬垂角时需要支撑
+        downward = np.divide(-cross[:, 2], length, out=np.zeros_like(length), where=length > 0)
+        overhangs.append(block[downward > threshold])
+        if with_floors:
+            floors.append(block[cross[:, 2] > 0])
+    empty = np.empty((0, 3, 3))
+    return (np.concatenate(overhangs) if overhangs else empty), (np.concatenate(floors) if floors else empty)
+
+
+def _projected_area(triangles):
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    return 0.5 * np.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1]))
+
+
+def _rasterize(triangles, origin, resolution, shape):
+    """在网格中心点上对三角形做栅格化，返回 (格子编号, 该点处三角形的 z)
+
+    每个三角形只展开其包围盒内的格子，再用重心坐标筛出落在三角形内的点。
+    """
+    if not len(triangles):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    xy = (triangles[:, :, :2] - origin) / resolution - 0.5  # 以格子中心为整数坐标
+    # 逐顶点比较比沿长度为 3 的轴归约快得多
+    low = np.minimum(np.minimum(xy[:, 0], xy[:, 1]), xy[:, 2])
+    high = np.maximum(np.maximum(xy[:, 0], xy[:, 1]), xy[:, 2])
+    low = np.maximum(np.ceil(low).astype(np.int64), 0)
+    high = np.minimum(np.floor(high).astype(np.int64), np.array(shape) - 1)
+    width = np.maximum(high - low + 1, 0)
+    counts = width[:, 0] * width[:, 1]
+
+    cells, heights = [], []
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(triangles):
+        # 按展开后的采样点数分批，每批至少一个三角形，避免大三角形一次展开过多
+        base = int(ends[start - 1]) if start else 0
+        stop = max(int(np.searchsorted(ends, base + RASTER_SAMPLES, side="right")), start + 1)
+        n = counts[start:stop]
+        total = int(ends[stop - 1]) - base
+        owner = np.repeat(np.arange(start, stop), n)
+        local = np.arange(total) - np.repeat(np.cumsum(n) - n, n)
+        start = stop
+        if not total:
+            continue
+        i = low[owner, 0] + local % width[owner, 0]
+        j = low[owner, 1] + local // width[owner, 0]
+
+        # 重心坐标
+        p = xy[owner]
+        d1, d2 = p[:, 1] - p[:, 0], p[:, 2] - p[:, 0]
+        qx, qy = i - p[:, 0, 0], j - p[:, 0, 1]
+        det = d1[:, 0] * d2[:, 1] - d2[:, 0] * d1[:, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s = (qx * d2[:, 1] - qy * d2[:, 0]) / det
+            t = (d1[:, 0] * qy - d1[:, 1] * qx) / det
+            eps = 1e-9
+            inside = (det != 0) & (s >= -eps) & (t >= -eps) & (s + t <= 1 + eps)
+            z = triangles[owner, :, 2]
+            z = z[:, 0] + s * (z[:, 1] - z[:, 0]) + t * (z[:, 2] - z[:, 0])
+        cells.append((i * shape[1] + j)[inside])
+        heights.append(z[inside])
+    if not cells:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(cells), np.concatenate(heights)
+
+
+def _heightmap_volume(overhangs, floors, plate_z, low_corner, high_corner, resolution):
+    """逐格累加每个悬垂点到其正下方最近的朝上表面（没有时为底板）的高度"""
+    origin = low_corner[:2]
+    shape = tuple(int(n) for n in np.floor((high_corner[:2] - origin) / resolution).astype(np.int64) + 1)
+    over_cells, over_z = _rasterize(overhangs, origin, resolution, shape)
+    if not len(over_cells):
+        return 0.0
+    floor_cells, floor_z = _rasterize(floors, origin, resolution, shape)
+
+    cells = np.concatenate([floor_cells, over_cells])
+    z = np.concatenate([floor_z, over_z])
+    is_over = np.concatenate([np.zeros(len(floor_cells), dtype=bool), np.ones(len(over_cells), dtype=bool)])
+    order = np.lexsort((z, cells))
+    cells, z, is_over = cells[order], z[order], is_over[order]
+
+    # 相邻三角形共用的边恰好经过格子中心时同一表面会被采样两次，去掉重复的点
+    tolerance = 1e-6 * max(1.0, float(np.abs(high_corner - low_corner).max()))
+    duplicate = np.zeros(len(cells), dtype=bool)
+    duplicate[1:] = (cells[1:] == cells[:-1]) & (is_over[1:] == is_over[:-1]) & (np.diff(z) <= tolerance)
+    keep = ~duplicate
+    cells, z, is_over = cells[keep], z[keep], is_over[keep]
+
+    # 每个点之前（同一格子、更低处）最近的朝上表面
+    positions = np.arange(len(cells))
+    last_floor = np.maximum.accumulate(np.where(is_over, -1, positions))
+    over = np.flatnonzero(is_over)
+    below = last_floor[over]
+    has_floor = (below >= 0) & (cells[np.maximum(below, 0)] == cells[over])
+    floor_height = np.where(has_floor, z[np.maximum(below, 0)], plate_z)
+    heights = np.clip(z[over] - floor_height, 0.0, None)
+    return float(heights.sum()) * resolution * resolution
+
+
+def estimate_support(mesh, settings=DEFAULT_SUPPORT, plate_z=None):
+    """估算网格所需的支撑体积，返回 SupportEstimate
+
+    mesh 为 geometry.Mesh；plate_z 为底板高度，默认取网格最低点（零件直接放在底板上）。
+    """
+    from geometry import signed_volume
+
+    triangles = mesh.triangles
+    if not len(triangles):
+        return SupportEstimate(0.0, 0.0, settings)
+    low_corner, high_corner = mesh.bounds()
+    if plate_z is None:
+        plate_z = float(low_corner[2])
+    orientation = -1.0 if signed_volume(triangles) < 0 else 1.0
+
+    overhangs, floors = _facets(triangles, settings.overhang_angle, orientation,
+                                with_floors=settings.method == "heightmap")
+    area = float(_projected_area(overhangs).sum())
+    if settings.method == "projection":
+        # 投影柱体积：水平投影面积 × 三个顶点到底板的平均高度，对平面三角形是精确的
+        mean_height = np.clip(overhangs[:, :, 2].mean(axis=1) - plate_z, 0.0, None)
+        volume = float(np.dot(_projected_area(overhangs), mean_height))
+    else:
+        volume = _heightmap_volume(overhangs, floors, plate_z, low_corner, high_corner, settings.resolution)
+    return SupportEstimate(volume, area, settings)
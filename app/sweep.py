@@ -0,0 +1,128 @@
+import csv
+import itertools
+import math
+
+import numpy as np
+
+from logic import cost_components, round_array, convert_duration_to_hours
+from parts import as_part_table
+
+# 定价参数扫描默认提供的维度
+DEFAULT_SWEEP_KEYS = ("材料单价", "机时费率", "氩气耗率", "折扣优惠")
+
+CSV_CHUNK_ROWS = 100_000  # 导出长表时每次转换的行数
+SWEEP_POINT_LIMIT = 2_000_000  # 网格点数上限，五个费用项各占 8 字节/点，再加上广播计算的临时数组
+
+
+class SweepResult:
+    """参数扫描结果
+
+    axes 为按维度顺序排列的 {定价参数: 取值数组}，
+    details 为 {费用项: N 维数组}，第 i 维对应 axes 中第 i 个参数。
+    """
+
+    def __init__(self, axes, details):
+        self.axes = axes
+        self.details = details
+
+    @property
+    def shape(self):
+        return tuple(len(values) for values in self.axes.values())
+
+    def iter_rows(self, fields=None):
+        """逐行产出长表格式：各扫描参数取值 + 各费用项"""
+        fields = list(fields or self.details)
+        keys = list(self.axes)
+        for index in itertools.product(*(range(n) for n in self.shape)):
+            row = {key: float(self.axes[key][i]) for key, i in zip(keys, index)}
+            row.update({field: float(self.details[field][index]) for field in fields})
+            yield row
+
+    def write_csv(self, path, fields=None):
+        """以长表格式导出全部网格点"""
+        fields = list(fields or self.details)
+        keys = list(self.axes)
+        grids = np.meshgrid(*self.axes.values(), indexing="ij", sparse=True)
+        grids = [np.broadcast_to(grid, self.shape).ravel() for grid in grids]
+        columns = grids + [self.details[field].ravel() for field in fields]
+        total = columns[0].size
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(keys + fields)
+            # 分块转换，避免一次性把整个网格展开成 Python 列表
+            for start in range(0, total, CSV_CHUNK_ROWS):
+                chunk = np.column_stack([column[start:start + CSV_CHUNK_ROWS] for column in columns])
+                writer.writerows(chunk.tolist())
+
+    def heatmap(self, row_key, column_key, field="实际费用", fixed=None):
+        """取两个扫描维度上的二维切片，返回 (行取值, 列取值, 二维数组)
+
+        其余维度取 fixed 中给定值最接近的网格点，未给定时取第一个值。
+        """
+        fixed = fixed or {}
+        index = []
+        for key, values in self.axes.items():
+            if key in (row_key, column_key):
+                index.append(slice(None))
+            elif key in fixed:
+                index.append(int(np.abs(values - fixed[key]).argmin()))
+            else:
+                index.append(0)
+        data = self.details[field][tuple(index)]
+        if list(self.axes).index(row_key) > list(self.axes).index(column_key):
+            data = data.T
+        return self.axes[row_key], self.axes[column_key], data
+
+    def write_heatmap_csv(self, path, row_key, column_key, field="实际费用", fixed=None):
+        """以矩阵格式导出二维切片，首行为列参数取值，首列为行参数取值"""
+        rows, columns, data = self.heatmap(row_key, column_key, field, fixed)
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow([f"{row_key} \\ {column_key}"] + columns.tolist())
+            for value, line in zip(rows.tolist(), data.tolist()):
+                writer.writerow([value] + line)
+
+
+def check_grid_size(steps):
+    """各维度取值个数的乘积超过 SWEEP_POINT_LIMIT 时抛出 ValueError，返回网格点数"""
+    points = math.prod(steps)
+    if points > SWEEP_POINT_LIMIT:
+        raise ValueError(f"网格共 {points:,} 个点，超过上限 {SWEEP_POINT_LIMIT:,} 个，请减少扫描参数或取值个数")
+    return points
+
+
+def sweep_cost(total_volume, machine_hours, pricing_standard, grid, rounded=True):
+    """在定价参数网格上一次性广播计算全部费用项
+
+    grid 为 {定价参数: 取值序列}，每个参数占一个维度；未出现在 grid 中的参数取 pricing_standard 的值。
+    rounded 为 True 时结果与 calculate_multipart_cost 一样保留 2 位小数。
+    网格点数超过 SWEEP_POINT_LIMIT 时抛出 ValueError。
+    """
+    unknown = set(grid) - set(pricing_standard)
+    if unknown:
+        raise ValueError(f"未知的定价参数：{'、'.join(sorted(unknown))}")
+
+    axes = {key: np.asarray(values, dtype=np.float64).ravel() for key, values in grid.items()}
+    check_grid_size(len(values) for values in axes.values())
+    pricing = dict(pricing_standard)
+    for dim, (key, values) in enumerate(axes.items()):
+        # 每个参数放在各自的维度上，其余维度长度为 1，交给 NumPy 广播
+        shape = [1] * len(axes)
+        shape[dim] = len(values)
+        pricing[key] = values.reshape(shape)
+
+    costs = cost_components(total_volume, machine_hours, pricing)
+    shape = tuple(len(values) for values in axes.values())
+    details = {}
+    for field, value in costs.items():
+        value = np.broadcast_to(np.asarray(value, dtype=np.float64), shape)
+        details[field] = round_array(value.astype(np.float64)) if rounded else value.copy()
+    return SweepResult(axes, details)
+
+
+def sweep_quote(parts, total_print_duration, pricing_standard, grid, rounded=True):
+    """对一组零件和打印时长做参数扫描"""
+    # 与 calculate_multipart_cost 共用 PartTable 缓存的总体积
+    total_volume = as_part_table(parts).total_volume
+    machine_hours = convert_duration_to_hours(total_print_duration)
+    return sweep_cost(total_volume, machine_hours, pricing_standard, grid, rounded)
@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from logic import cost_components, convert_duration_to_hours
+from parts import as_part_table
+
+# 除定价标准各项外，还可以为这两项输入给出分布
+HOURS = "打印时长"   # 单位：小时
+VOLUME = "总体积"    # 单位：mm³
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+@dataclass(frozen=True)
+class Uniform:
+    """[low, high] 上的均匀分布"""
+    low: float
+    high: float
+
+    def sample(self, rng, size):
+        return rng.uniform(self.low, self.high, size)
+
+
+@dataclass(frozen=True)
+class Triangular:
+    """三角分布，mode 为最可能值；上下限相等时退化为常数"""
+    low: float
+    mode: float
+    high: float
+
+    def __post_init__(self):
+        if not self.low <= self.mode <= self.high:
+            raise ValueError(f"三角分布应满足 下限 ≤ 最可能值 ≤ 上限：{self.low}、{self.mode}、{self.high}")
+
+    def sample(self, rng, size):
+        if self.low == self.high:
+            # rng.triangular 不接受上下限相等
+            return np.full(size, float(self.low))
+        return rng.triangular(self.low, self.mode, self.high, size)
+
+
+@dataclass(frozen=True)
+class Normal:
+    """正态分布，可选截断到 [low, high]"""
+    mean: float
+    std: float
+    low: float = -np.inf
+    high: float = np.inf
+
+    def sample(self, rng, size):
+        return np.clip(rng.normal(self.mean, self.std, size), self.low, self.high)
+
+
+def relative(value, fraction, kind="uniform"):
+    """以 value 为中心、±fraction 相对偏差的分布，例如 relative(12.5, 0.1) 表示 ±10%
+
+    value 或 fraction 为 0 时得到取值恒为 value 的退化分布。
+    """
+    low, high = sorted((value * (1 - fraction), value * (1 + fraction)))
+    if kind == "uniform":
+        return Uniform(low, high)
+    if kind == "triangular":
+        return Triangular(low, value, high)
+    if kind == "normal":
+        # 把 ±fraction 视为 ±2σ，截断到这个范围内，非负的输入也不会抽到负值
+        return Normal(value, abs(value * fraction) / 2, low=max(low, 0.0) if value >= 0 else low, high=high)
+    raise ValueError(f"未知的分布类型：{kind}")
+
+
+class MonteCarloResult:
+    """蒙特卡洛模拟结果：samples 为 {费用项: 样本数组}"""
+
+    def __init__(self, samples, seed):
+        self.samples = samples
+        self.seed = seed
+
+    @property
+    def size(self):
+        return len(self.samples["实际费用"])
+
+    def percentiles(self, field="实际费用", q=DEFAULT_PERCENTILES):
+        values = np.percentile(self.samples[field], q)
+        return {p: round(float(v), 2) for p, v in zip(q, values)}
+
+    def summary(self, fields=("总费用", "实际费用"), q=DEFAULT_PERCENTILES):
+        """各费用项的均值、标准差和分位数"""
+        return {
+            field: {
+                "均值": round(float(self.samples[field].mean()), 2),
+                "标准差": round(float(self.samples[field].std()), 2),
+                **{f"P{p}": v for p, v in self.percentiles(field, q).items()},
+            }
+            for field in fields
+        }
+
+
+def simulate_cost(total_volume, machine_hours, pricing_standard, distributions, samples=100_000, seed=None):
+    """按给定分布抽样并一次性向量化计算费用
+
+    distributions 为 {输入名称: 分布}，名称可以是 HOURS、VOLUME 或任意定价参数；
+    未给出分布的输入取确定值。相同 seed 得到完全相同的结果。
+    """
+    unknown = set(distributions) - set(pricing_standard) - {HOURS, VOLUME}
+    if unknown:
+        raise ValueError(f"未知的输入项：{'、'.join(sorted(unknown))}")
+    if samples <= 0:
+        raise ValueError("样本数必须为正数")
+
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+    rng = np.random.default_rng(seed)
+
+    # 按名称排序后抽样，保证同一 seed 下与字典顺序无关
+    draws = {name: distributions[name].sample(rng, samples) for name in sorted(distributions)}
+    pricing = dict(pricing_standard)
+    pricing.update({name: draw for name, draw in draws.items() if name in pricing_standard})
+    costs = cost_components(draws.get(VOLUME, total_volume), draws.get(HOURS, machine_hours), pricing)
+    return MonteCarloResult(
+        {field: np.broadcast_to(value, (samples,)) for field, value in costs.items()},
+        seed
+    )
+
+
+def simulate_quote(parts, total_print_duration, pricing_standard, distributions, samples=100_000, seed=None):
+    """对一组零件和打印时长做蒙特卡洛模拟"""
+    total_volume = as_part_table(parts).total_volume
+    machine_hours = convert_duration_to_hours(total_print_duration)
+    return simulate_cost(total_volume, machine_hours, pricing_standard, distributions, samples, seed)
@@ -0,0 +1,57 @@
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class JobCancelled(Exception):
+    """后台任务已被用户取消"""
+
+
+class WorkerSignals(QObject):
+    """后台任务信号，均以队列方式投递到主线程"""
+    progress = pyqtSignal(int, int)  # 已完成数量, 总数量（总数量为 0 表示进度未知）
+    finished = pyqtSignal(object)    # 任务返回值
+    failed = pyqtSignal(object)      # 任务抛出的异常
+    cancelled = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """在 QThreadPool 中运行 fn(*args, progress=..., **kwargs)
+
+    progress(done, total) 回调用于汇报进度，并在任务被取消后抛出 JobCancelled，
+    因此长任务只需定期调用 progress 即可响应取消。
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self._cancel_event = threading.Event()
+        # 由调用方持有 Worker 的引用，避免 Python 对象先于 C++ 对象被回收
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _report_progress(self, done, total=0):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        self.signals.progress.emit(int(done), int(total))
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self._report_progress, **self.kwargs)
+        except JobCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            if self._cancel_event.is_set():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
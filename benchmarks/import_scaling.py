@@ -0,0 +1,69 @@
+"""STL 文件夹并行导入的多核扩展性测试
+
+生成一个包含大量球面网格的文件夹，分别用 1、2、4 …… 个进程导入并估算支撑体积，
+输出各进程数的耗时和相对单进程的加速比。
+
+用法示例：
+    python benchmarks/import_scaling.py --files 400 --triangles 50000
+    python benchmarks/import_scaling.py --workers 1 8 16 --no-support
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from synthetic import sphere_triangles, write_stl  # noqa: E402
+
+from geometry import find_stl_files, import_meshes  # noqa: E402
+from support import DEFAULT_SUPPORT  # noqa: E402
+
+
+def ensure_folder(directory, files, triangles):
+    """生成缺失的网格文件，半径各不相同，返回文件列表"""
+    os.makedirs(directory, exist_ok=True)
+    segments = max(8, int((triangles / 2) ** 0.5) + 1)
+    rings = max(4, -(-triangles // (2 * segments)))
+    for i in range(files):
+        path = os.path.join(directory, f"part_{i:04d}.stl")
+        if not os.path.exists(path):
+            write_stl(path, sphere_triangles(5.0 + i % 10, rings, segments))
+    return find_stl_files(directory)
+
+
+def default_workers():
+    counts, n = [], 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count() or 1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="STL 文件夹并行导入扩展性测试")
+    parser.add_argument("--files", type=int, default=200, help="网格文件数（默认 200）")
+    parser.add_argument("--triangles", type=int, default=20_000, help="每个网格的三角形数（默认 20000）")
+    parser.add_argument("--workers", type=int, nargs="+", help="要测试的进程数，默认为 1、2、4 …… 直到 CPU 核数")
+    parser.add_argument("--no-support", action="store_true", help="只计算体积，不估算支撑")
+    parser.add_argument("--directory", default=os.path.join(tempfile.gettempdir(), "printcostpro-bench", "plate"),
+                        help="网格文件夹，已生成的文件会被复用")
+    args = parser.parse_args(argv)
+
+    paths = ensure_folder(os.path.join(args.directory, f"{args.triangles}"), args.files, args.triangles)
+    support = None if args.no_support else DEFAULT_SUPPORT
+    baseline = None
+    print(f"{len(paths)} 个文件，每个 {args.triangles:,} 个三角形，CPU 核数 {os.cpu_count()}")
+    for workers in args.workers or default_workers():
+        started = time.perf_counter()
+        result = import_meshes(paths, support, workers=workers)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(f"进程数 {workers:>3}：{elapsed:8.2f} s  加速比 {baseline / elapsed:5.2f}  "
+              f"（{len(result.paths)} 个成功，{len(result.errors)} 个失败）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
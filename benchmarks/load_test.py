@@ -0,0 +1,132 @@
+"""本地报价服务压力测试客户端
+
+未指定 --url 时自动在随机端口启动 `cli.py serve`，测试结束后关闭。
+
+用法示例：
+    python benchmarks/load_test.py --requests 20000 --concurrency 64
+    python benchmarks/load_test.py --url http://127.0.0.1:8765 --parts 1 500 --verify
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+from logic import DEFAULT_PRICING_STANDARD, calculate_multipart_cost  # noqa: E402
+
+DURATIONS = ["11天11小时11分11秒", "1天2小时", "36:30:00", "8h", "P2DT4H"]
+
+
+def make_request(rng, min_parts, max_parts):
+    parts = [{"name": f"零件-{i}", "volume": round(rng.uniform(50, 250_000), 3),
+              "support_volume": round(rng.uniform(0, 20_000), 3)}
+             for i in range(rng.randint(min_parts, max_parts))]
+    pricing = {"材料单价": rng.choice([1600, 1800, 2000]), "折扣优惠": rng.choice([0.85, 0.9, 1.0])}
+    return {"parts": parts, "duration": rng.choice(DURATIONS), "pricing": pricing}
+
+
+async def send(reader, writer, host, method, path, payload=None):
+    body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = int(re.search(rb"Content-Length: (\d+)", head, re.I).group(1))
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, jobs, latencies, failures, verify):
+    """一个保持连接的客户端，依次发送 jobs 中剩余的请求"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while jobs:
+            request = jobs.pop()
+            started = time.perf_counter()
+            status, response = await send(reader, writer, host, "POST", "/quote", request)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status != 200:
+                failures.append(response.get("error"))
+            elif verify:
+                pricing = dict(DEFAULT_PRICING_STANDARD, **request["pricing"])
+                expected = calculate_multipart_cost(request["parts"], request["duration"], pricing)["计算明细"]
+                if expected != response["计算明细"]:
+                    failures.append(f"结果不一致：{expected} != {response['计算明细']}")
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, total, concurrency, min_parts, max_parts, seed, verify):
+    rng = random.Random(seed)
+    jobs = [make_request(rng, min_parts, max_parts) for _ in range(total)]
+    latencies, failures = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(client(host, port, jobs, latencies, failures, verify) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, metrics = await send(reader, writer, host, "GET", "/metrics")
+    writer.close()
+
+    latencies.sort()
+    print(f"请求 {len(latencies):,} 个，并发 {concurrency}，用时 {elapsed:.2f} s，"
+          f"吞吐 {len(latencies) / elapsed:,.0f} 次/秒")
+    print(f"客户端延迟 ms：p50 {statistics.median(latencies):.2f}  "
+          f"p90 {latencies[int(len(latencies) * 0.9) - 1]:.2f}  "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f}  max {latencies[-1]:.2f}")
+    print(f"服务端批处理：{metrics['batching']}")
+    if failures:
+        print(f"失败 {len(failures)} 个，例如：{failures[0]}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def spawn_server(batch_window_ms):
+    command = [sys.executable, "-u", os.path.join(APP_DIR, "cli.py"), "serve", "--port", "0",
+               "--batch-window-ms", str(batch_window_ms)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, encoding="utf-8")
+    line = process.stdout.readline()
+    match = re.search(r"http://([\d.]+):(\d+)", line)
+    if not match:
+        process.kill()
+        raise RuntimeError(f"报价服务启动失败：{line}")
+    return process, match.group(1), int(match.group(2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地报价服务压力测试")
+    parser.add_argument("--url", help="已运行的服务地址，未指定时自动启动")
+    parser.add_argument("--requests", type=int, default=10_000, help="请求总数（默认 10000）")
+    parser.add_argument("--concurrency", type=int, default=64, help="并发连接数（默认 64）")
+    parser.add_argument("--parts", type=int, nargs=2, default=[1, 50], metavar=("MIN", "MAX"),
+                        help="每个请求的零件数范围（默认 1 50）")
+    parser.add_argument("--batch-window-ms", type=float, default=2.0, help="自动启动服务时的批处理时间窗")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--verify", action="store_true", help="逐个与 calculate_multipart_cost 的结果比对")
+    args = parser.parse_args(argv)
+
+    process = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port
+    else:
+        process, host, port = spawn_server(args.batch_window_ms)
+    try:
+        return asyncio.run(run_load(host, port, args.requests, args.concurrency, args.parts[0], args.parts[1],
+                                    args.seed, args.verify))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
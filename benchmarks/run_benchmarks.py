@@ -0,0 +1,209 @@
+"""PrintCostPro 热点路径基准测试
+
+对读取工作簿、解析打印时长、计算费用、生成报表和导出 Excel 分别计时并记录峰值内存，
+结果保存为 JSON，可与之前保存的基准结果比较，超过阈值即视为性能回退。
+
+用法示例：
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --sizes 10 1000 --baseline bench.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from synthetic import DEFAULT_MESH_SIZES, DEFAULT_SIZES, ensure_meshes, ensure_workbooks  # noqa: E402
+
+from duration import parse_duration  # noqa: E402
+from exporter import export_to_excel  # noqa: E402
+from formatter import format_terminal_output  # noqa: E402
+from geometry import read_stl  # noqa: E402
+from loader import load_parts_table  # noqa: E402
+from logic import DEFAULT_PRICING_STANDARD, build_quote, calculate_multipart_cost, convert_duration_to_hours  # noqa: E402
+from printtime import DEFAULT_MACHINE, slice_mesh  # noqa: E402
+
+DURATION = "11天11小时11分11秒"
+REPORT_WIDTH = 70
+NOISE_FLOOR = 0.002  # 秒；低于该差值的变化视为测量噪声，不算回退
+
+
+def duration_samples(count):
+    """生成 count 个互不相同的打印时长字符串，覆盖各种写法"""
+    samples = []
+    for i in range(count):
+        # 每个样本对应不同的总秒数，避免解析缓存命中
+        minutes, seconds = divmod(i * 37 + 11, 60)
+        hours, minutes = divmod(minutes, 60)
+        days, hours = divmod(hours, 24)
+        style = i % 4
+        if style == 0:
+            samples.append(f"{days}天{hours}小时{minutes}分{seconds}秒")
+        elif style == 1:
+            samples.append(f"{hours + days * 24}:{minutes:02d}:{seconds:02d}")
+        elif style == 2:
+            samples.append(f"{days}d {hours}h {minutes}m {seconds}s")
+        else:
+            samples.append(f"P{days}DT{hours}H{minutes}M{seconds}S")
+    return samples
+
+
+def build_cases(size, workbook, output_dir):
+    """返回 [(名称, 准备函数, 被测函数)]；准备函数的耗时不计入结果"""
+    parts = load_parts_table(workbook)
+    result = build_quote(parts, DURATION, DEFAULT_PRICING_STANDARD)
+    durations = duration_samples(size)
+    export_path = os.path.join(output_dir, f"report_{size}.xlsx")
+
+    def convert_all():
+        for text in durations:
+            convert_duration_to_hours(text)
+
+    return [
+        ("load_parts_table", None, lambda: load_parts_table(workbook)),
+        # 每轮清空解析缓存，测量的是真实的解析开销
+        ("convert_duration_to_hours", parse_duration.cache_clear, convert_all),
+        ("calculate_multipart_cost", None,
+         lambda: calculate_multipart_cost(parts, DURATION, DEFAULT_PRICING_STANDARD)),
+        ("build_quote", None, lambda: build_quote(parts, DURATION, DEFAULT_PRICING_STANDARD)),
+        ("format_terminal_output", None, lambda: format_terminal_output(result, REPORT_WIDTH)),
+        ("export_to_excel", None, lambda: export_to_excel(result, export_path)),
+    ]
+
+
+def build_mesh_cases(mesh):
+    """网格读取与体积计算（二进制 STL 按内存映射读取），以及按层切片"""
+    return [
+        ("read_stl_volume", None, lambda: read_stl(mesh).volume()),
+        ("slice_layers", None, lambda: slice_mesh(read_stl(mesh), DEFAULT_MACHINE.layer_thickness)),
+    ]
+
+
+def measure(setup, fn, repeat):
+    """返回 (各轮耗时, 峰值内存)；峰值内存单独跑一轮，避免 tracemalloc 影响计时"""
+    # 预热一轮，延迟导入等一次性开销不计入结果
+    if setup is not None:
+        setup()
+    fn()
+
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return timings, peak
+
+
+def run(sizes, mesh_sizes, repeat, workbook_dir, extension, output_dir):
+    paths = ensure_workbooks(workbook_dir, sizes, extension)
+    meshes = ensure_meshes(workbook_dir, mesh_sizes)
+
+    def cases():
+        # 逐个规模准备，不同时持有所有规模的数据
+        for size in sizes:
+            for case in build_cases(size, paths[size], output_dir):
+                yield size, case
+        for size in mesh_sizes:
+            for case in build_mesh_cases(meshes[size]):
+                yield size, case
+
+    results = {}
+    for size, (name, setup, fn) in cases():
+        timings, peak = measure(setup, fn, repeat)
+        key = f"{name}/{size}"
+        results[key] = {
+            "best": min(timings),
+            "median": statistics.median(timings),
+            "peak_bytes": peak,
+            "repeat": repeat,
+        }
+        print(f"{key:<36}{min(timings) * 1000:>12.2f} ms{peak / 1024 / 1024:>12.2f} MiB")
+    return results
+
+
+def environment():
+    import numpy
+    import openpyxl
+    import xlsxwriter
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": numpy.__version__,
+        "openpyxl": openpyxl.__version__,
+        "xlsxwriter": xlsxwriter.__version__,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def compare(results, baseline, threshold):
+    """与基准结果比较，返回回退项列表 [(键, 指标, 基准值, 当前值)]
+
+    耗时比较最佳值，峰值内存比较字节数；只比较两次都测量过的项。
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current["best"] > previous["best"] * (1 + threshold) and current["best"] - previous["best"] > NOISE_FLOOR:
+            regressions.append((key, "best", previous["best"], current["best"]))
+        if current["peak_bytes"] > previous["peak_bytes"] * (1 + threshold):
+            regressions.append((key, "peak_bytes", previous["peak_bytes"], current["peak_bytes"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PrintCostPro 热点路径基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="零件数量")
+    parser.add_argument("--mesh-sizes", type=int, nargs="*", default=list(DEFAULT_MESH_SIZES),
+                        help="合成 STL 网格的三角形数，不给出数值时跳过网格项")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最佳值比较（默认 3）")
+    parser.add_argument("--format", choices=["xlsm", "xlsx"], default="xlsm", help="合成工作簿格式（默认 xlsm）")
+    parser.add_argument("--workbooks", default=os.path.join(tempfile.gettempdir(), "printcostpro-bench"),
+                        help="合成工作簿目录，已生成的文件会被复用")
+    parser.add_argument("--output", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="用于比较的基准结果 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的相对回退幅度（默认 0.2，即 20%%）")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = run(args.sizes, args.mesh_sizes, max(1, args.repeat), args.workbooks, f".{args.format}", output_dir)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for key, metric, previous, current in regressions:
+            print(f"性能回退：{key} {metric} {previous:.6g} → {current:.6g}（{current / previous - 1:+.0%}）",
+                  file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"与基准相比没有超过 {args.threshold:.0%} 的回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""生成基准测试用的合成零件工作簿（C2 为零件数量，B8:D* 为零件名称、零件体积、支撑体积）和 STL 网格
+
+用法示例：
+    python benchmarks/synthetic.py 输出目录 --sizes 10 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+
+DEFAULT_SIZES = (10, 1_000, 10_000, 100_000)
+DEFAULT_MESH_SIZES = (100_000, 1_000_000)  # 三角形数
+START_ROW = 8
+
+
+def part_rows(part_count, seed=0):
+    """逐行产出 (名称, 零件体积, 支撑体积)，相同 seed 得到相同数据"""
+    rng = random.Random(seed)
+    for i in range(1, part_count + 1):
+        volume = round(rng.uniform(50.0, 250_000.0), 3)
+        yield f"零件-{i:06d}", volume, round(volume * rng.uniform(0.02, 0.35), 3)
+
+
+def write_parts_workbook(path, part_count, seed=0):
+    """按程序读取的布局写出合成工作簿，扩展名可以是 .xlsx 或 .xlsm"""
+    import xlsxwriter
+
+    # .xlsm 只改变扩展名，不含宏；openpyxl 按相同的方式读取
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    workbook.set_size(1200, 800)
+    sheet = workbook.add_worksheet("零件清单")
+    sheet.write_row(1, 1, ["零件数量", part_count])
+    sheet.write_row(START_ROW - 2, 1, ["零件名称", "零件体积(mm³)", "支撑体积(mm³)"])
+    for i, row in enumerate(part_rows(part_count, seed)):
+        sheet.write_row(START_ROW - 1 + i, 1, row)
+    workbook.close()
+    return path
+
+
+def workbook_path(directory, part_count, extension=".xlsm"):
+    return os.path.join(directory, f"parts_{part_count}{extension}")
+
+
+def ensure_workbooks(directory, sizes=DEFAULT_SIZES, extension=".xlsm", seed=0):
+    """生成缺失的工作簿并返回 {零件数量: 路径}，已存在的文件直接复用"""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for size in sizes:
+        path = workbook_path(directory, size, extension)
+        if not os.path.exists(path):
+            write_parts_workbook(path, size, seed)
+        paths[size] = path
+    return paths
+
+
+def sphere_triangles(radius, rings, segments, center=(0.0, 0.0, 0.0)):
+    """经纬划分的球面，共 2 × rings × segments 个三角形（两极处的三角形退化为零面积），法向朝外"""
+    import numpy as np
+
+    theta = np.linspace(0.0, np.pi, rings + 1)
+    phi = np.linspace(0.0, 2 * np.pi, segments, endpoint=False)
+    points = np.stack([
+        np.outer(np.sin(theta), np.cos(phi)),
+        np.outer(np.sin(theta), np.sin(phi)),
+        np.repeat(np.cos(theta)[:, None], segments, axis=1),
+    ], axis=-1) * radius + np.asarray(center, dtype=np.float64)
+
+    i = np.arange(rings)[:, None]
+    j = np.arange(segments)[None, :]
+    j1 = (j + 1) % segments
+    a, b, c, d = points[i, j], points[i + 1, j], points[i + 1, j1], points[i, j1]
+    upper = np.stack([a, b, c], axis=-2).reshape(-1, 3, 3)
+    lower = np.stack([a, c, d], axis=-2).reshape(-1, 3, 3)
+    return np.concatenate([upper, lower])
+
+
+def write_stl(path, triangles, binary=True, name="synthetic"):
+    """把 (N, 3, 3) 的三角形写成 STL，法向量按顶点顺序计算"""
+    import numpy as np
+
+    triangles = np.asarray(triangles, dtype=np.float64)
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+    if binary:
+        records = np.zeros(len(triangles), dtype=[("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)),
+                                                  ("attribute", "<u2")])
+        records["normal"] = normals
+        records["vertices"] = triangles
+        with open(path, "wb") as f:
+            f.write(f"{name} binary STL".encode("ascii").ljust(80, b" "))
+            f.write(np.uint32(len(records)).tobytes())
+            f.write(records.tobytes())
+    else:
+        with open(path, "w", encoding="ascii") as f:
+            f.write(f"solid {name}\n")
+            for normal, triangle in zip(normals.tolist(), triangles.tolist()):
+                f.write("  facet normal {:e} {:e} {:e}\n    outer loop\n".format(*normal))
+                for vertex in triangle:
+                    f.write("      vertex {:e} {:e} {:e}\n".format(*vertex))
+                f.write("    endloop\n  endfacet\n")
+            f.write(f"endsolid {name}\n")
+    return path
+
+
+def ensure_meshes(directory, sizes=DEFAULT_MESH_SIZES, radius=20.0):
+    """生成缺失的球面网格并返回 {三角形数: 路径}；实际三角形数取不小于 size 的最接近值"""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for size in sizes:
+        path = os.path.join(directory, f"sphere_{size}.stl")
+        if not os.path.exists(path):
+            segments = max(8, int((size / 2) ** 0.5) + 1)
+            rings = max(4, -(-size // (2 * segments)))
+            write_stl(path, sphere_triangles(radius, rings, segments))
+        paths[size] = path
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成零件工作簿")
+    parser.add_argument("directory", help="输出目录")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="零件数量")
+    parser.add_argument("--format", choices=["xlsm", "xlsx"], default="xlsm", help="文件格式（默认 xlsm）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args(argv)
+    os.makedirs(args.directory, exist_ok=True)
+    for size in args.sizes:
+        path = write_parts_workbook(workbook_path(args.directory, size, f".{args.format}"), size, args.seed)
+        print(f"{size:>8} 个零件 → {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
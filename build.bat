@@ -1,9 +1,17 @@
 @echo off
 chcp 65001 >nul
-echo 🔧 正在使用 PyInstaller 打包 PrintCostPro...
+rem 默认打包为单文件；传入 onedir 参数时打包为目录，省去每次启动解压到 _MEIPASS 的时间
+set PACK_MODE=--onefile
+set PACK_RESULT=dist\PrintCostPro.exe
+if /I "%~1"=="onedir" (
+  set PACK_MODE=--onedir
+  set PACK_RESULT=dist\PrintCostPro\PrintCostPro.exe
+)
+
+echo 🔧 正在使用 PyInstaller 打包 PrintCostPro（%PACK_MODE%）...
 
 pyinstaller app/main.py ^
-  --onefile ^
+  %PACK_MODE% ^
   --noconsole ^
   --icon=app/resources/3dprint.ico ^
   --add-data "app/resources/3dprint.ico;app/resources" ^
@@ -12,7 +20,7 @@ pyinstaller app/main.py ^
   --name PrintCostPro ^
   --paths=app
 
-echo ✅ 打包完成，结果位于 dist\PrintCostPro.exe
+echo ✅ 打包完成，结果位于 %PACK_RESULT%
 
 echo 🧹 正在清理中间文件...
 